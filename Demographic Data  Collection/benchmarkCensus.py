@@ -0,0 +1,122 @@
+"""
+Benchmarks getCensusData.get_census_data against a local stub of the Census API.
+
+The stub answers with random latency (and an occasional 503 to exercise the
+retry path), so the timings show how total fetch time compares with the sum
+and the maximum of the individual request latencies. The local Census cache
+is bypassed, so every run reaches the stub and no stub data is cached.
+
+Usage:
+    python benchmarkCensus.py [--latency-ms 150] [--workers 1 8 16]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import getCensusData
+import placeRegistry
+
+STUB_VARIABLES = 40  # Columns returned for a group(...) request
+
+
+class StubCensusHandler(BaseHTTPRequestHandler):
+    latency_ms = 150
+    error_rate = 0.05
+    places = []
+    lock = threading.Lock()
+    latencies = []
+    requests = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        delay = random.uniform(0.5, 1.5) * self.latency_ms / 1000
+        time.sleep(delay)
+        with self.lock:
+            StubCensusHandler.latencies.append(delay)
+            StubCensusHandler.requests += 1
+
+        if random.random() < self.error_rate:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        get = query.get("get", [""])[0]
+        if get.startswith("group("):
+            group = get[len("group("):-1]
+            columns = ["NAME"] + [f"{group}_C01_{i:03d}E" for i in range(1, STUB_VARIABLES + 1)] + ["GEO_ID"]
+        else:
+            columns = get.split(",")
+
+        if "ucgid" in query:
+            geoids = query["ucgid"][0].split(",")
+        else:
+            state = query.get("in", ["state:17"])[0].split(":")[1]
+            geoids = [g for g in self.places if g[9:11] == state]
+            columns = columns + ["state", "place"]
+
+        rows = [columns]
+        for geoid in geoids:
+            row = []
+            for column in columns:
+                if column == "GEO_ID":
+                    row.append(geoid)
+                elif column == "NAME":
+                    row.append(f"Place {geoid[-5:]}, Illinois")
+                elif column == "state":
+                    row.append(geoid[9:11])
+                elif column == "place":
+                    row.append(geoid[11:])
+                else:
+                    row.append(str(random.randint(0, 100000)))
+            rows.append(row)
+
+        body = json.dumps(rows).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stub_server(latency_ms=150, error_rate=0.05):
+    StubCensusHandler.latency_ms = latency_ms
+    StubCensusHandler.error_rate = error_rate
+    StubCensusHandler.places = list(placeRegistry.study_places().cities().values())
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubCensusHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark get_census_data against a local stub server.")
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 16])
+    args = parser.parse_args()
+
+    server = start_stub_server(args.latency_ms, args.error_rate)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/data/2023/acs/acs5/profile"
+
+    for workers in args.workers:
+        StubCensusHandler.latencies = []
+        StubCensusHandler.requests = 0
+        start = time.perf_counter()
+        df = getCensusData.get_census_data(base_url, "DP03", max_workers=workers, use_cache=False)
+        elapsed = time.perf_counter() - start
+        latencies = StubCensusHandler.latencies
+        print(f"workers={workers:>3}: {elapsed:6.2f}s total, {StubCensusHandler.requests} requests, "
+              f"sum of latencies {sum(latencies):6.2f}s, slowest request {max(latencies, default=0):.2f}s, "
+              f"{0 if df is None else len(df)} rows")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
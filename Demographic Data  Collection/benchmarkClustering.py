@@ -0,0 +1,87 @@
+"""
+Benchmarks the full-batch and streaming clustering paths on a synthetic feature table.
+
+A Feather file of --rows places is generated once, then each path runs in its
+own process so that its peak resident memory can be reported next to the
+wall time and the inertia of its labels (measured in the same standardized
+space for both paths).
+
+Usage:
+    python benchmarkClustering.py [--rows 100000 1000000] [--features 12] [--clusters 3]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import clustering
+
+
+def make_feature_file(path, rows, features, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0, 5, size=(clusters, features))
+    assignment = rng.integers(0, clusters, size=rows)
+    values = (centers[assignment] + rng.normal(0, 1, size=(rows, features))).astype(np.float32)
+    df = pd.DataFrame(values, columns=[f"feature_{i}" for i in range(features)])
+    df.insert(0, "GEO_ID", [f"1600000US{i:07d}" for i in range(rows)])
+    df.to_feather(path, compression="uncompressed")
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_full_batch(path, clusters, output, queue):
+    start = time.perf_counter()
+    df = clustering.perform_clustering(path, n_clusters=clusters)
+    elapsed = time.perf_counter() - start
+    numeric = df.drop(columns=["Cluster"]).select_dtypes(include=["number"]).to_numpy(dtype=np.float64)
+    scaled = (numeric - numeric.mean(axis=0)) / numeric.std(axis=0)
+    labels = df["Cluster"].to_numpy()
+    centers = np.stack([scaled[labels == c].mean(axis=0) for c in range(clusters)])
+    inertia = float(np.square(scaled - centers[labels]).sum())
+    queue.put((elapsed, inertia, _peak_rss_mb()))
+
+
+def _run_streaming(path, clusters, output, queue):
+    start = time.perf_counter()
+    summary = clustering.stream_clustering(path, output, n_clusters=clusters)
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, summary["inertia"], _peak_rss_mb()))
+
+
+def _measure(target, *args):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=target, args=args + (queue,))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full-batch and streaming K-means clustering.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--features", type=int, default=12)
+    parser.add_argument("--clusters", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = os.path.join(tmp, f"features_{rows}.feather")
+            make_feature_file(path, rows, args.features, args.clusters)
+            for name, target in (("full-batch", _run_full_batch), ("streaming", _run_streaming)):
+                output = os.path.join(tmp, f"labels_{name}_{rows}.feather")
+                elapsed, inertia, peak = _measure(target, path, args.clusters, output)
+                print(f"rows={rows:>9} {name:>10}: {elapsed:7.2f}s, inertia {inertia:14.1f}, "
+                      f"peak RSS {peak:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Builds the demographic feature table used for clustering in one command.
+
+Education (S1501), income (S1901) and economic profile (DP03) data are fetched
+concurrently, joined on GEOID, stored with compact dtypes and written to a
+versioned, uncompressed Feather file that clustering.load_feature_table can
+memory-map.
+
+Usage:
+    python buildFeatures.py [--refresh] [--output-dir features]
+"""
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import getCensusData
+import getEducationData
+import getIncomeData
+import getProfileData
+import placeRegistry
+from censusCache import parse_vintage
+
+# (base URL, group, variable -> column name) for every source joined into the feature table
+FEATURE_SOURCES = [
+    (getEducationData.BASE_URL, getEducationData.GROUP_ID, getEducationData.EDUCATION_COLUMNS),
+    (getIncomeData.BASE_URL, getIncomeData.GROUP_ID, getIncomeData.INCOME_COLUMNS),
+    (getProfileData.BASE_URL, getProfileData.GROUP_ID, getProfileData.PROFILE_COLUMNS),
+]
+
+FEATURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "features")
+LATEST_POINTER = "LATEST"
+
+
+@contextmanager
+def timed(stage, timings):
+    start = time.perf_counter()
+    yield
+    timings[stage] = time.perf_counter() - start
+    print(f"[{stage}] {timings[stage]:.3f}s")
+
+
+def compact_dtypes(df):
+    """
+    Downcasts numeric columns to int32 (whole numbers without gaps) or float32, and
+    stores City as a categorical.
+    """
+    import numpy as np
+    import pandas as pd
+
+    df = df.copy()
+    for column in df.columns:
+        if column == "City":
+            df[column] = df[column].astype("category")
+        elif column == "GEO_ID":
+            df[column] = df[column].astype(str)
+        elif pd.api.types.is_numeric_dtype(df[column]):
+            values = df[column]
+            whole = values.notna().all() and np.array_equal(values, np.round(values)) \
+                and values.abs().max() < np.iinfo(np.int32).max
+            df[column] = values.astype(np.int32 if whole else np.float32)
+    return df
+
+
+def build_feature_table(cities=None, refresh=False, max_workers=len(FEATURE_SOURCES), timings=None):
+    """
+    Fetches every feature source concurrently and joins them on GEOID.
+
+    Args:
+        cities (dict): City name -> GEOID mapping; defaults to the study places (see placeRegistry)
+        refresh (bool): Bypass the local Census cache
+        max_workers (int): Number of sources fetched at once
+        timings (dict): Optional dict receiving per-stage durations in seconds
+
+    Returns:
+        pd.DataFrame: One row per city with City, GEO_ID and every renamed feature column
+    """
+    import pandas as pd
+
+    if cities is None:
+        cities = placeRegistry.study_places().cities()
+    if timings is None:
+        timings = {}
+
+    def fetch(source):
+        base_url, group_id, columns = source
+        df = getCensusData.get_census_data(base_url, group_id, cities=cities, refresh=refresh,
+                                           variables=list(columns))
+        if df is None:
+            empty = pd.DataFrame({"GEO_ID": pd.Series(dtype=str)})
+            return empty.assign(**{name: pd.Series(dtype="float64") for name in columns.values()})
+        return df[["GEO_ID"] + list(columns)].rename(columns=columns)
+
+    with timed("fetch", timings):
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            frames = list(executor.map(fetch, FEATURE_SOURCES))
+
+    with timed("join", timings):
+        # Left-join onto the full city list: ACS 1-year tables only cover larger places
+        features = pd.DataFrame({"City": list(cities), "GEO_ID": list(cities.values())})
+        for frame in frames:
+            features = features.merge(frame, on="GEO_ID", how="left", validate="one_to_one")
+
+    with timed("types", timings):
+        features = compact_dtypes(features)
+    return features
+
+
+def feature_table_version(df):
+    """Returns a short content hash of a feature table."""
+    import pandas as pd
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    digest.update(",".join(df.columns).encode("utf-8"))
+    return digest.hexdigest()[:10]
+
+
+def write_feature_table(df, output_dir=FEATURE_DIR):
+    """
+    Writes the table as an uncompressed (memory-mappable) Feather file named after the
+    ACS vintage and the table's content hash, and points LATEST at it.
+
+    Returns:
+        str: Path of the written file
+    """
+    vintage = max((parse_vintage(url)[0] or 0) for url, _, _ in FEATURE_SOURCES)
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"features_{vintage}_{feature_table_version(df)}.feather")
+    df.reset_index(drop=True).to_feather(path, compression="uncompressed")
+    with open(os.path.join(output_dir, LATEST_POINTER), "w", encoding="utf-8") as f:
+        f.write(os.path.basename(path) + "\n")
+    return path
+
+
+def latest_feature_table(output_dir=FEATURE_DIR):
+    """Returns the path of the most recently written feature table, or None."""
+    try:
+        with open(os.path.join(output_dir, LATEST_POINTER), encoding="utf-8") as f:
+            return os.path.join(output_dir, f.read().strip())
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the demographic feature table for clustering.")
+    parser.add_argument("--refresh", action="store_true", help="Ignore the local Census cache")
+    parser.add_argument("--output-dir", default=FEATURE_DIR)
+    args = parser.parse_args()
+
+    timings = {}
+    start = time.perf_counter()
+    features = build_feature_table(refresh=args.refresh, timings=timings)
+    with timed("write", timings):
+        path = write_feature_table(features, args.output_dir)
+    print(f"Wrote {len(features)} rows x {features.shape[1]} columns to {path} "
+          f"in {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
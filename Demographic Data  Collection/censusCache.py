@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+# Default cache location and lifetime
+CACHE_DIR = os.environ.get(
+    "CENSUS_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "census"),
+)
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+
+_VINTAGE_URL = re.compile(r"/data/(?P<vintage>\d{4})/(?P<dataset>[^?]+?)/?$")
+
+
+def parse_vintage(base_url):
+    """
+    Splits a Census API base URL into its vintage and dataset path.
+
+    Args:
+        base_url (str): e.g. "https://api.census.gov/data/2023/acs/acs1/subject"
+
+    Returns:
+        tuple: (vintage, dataset), e.g. (2023, "acs/acs1/subject"); vintage is None if the URL has none
+    """
+    match = _VINTAGE_URL.search(base_url)
+    if match is None:
+        return None, base_url
+    return int(match.group("vintage")), match.group("dataset")
+
+
+class CensusCache:
+    """
+    Disk cache of Census API responses stored as Parquet files.
+
+    Entries are keyed by (base URL, group, variable list, GEOID set) and
+    recorded in a JSON manifest together with their ACS vintage. Entries expire
+    after ``ttl_seconds``, and storing a newer vintage of a dataset/group drops
+    the older vintages so stale releases are not served by mistake.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(base_url, group_id, geoids, variables=None):
+        material = json.dumps(
+            [base_url.rstrip("/"), group_id, sorted(variables) if variables else None, sorted(geoids)]
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()[:32]
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_manifest(self, manifest):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _remove(self, manifest, key):
+        entry = manifest.pop(key, None)
+        if entry is not None:
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except OSError:
+                pass
+
+    def get(self, base_url, group_id, geoids, variables=None):
+        """
+        Returns the cached DataFrame for a request, or None if it is missing or expired.
+        """
+        key = self.make_key(base_url, group_id, geoids, variables)
+        with self._lock:
+            manifest = self._load_manifest()
+            entry = manifest.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry["created_at"] > self.ttl_seconds:
+                self._remove(manifest, key)
+                self._save_manifest(manifest)
+                return None
+        import pandas as pd
+        try:
+            return pd.read_parquet(os.path.join(self.cache_dir, entry["file"]))
+        except (OSError, ImportError, ValueError) as e:
+            print(f"Warning: Could not read cached Census data {entry['file']}: {e}")
+            return None
+
+    def put(self, base_url, group_id, geoids, df, variables=None):
+        """
+        Stores a DataFrame for a request. Older vintages of the same dataset and group are invalidated.
+        """
+        key = self.make_key(base_url, group_id, geoids, variables)
+        vintage, dataset = parse_vintage(base_url)
+        file_name = f"{key}.parquet"
+        os.makedirs(self.cache_dir, exist_ok=True)
+        try:
+            df.to_parquet(os.path.join(self.cache_dir, file_name), index=False)
+        except (ImportError, ValueError) as e:
+            print(f"Warning: Could not cache Census data (Parquet support unavailable?): {e}")
+            return
+
+        with self._lock:
+            manifest = self._load_manifest()
+            if vintage is not None:
+                for other_key, entry in list(manifest.items()):
+                    if entry["dataset"] == dataset and entry["group"] == group_id and \
+                            entry["vintage"] is not None and entry["vintage"] < vintage:
+                        print(f"Invalidating cached {group_id} {entry['vintage']} data (new vintage {vintage}).")
+                        self._remove(manifest, other_key)
+            manifest[key] = {
+                "base_url": base_url,
+                "dataset": dataset,
+                "vintage": vintage,
+                "group": group_id,
+                "variables": variables,
+                "geoids": len(geoids),
+                "rows": len(df),
+                "file": file_name,
+                "created_at": time.time(),
+            }
+            self._save_manifest(manifest)
+
+    def invalidate(self, dataset=None, vintage=None, group_id=None):
+        """
+        Removes cached entries matching every given filter; with no filters the whole cache is cleared.
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self._lock:
+            manifest = self._load_manifest()
+            removed = 0
+            for key, entry in list(manifest.items()):
+                if dataset is not None and entry["dataset"] != dataset:
+                    continue
+                if vintage is not None and entry["vintage"] != vintage:
+                    continue
+                if group_id is not None and entry["group"] != group_id:
+                    continue
+                self._remove(manifest, key)
+                removed += 1
+            self._save_manifest(manifest)
+        return removed
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """Returns the shared cache used by get_census_data."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = CensusCache()
+    return _default_cache
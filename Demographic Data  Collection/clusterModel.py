@@ -0,0 +1,124 @@
+"""
+Persisted clustering model: fit once with clustering.fit_cluster_model, then
+assign any number of new rows to the existing peer groups without refitting.
+
+Only numpy is needed to load and apply a model, so the backend can use it
+without importing scikit-learn or pandas.
+"""
+import hashlib
+import json
+import time
+
+import numpy as np
+
+MODEL_FORMAT = 1
+
+
+class ClusterModel:
+    """
+    Scaler statistics and K-means centroids over a fixed, ordered feature list.
+
+    Cluster IDs are canonical: centroids are sorted lexicographically when the
+    model is built, so refitting on the same data keeps the same IDs.
+    """
+
+    def __init__(self, features, mean, scale, centroids, rubric_version=None, members=None, created_at=None):
+        """
+        Args:
+            features: Feature column names, in the order of the arrays
+            mean: Per-feature mean used for standardization
+            scale: Per-feature standard deviation used for standardization
+            centroids: Cluster centres in standardized space (n_clusters x n_features)
+            rubric_version: rubric.RUBRIC_VERSION the score features were produced with, if any
+            members: Optional dict of city name -> cluster ID for the rows the model was fitted on
+            created_at: Unix timestamp of the fit
+        """
+        self.features = list(features)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.scale[self.scale == 0] = 1.0
+        centroids = np.asarray(centroids, dtype=np.float64)
+        order = np.lexsort(centroids.T[::-1])
+        self.centroids = centroids[order]
+        # Old cluster ID -> canonical ID
+        remap = np.empty(len(order), dtype=np.int64)
+        remap[order] = np.arange(len(order))
+        self.members = {city: int(remap[label]) for city, label in (members or {}).items()}
+        self.rubric_version = rubric_version
+        self.created_at = time.time() if created_at is None else created_at
+        self._centroid_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+
+    @property
+    def n_clusters(self):
+        return len(self.centroids)
+
+    @property
+    def version(self):
+        """Short content hash identifying the fitted parameters."""
+        digest = hashlib.sha256(json.dumps([self.features, self.rubric_version]).encode("utf-8"))
+        for array in (self.mean, self.scale, self.centroids):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()[:12]
+
+    def _matrix(self, rows):
+        # DataFrame, dict (one row) or list of dicts -> float matrix in feature order; missing values are NaN
+        if isinstance(rows, dict):
+            rows = [rows]
+        if hasattr(rows, "reindex"):
+            return rows.reindex(columns=self.features).to_numpy(dtype=np.float64, na_value=np.nan)
+        if len(rows) and isinstance(rows[0], dict):
+            return np.array([[np.nan if row.get(f) is None else row[f] for f in self.features] for row in rows],
+                            dtype=np.float64)
+        return np.atleast_2d(np.asarray(rows, dtype=np.float64))
+
+    def assign(self, rows):
+        """
+        Labels rows with their nearest centroid.
+
+        Missing features are imputed with the training mean, so a row that only
+        carries some of the features is still placed on the remaining ones.
+
+        Args:
+            rows: DataFrame, dict of feature -> value, list of dicts, or array in feature order
+
+        Returns:
+            Cluster ID for a single dict, otherwise an int array of cluster IDs
+        """
+        X = (self._matrix(rows) - self.mean) / self.scale
+        np.nan_to_num(X, copy=False, nan=0.0)
+        # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2; ||x||^2 does not change the argmin
+        labels = np.argmin(self._centroid_norms - 2.0 * X @ self.centroids.T, axis=1)
+        return int(labels[0]) if isinstance(rows, dict) else labels
+
+    def cluster_of(self, city):
+        """Returns the stored cluster ID of a city the model was fitted on, or None."""
+        return self.members.get(city)
+
+    def peers(self, cluster):
+        """Returns the fitted cities in a cluster."""
+        return sorted(city for city, label in self.members.items() if label == cluster)
+
+    def save(self, path):
+        """Writes the model to a single .npz file (arrays plus a JSON metadata entry)."""
+        meta = {
+            "format": MODEL_FORMAT,
+            "version": self.version,
+            "features": self.features,
+            "rubric_version": self.rubric_version,
+            "members": self.members,
+            "created_at": self.created_at,
+        }
+        with open(path, "wb") as f:
+            np.savez(f, mean=self.mean, scale=self.scale, centroids=self.centroids, meta=np.array(json.dumps(meta)))
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """Reads a model written by save."""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("format") != MODEL_FORMAT:
+                raise ValueError(f"Unsupported cluster model format: {meta.get('format')}")
+            return cls(meta["features"], data["mean"], data["scale"], data["centroids"],
+                       rubric_version=meta["rubric_version"], members=meta["members"],
+                       created_at=meta["created_at"])
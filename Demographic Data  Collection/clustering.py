@@ -1,31 +1,465 @@
 # clustering.py
-import pandas as pd
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 
-def perform_clustering(city_scores_df):
+import numpy as np
+
+from clusterModel import ClusterModel
+
+# Default range of cluster counts tried by sweep_k
+DEFAULT_K_RANGE = range(2, 11)
+
+# Below this many rows a k sweep runs in-process; process start-up would cost more than it saves
+PARALLEL_MIN_ROWS = 5000
+
+# Rows read from disk at a time by the streaming path, and rows per mini-batch update
+STREAM_CHUNK_SIZE = 65536
+STREAM_BATCH_SIZE = 4096
+
+# Silhouette is O(n^2); larger datasets are scored on a random sample of this size
+SILHOUETTE_SAMPLE_SIZE = 5000
+
+# Seed and restarts shared by every K-means fit, so the fit scored by sweep_k is the one perform_clustering
+# and fit_cluster_model use for the selected k
+RANDOM_STATE = 42
+N_INIT = 10
+
+def load_feature_table(path):
+    """
+    Loads a Feather feature table (e.g. written by buildFeatures.py) through a memory map.
+    """
+    from pyarrow import feather
+    return feather.read_table(path, memory_map=True).to_pandas()
+
+def _evaluate_k(data, k, random_state):
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_score, davies_bouldin_score
+    kmeans = KMeans(n_clusters=k, random_state=random_state, n_init=N_INIT)
+    labels = kmeans.fit_predict(data)
+    sample_size = SILHOUETTE_SAMPLE_SIZE if len(data) > SILHOUETTE_SAMPLE_SIZE else None
+    return {
+        "k": k,
+        "inertia": kmeans.inertia_,
+        "silhouette": silhouette_score(data, labels, sample_size=sample_size, random_state=random_state),
+        "davies_bouldin": davies_bouldin_score(data, labels),
+    }
+
+# Worker-side view of the shared scaled matrix, attached once per process
+_shared = {}
+
+def _attach_shared(name, shape, dtype):
+    from threadpoolctl import threadpool_limits
+    shm = shared_memory.SharedMemory(name=name)
+    _shared["shm"] = shm  # Keep the mapping alive for the life of the worker
+    _shared["data"] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    # One BLAS/OpenMP thread per worker; the pool provides the parallelism
+    _shared["limits"] = threadpool_limits(1)
+
+def _evaluate_shared_k(k, random_state):
+    return _evaluate_k(_shared["data"], k, random_state)
+
+def sweep_k(scaled_data, k_range=DEFAULT_K_RANGE, random_state=RANDOM_STATE, n_jobs=None):
+    """
+    Fits K-means for every k in k_range and scores each fit.
+
+    For large inputs the fits run across a process pool. The scaled matrix is
+    placed in shared memory once and every worker maps it, so it is not copied
+    per task.
+
+    Args:
+        scaled_data: Standardized feature matrix (n_samples x n_features)
+        k_range: Cluster counts to evaluate
+        random_state: Seed passed to every K-means fit
+        n_jobs: Worker processes; None picks in-process for small inputs and all CPUs otherwise
+
+    Returns:
+        DataFrame with columns k, inertia, silhouette and davies_bouldin, one row per k
+    """
+    import pandas as pd
+    data = np.ascontiguousarray(scaled_data, dtype=np.float64)
+    ks = [k for k in k_range if 2 <= k < len(data)]
+    if n_jobs is None:
+        n_jobs = 1 if len(data) < PARALLEL_MIN_ROWS else os.cpu_count()
+
+    if n_jobs == 1 or len(ks) <= 1:
+        rows = [_evaluate_k(data, k, random_state) for k in ks]
+        return pd.DataFrame(rows, columns=["k", "inertia", "silhouette", "davies_bouldin"])
+
+    shm = shared_memory.SharedMemory(create=True, size=data.nbytes)
+    try:
+        np.ndarray(data.shape, dtype=data.dtype, buffer=shm.buf)[:] = data
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(ks)), initializer=_attach_shared,
+                                 initargs=(shm.name, data.shape, data.dtype)) as executor:
+            rows = list(executor.map(_evaluate_shared_k, ks, [random_state] * len(ks)))
+    finally:
+        shm.close()
+        shm.unlink()
+    return pd.DataFrame(rows, columns=["k", "inertia", "silhouette", "davies_bouldin"])
+
+def select_k(diagnostics, criterion="silhouette"):
+    """
+    Picks k from a sweep_k diagnostic table.
+
+    Args:
+        diagnostics: DataFrame returned by sweep_k
+        criterion: "silhouette" (highest), "davies_bouldin" (lowest) or "elbow"
+            (largest bend in the inertia curve)
+
+    Returns:
+        The selected number of clusters
+    """
+    if criterion == "silhouette":
+        return int(diagnostics.loc[diagnostics["silhouette"].idxmax(), "k"])
+    if criterion == "davies_bouldin":
+        return int(diagnostics.loc[diagnostics["davies_bouldin"].idxmin(), "k"])
+    if criterion == "elbow":
+        if len(diagnostics) < 3:
+            return int(diagnostics["k"].iloc[0])
+        bend = diagnostics["inertia"].diff().diff().shift(-1)
+        return int(diagnostics.loc[bend.idxmax(), "k"])
+    raise ValueError(f"Unknown k selection criterion: {criterion}")
+
+def perform_clustering(city_scores_df, n_clusters=3, k_range=DEFAULT_K_RANGE, criterion="silhouette",
+                       n_jobs=None, return_diagnostics=False):
+    """
+    Standardizes the numeric columns and assigns each row a K-means cluster.
+
+    Missing values are imputed with the column mean, as in fit_cluster_model,
+    so feature tables from buildFeatures can be clustered directly.
+
+    Args:
+        city_scores_df: DataFrame, or path to a Feather feature table
+        n_clusters: Number of clusters, or "auto" to sweep k_range and pick k by criterion
+        k_range: Cluster counts tried when n_clusters is "auto"
+        criterion: Selection rule passed to select_k
+        n_jobs: Worker processes for the sweep (see sweep_k)
+        return_diagnostics: Also return the sweep's diagnostic table (None without a sweep)
+
+    Returns:
+        DataFrame with an added 'Cluster' column, or (DataFrame, diagnostics) if return_diagnostics
+    """
+    from sklearn.cluster import KMeans
+    from sklearn.preprocessing import StandardScaler
+    if isinstance(city_scores_df, (str, os.PathLike)):
+        city_scores_df = load_feature_table(city_scores_df)
+    diagnostics = None
 
     try:
         # Make a copy to avoid modifying original dataframe
         df = city_scores_df.copy()
-        
+
         # Select numerical features
         numeric_data = df.select_dtypes(include=['number'])
-        
-        # Standardize the data
+
+        # Standardize the data; missing values (e.g. ACS 1-year estimates for smaller places) become the mean
         scaler = StandardScaler()
-        scaled_data = scaler.fit_transform(numeric_data)
-        
-        # Perform K-means clustering with optimal k=3
-        kmeans = KMeans(n_clusters=3, random_state=42)
+        scaled_data = np.nan_to_num(scaler.fit_transform(numeric_data.to_numpy(dtype=np.float64)), nan=0.0)
+
+        # Pick k from the sweep, or use the given k (k=3 was found to work well for the Illinois cities)
+        if n_clusters == "auto":
+            diagnostics = sweep_k(scaled_data, k_range, n_jobs=n_jobs)
+            n_clusters = select_k(diagnostics, criterion)
+            print(f"Selected k={n_clusters} by {criterion}.")
+        kmeans = KMeans(n_clusters=n_clusters, random_state=RANDOM_STATE, n_init=N_INIT)
         clusters = kmeans.fit_predict(scaled_data)
-        
+
         # Add cluster labels to dataframe
         df['Cluster'] = clusters
-        
+
         print("Clustering completed successfully!")
-        return df
-        
+        return (df, diagnostics) if return_diagnostics else df
+
     except Exception as e:
         print(f"Error occurred during clustering: {str(e)}")
-        return city_scores_df
\ No newline at end of file
+        return (city_scores_df, diagnostics) if return_diagnostics else city_scores_df
+
+def fit_cluster_model(city_scores_df, n_clusters=3, features=None, rubric_version=None,
+                      k_range=DEFAULT_K_RANGE, criterion="silhouette", n_jobs=None):
+    """
+    Fits the scaler and K-means once and returns them as a persistable ClusterModel.
+
+    Args:
+        city_scores_df: DataFrame, or path to a Feather feature table
+        n_clusters: Number of clusters, or "auto" to pick k with sweep_k/select_k
+        features: Feature columns to use; defaults to every numeric column
+        rubric_version: rubric.RUBRIC_VERSION of any score columns, recorded in the model
+        k_range, criterion, n_jobs: As for perform_clustering
+
+    Returns:
+        ClusterModel; cities in a 'City' column are recorded as its members
+    """
+    from sklearn.cluster import KMeans
+    from sklearn.preprocessing import StandardScaler
+    if isinstance(city_scores_df, (str, os.PathLike)):
+        city_scores_df = load_feature_table(city_scores_df)
+    if features is None:
+        features = list(city_scores_df.select_dtypes(include=['number']).columns.drop('Cluster', errors='ignore'))
+
+    scaler = StandardScaler()
+    scaled_data = np.nan_to_num(scaler.fit_transform(city_scores_df[features].to_numpy(dtype=np.float64)), nan=0.0)
+    if n_clusters == "auto":
+        n_clusters = select_k(sweep_k(scaled_data, k_range, n_jobs=n_jobs), criterion)
+    kmeans = KMeans(n_clusters=n_clusters, random_state=RANDOM_STATE, n_init=N_INIT)
+    labels = kmeans.fit_predict(scaled_data)
+
+    members = None
+    if 'City' in city_scores_df.columns:
+        members = dict(zip(city_scores_df['City'].astype(str), labels.tolist()))
+    return ClusterModel(features, scaler.mean_, scaler.scale_, kmeans.cluster_centers_,
+                        rubric_version=rubric_version, members=members)
+
+def kmeans_1d(values, n_clusters):
+    """
+    Exact (globally optimal) k-means of one-dimensional data.
+
+    On sorted values every cluster is a contiguous run, so the optimum follows
+    from a dynamic program over prefix sums. Each layer is solved with the
+    divide-and-conquer optimization (optimal split points are monotone), with
+    every recursion level evaluated as one vectorized batch, for
+    O(k * n * log n) work.
+
+    Args:
+        values: 1-D array without missing values
+        n_clusters: Number of clusters k (at most len(values))
+
+    Returns:
+        (labels, centroids): labels are 0..k-1 in ascending order of centroid
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if not 1 <= n_clusters <= n:
+        raise ValueError(f"Cannot form {n_clusters} clusters from {n} values")
+    order = np.argsort(values, kind="stable")
+    x = values[order]
+    s1 = np.concatenate(([0.0], np.cumsum(x)))
+    s2 = np.concatenate(([0.0], np.cumsum(x * x)))
+
+    def cost(j, i):
+        # Sum of squared deviations of x[j:i]
+        count = i - j
+        total = s1[i] - s1[j]
+        return np.maximum(s2[i] - s2[j] - total * total / count, 0.0)
+
+    idx = np.arange(n + 1)
+    previous = np.full(n + 1, np.inf)
+    previous[1:] = cost(np.zeros(n, dtype=np.int64), idx[1:])
+    splits = []
+    for m in range(2, n_clusters + 1):
+        # current[i]: best cost of the first i values in m clusters; split[i]: start of the m-th cluster
+        current = np.full(n + 1, np.inf)
+        split = np.zeros(n + 1, dtype=np.int64)
+        tasks = np.array([[m, n, m - 1, n - 1]], dtype=np.int64)  # (i_lo, i_hi, j_lo, j_hi)
+        while len(tasks):
+            i_lo, i_hi, j_lo, j_hi = tasks.T
+            mid = (i_lo + i_hi) // 2
+            j_end = np.minimum(j_hi, mid - 1)
+            counts = j_end - j_lo + 1
+            task = np.repeat(np.arange(len(tasks)), counts)
+            starts = np.cumsum(counts) - counts
+            j = j_lo[task] + np.arange(counts.sum()) - starts[task]
+            candidates = previous[j] + cost(j, mid[task])
+            # First minimum of every task's run of candidates
+            best = np.lexsort((candidates, task))[starts]
+            current[mid] = candidates[best]
+            split[mid] = j[best]
+            left = np.stack([i_lo, mid - 1, j_lo, split[mid]], axis=1)
+            right = np.stack([mid + 1, i_hi, split[mid], j_hi], axis=1)
+            tasks = np.concatenate([left[left[:, 0] <= left[:, 1]], right[right[:, 0] <= right[:, 1]]])
+        previous = current
+        splits.append(split)
+
+    bounds = [n]
+    for split in reversed(splits):
+        bounds.append(int(split[bounds[-1]]))
+    bounds = np.array([0] + bounds[::-1])
+    sorted_labels = np.repeat(np.arange(n_clusters), np.diff(bounds))
+    labels = np.empty(n, dtype=np.int64)
+    labels[order] = sorted_labels
+    centroids = (s1[bounds[1:]] - s1[bounds[:-1]]) / np.diff(bounds)
+    return labels, centroids
+
+def _view_name(view):
+    columns = [view] if isinstance(view, str) else list(view)
+    return " + ".join(columns) + " Cluster", columns
+
+def cluster_views(city_scores_df, views, n_clusters=3, random_state=RANDOM_STATE):
+    """
+    Clusters several feature views of the same rows in one call.
+
+    Single-column views are solved exactly with kmeans_1d, so their labels do
+    not depend on a random seed. Multi-column views are standardized and fitted
+    with K-means. In every view cluster IDs are ordered by centroid (ascending
+    value, or ascending mean standardized value for groups), so IDs are
+    comparable between runs.
+
+    Args:
+        city_scores_df: DataFrame with the view columns
+        views: List of column names and/or lists of column names, or a dict of view name -> columns
+        n_clusters: Number of clusters per view
+        random_state: Seed for the multi-column views
+
+    Returns:
+        (labels, centroids): labels is a DataFrame with one '<view> Cluster' column per view
+        (-1 where a value is missing); centroids maps each view name to a DataFrame of
+        cluster centres in the original units, indexed by cluster ID
+    """
+    import pandas as pd
+    from sklearn.cluster import KMeans
+    from sklearn.preprocessing import StandardScaler
+    if isinstance(views, dict):
+        named = [(name, [columns] if isinstance(columns, str) else list(columns)) for name, columns in views.items()]
+    else:
+        named = [_view_name(view) for view in views]
+
+    labels = pd.DataFrame(index=city_scores_df.index)
+    centroids = {}
+    for name, columns in named:
+        data = city_scores_df[columns].to_numpy(dtype=np.float64)
+        present = ~np.isnan(data).any(axis=1)
+        view_labels = np.full(len(data), -1, dtype=np.int64)
+        if len(columns) == 1:
+            view_labels[present], centres = kmeans_1d(data[present, 0], n_clusters)
+            centres = centres[:, None]
+        else:
+            scaler = StandardScaler()
+            scaled = scaler.fit_transform(data[present])
+            kmeans = KMeans(n_clusters=n_clusters, random_state=random_state, n_init=N_INIT).fit(scaled)
+            order = np.argsort(kmeans.cluster_centers_.mean(axis=1), kind="stable")
+            remap = np.argsort(order)
+            view_labels[present] = remap[kmeans.labels_]
+            centres = scaler.inverse_transform(kmeans.cluster_centers_[order])
+        labels[name] = view_labels
+        centroids[name] = pd.DataFrame(centres, columns=columns).rename_axis("Cluster")
+    return labels, centroids
+
+def iter_feature_chunks(path, chunk_size=STREAM_CHUNK_SIZE, columns=None):
+    """
+    Yields a feature file as DataFrames of at most chunk_size rows.
+
+    Feather files are read one record batch at a time and CSV files with pandas'
+    chunked reader, so only the current chunk is held in memory.
+
+    Args:
+        path: Feather or CSV file
+        chunk_size: Rows per chunk
+        columns: Optional subset of columns to read
+    """
+    if str(path).lower().endswith(".csv"):
+        import pandas as pd
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size)
+        return
+    import pyarrow as pa
+    with pa.OSFile(str(path), "rb") as source:
+        reader = pa.ipc.open_file(source)
+        pending = []
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            pending.append(batch.select(columns) if columns is not None else batch)
+            table = pa.Table.from_batches(pending)
+            while table.num_rows >= chunk_size:
+                yield table.slice(0, chunk_size).to_pandas()
+                table = table.slice(chunk_size)
+            pending = table.combine_chunks().to_batches()
+        if any(batch.num_rows for batch in pending):
+            yield pa.Table.from_batches(pending).to_pandas()
+
+class _ChunkWriter:
+    """Appends label chunks to a CSV file or an uncompressed Feather (Arrow IPC) file."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.csv = self.path.lower().endswith(".csv")
+        self._writer = None
+        self._sink = None
+
+    def write(self, df):
+        if self.csv:
+            df.to_csv(self.path, mode="w" if self._writer is None else "a",
+                      header=self._writer is None, index=False)
+            self._writer = True
+            return
+        import pyarrow as pa
+        batch = pa.RecordBatch.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._sink = pa.OSFile(self.path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, batch.schema)
+        self._writer.write_batch(batch)
+
+    def close(self):
+        if not self.csv and self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+
+def stream_clustering(path, output_path, n_clusters=3, chunk_size=STREAM_CHUNK_SIZE,
+                      batch_size=STREAM_BATCH_SIZE, n_epochs=1, id_columns=("City", "GEO_ID"),
+                      random_state=RANDOM_STATE):
+    """
+    Out-of-core counterpart of perform_clustering for feature files too large to load at once.
+
+    The file is read in chunks three times: StandardScaler.partial_fit learns the
+    scaling, MiniBatchKMeans.partial_fit learns the centroids (n_epochs passes),
+    and a final pass writes the identifier columns and 'Cluster' labels to
+    output_path chunk by chunk. Memory use depends on chunk_size, not on the
+    number of rows. Missing values are imputed with the column mean.
+
+    Args:
+        path: Feather or CSV feature file (e.g. written by buildFeatures.py)
+        output_path: Where labels are written; CSV if it ends in .csv, Feather otherwise
+        n_clusters: Number of clusters
+        chunk_size: Rows read from disk at a time
+        batch_size: Rows per mini-batch centroid update
+        n_epochs: Passes over the data while fitting the centroids
+        id_columns: Columns copied next to the labels when present
+        random_state: Seed for MiniBatchKMeans
+
+    Returns:
+        dict with the fitted scaler and kmeans, a ClusterModel, the row count, the total inertia
+        and the output path. Labels in the output file are the model's canonical cluster IDs.
+    """
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.preprocessing import StandardScaler
+    first = next(iter_feature_chunks(path, chunk_size=1))
+    features = list(first.select_dtypes(include=['number']).columns)
+    ids = [column for column in id_columns if column in first.columns]
+
+    scaler = StandardScaler()
+    for chunk in iter_feature_chunks(path, chunk_size, features):
+        scaler.partial_fit(chunk.to_numpy(dtype=np.float64))
+
+    def scaled_chunks():
+        for chunk in iter_feature_chunks(path, chunk_size, features + ids):
+            scaled = scaler.transform(chunk[features].to_numpy(dtype=np.float64))
+            yield chunk, np.nan_to_num(scaled, nan=0.0)
+
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, n_init=3,
+                             random_state=random_state)
+    for _ in range(n_epochs):
+        for _, scaled in scaled_chunks():
+            for start in range(0, len(scaled), batch_size):
+                batch = scaled[start:start + batch_size]
+                # The first update initializes the centroids and needs at least n_clusters rows
+                if len(batch) >= n_clusters or hasattr(kmeans, "cluster_centers_"):
+                    kmeans.partial_fit(batch)
+
+    model = ClusterModel(features, scaler.mean_, scaler.scale_, kmeans.cluster_centers_)
+    remap = np.argsort(np.lexsort(kmeans.cluster_centers_.T[::-1]))
+
+    rows = 0
+    inertia = 0.0
+    writer = _ChunkWriter(output_path)
+    try:
+        for chunk, scaled in scaled_chunks():
+            distances = kmeans.transform(scaled)
+            labels = distances.argmin(axis=1)
+            inertia += float(np.square(distances[np.arange(len(labels)), labels]).sum())
+            out = chunk[ids].astype({column: str for column in ids}).reset_index(drop=True)
+            out['Cluster'] = remap[labels].astype(np.int32)
+            writer.write(out)
+            rows += len(out)
+    finally:
+        writer.close()
+
+    print(f"Streaming clustering completed: {rows} rows written to {output_path}")
+    return {"scaler": scaler, "kmeans": kmeans, "model": model, "rows": rows, "inertia": inertia,
+            "output_path": str(output_path)}
@@ -0,0 +1,101 @@
+"""
+Command-line entry point for the Census data collection modules.
+
+Importing getCensusData, getEducationData, getIncomeData or getProfileData
+never contacts the Census API; data is only fetched when one of their
+get_* functions is called, e.g. through this script.
+
+Usage:
+    python collectData.py education [--refresh] [--output education.csv]
+    python collectData.py census --base-url https://api.census.gov/data/2023/acs/acs5/profile --group DP03
+    python collectData.py features [--refresh] [--output-dir features]
+
+Places default to the study places (study_places.txt); --state, --county and
+--all-places select any other subset of the place registry (see placeRegistry).
+"""
+import argparse
+
+
+def select_places(state=None, county=None, all_places=False):
+    """
+    Returns the City name -> GEOID mapping to fetch.
+
+    Args:
+        state (str): Keep only places in this state (USPS or FIPS code)
+        county (str): Keep only places lying at least partly in this county
+        all_places (bool): Start from every place in the registry instead of the study places
+    """
+    import placeRegistry
+    registry = placeRegistry.get_default_registry() if all_places else placeRegistry.study_places()
+    return registry.filter(state=state, county=county).cities()
+
+
+def fetch(source, refresh=False, base_url=None, group=None, cities=None):
+    """
+    Fetches one data source.
+
+    Args:
+        source (str): "education", "income", "profile" or "census"
+        refresh (bool): Ignore the local Census cache
+        base_url (str): Census API endpoint, for "census"
+        group (str): Census group ID, for "census"
+        cities (dict): City name -> GEOID mapping; defaults to the study places
+
+    Returns:
+        pd.DataFrame, or None if no data was retrieved
+    """
+    if source == "education":
+        import getEducationData
+        return getEducationData.get_education_data(refresh=refresh, cities=cities)
+    if source == "income":
+        import getIncomeData
+        return getIncomeData.get_income_data(refresh=refresh, cities=cities)
+    if source == "profile":
+        import getProfileData
+        return getProfileData.get_profile_data(refresh=refresh, cities=cities)
+    if source == "census":
+        import getCensusData
+        return getCensusData.get_census_data(base_url=base_url, group_id=group, refresh=refresh,
+                                             cities=cities)
+    raise ValueError(f"Unknown data source: {source}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch demographic data from the Census API.")
+    parser.add_argument("source", choices=["education", "income", "profile", "census", "features"])
+    parser.add_argument("--refresh", action="store_true", help="Ignore the local Census cache")
+    parser.add_argument("--output", help="Write the table to this CSV file instead of printing it")
+    parser.add_argument("--base-url", help="Census API endpoint (census only)")
+    parser.add_argument("--group", help="Census group ID, e.g. DP03 (census only)")
+    parser.add_argument("--output-dir", help="Feature table directory (features only)")
+    parser.add_argument("--state", help="Only places in this state, e.g. IL")
+    parser.add_argument("--county", help="Only places in this county, e.g. Cook")
+    parser.add_argument("--all-places", action="store_true",
+                        help="Select from every registered place instead of the study places")
+    args = parser.parse_args(argv)
+    cities = select_places(args.state, args.county, args.all_places)
+    if not cities:
+        parser.error("no places match the selection")
+
+    if args.source == "features":
+        import buildFeatures
+        features = buildFeatures.build_feature_table(cities=cities, refresh=args.refresh)
+        path = buildFeatures.write_feature_table(features, args.output_dir or buildFeatures.FEATURE_DIR)
+        print(f"Wrote {len(features)} rows x {features.shape[1]} columns to {path}")
+        return
+
+    if args.source == "census" and not (args.base_url and args.group):
+        parser.error("census requires --base-url and --group")
+    df = fetch(args.source, refresh=args.refresh, base_url=args.base_url, group=args.group,
+               cities=cities)
+    if df is None:
+        print("No data was retrieved.")
+    elif args.output:
+        df.to_csv(args.output, index=False)
+        print(f"Wrote {len(df)} rows to {args.output}")
+    else:
+        print(df)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,138 +1,250 @@
-import requests
-import pandas as pd
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def get_census_data(base_url, group_id):
+import censusCache
+import placeRegistry
+from placeRegistry import PLACE_PREFIX
+
+
+def __getattr__(name):
+    # CITIES_GEOIDS is read from the place registry on first use, so importing this module stays free of I/O
+    if name == "CITIES_GEOIDS":
+        return placeRegistry.study_places().cities()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Concurrency and retry settings for Census API requests
+MAX_WORKERS = 8
+MAX_RETRIES = 5
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+REQUEST_TIMEOUT = 30
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Returns a shared requests.Session whose connection pool is sized for MAX_WORKERS,
+    so concurrent requests reuse TLS connections instead of opening new ones.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def fetch_json(url, params, max_retries=MAX_RETRIES, base_delay=0.5, max_delay=30.0):
+    """
+    GETs a Census API URL and decodes the JSON body, retrying 429/5xx responses and
+    connection errors with exponential backoff and full jitter.
+
+    Args:
+        url (str): Request URL
+        params (dict): Query parameters
+        max_retries (int): Retries before the last error is raised
+        base_delay (float): Upper bound of the first backoff delay in seconds
+        max_delay (float): Upper bound of any single backoff delay in seconds
+
+    Returns:
+        The decoded JSON body, or None for an empty (204) response.
+    """
+    import requests
+    session = get_session()
+    for attempt in range(max_retries + 1):
+        try:
+            response = session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+            if response.status_code in RETRY_STATUS_CODES and attempt < max_retries:
+                retry_after = response.headers.get("Retry-After")
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else \
+                    random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+                time.sleep(delay)
+                continue
+            response.raise_for_status()
+            if response.status_code == 204 or not response.content:
+                return None
+            return response.json()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == max_retries:
+                raise
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+
+UCGID_BATCH_SIZE = 50  # GEOIDs packed into one ucgid list for non-place geographies
+MAX_VARIABLES = 50  # Census API limit on the number of variables in one "get"
+
+# Census annotation values that stand for "not available" in numeric columns
+MISSING_VALUE_CODES = [-999999999, -888888888, -666666666, -555555555, -333333333, -222222222]
+
+
+def build_requests(geoids):
+    """
+    Packs GEOIDs into as few Census API queries as possible.
+
+    Place GEOIDs are grouped by state and fetched with one ``for=place:*&in=state:SS``
+    query per state; any other geography is sent as comma-separated ``ucgid`` lists.
+
+    Returns:
+        list[dict]: Geography query parameters, one dict per request
+    """
+    states = []
+    others = []
+    for geoid in geoids:
+        if geoid.startswith(PLACE_PREFIX):
+            state = geoid[len(PLACE_PREFIX):len(PLACE_PREFIX) + 2]
+            if state not in states:
+                states.append(state)
+        else:
+            others.append(geoid)
+
+    queries = [{"for": "place:*", "in": f"state:{state}"} for state in states]
+    for start in range(0, len(others), UCGID_BATCH_SIZE):
+        queries.append({"ucgid": ",".join(others[start:start + UCGID_BATCH_SIZE])})
+    return queries
+
+
+def is_numeric_variable(name):
+    """True for estimate/margin variables (e.g. S1901_C01_012E, DP03_0009PE, S1501_C01_001M)."""
+    return re.fullmatch(r"[A-Z]+\d+[A-Z]?_\w+?(E|M|PE|PM)", name) is not None
+
+
+def get_census_data(base_url, group_id, max_workers=MAX_WORKERS, cities=None, use_cache=True, refresh=False,
+                    variables=None):
     """
     Fetches ACS5 data from the Census API for a specified base URL and group ID across predefined cities.
 
+    Geographies are batched into one request per state (see build_requests), the
+    requests run concurrently over a pooled session, and every response is decoded
+    straight into one DataFrame. Rows keep the order of the ``cities`` mapping.
+
+    Complete results are stored in the local Census cache (see censusCache), so
+    warm runs make no network calls until the entry expires or a newer ACS
+    vintage of the same group is fetched.
+
     Args:
         base_url (str): The Census API endpoint URL (e.g., for subject or profile data)
         group_id (str): The Census group ID (e.g., 'DP03' or 'S1501')
+        max_workers (int): Maximum number of requests in flight
+        cities (dict): City name -> GEOID mapping to fetch (e.g. placeRegistry.PlaceRegistry.cities());
+            defaults to the study places listed in study_places.txt
+        use_cache (bool): Read and write the local Census cache
+        refresh (bool): Ignore any cached entry and fetch again (the new result is still cached)
+        variables (list): Variables to request instead of the whole group(...) table; estimate and
+            margin columns are parsed to numbers as the response is decoded
 
     Returns:
         pd.DataFrame: Combined DataFrame containing data for all cities, or None if no data was retrieved.
     """
-    cities_geoids = {
-              "Algonquin": "1600000US1700685",
-        "Arlington Heights": "1600000US1702154",
-        "Aurora": "1600000US1703012",
-       "Alsip": "1600000US1701010",
-        "Bannockburn": "1600000US1703610",
-        "Bartlett": "1600000US1704013",
-       "Batavia": "1600000US1704078",
-        "Beach Park": "1600000US1704303",
-        "Belleville": "1600000US1704845",
-        "Bensenville": "1600000US1705248",
-        "Berwyn": "1600000US1705573",
-        "Bloomington": "1600000US1706613",
-        "Bolingbrook": "1600000US1707133",
-        "Brookfield": "1600000US1708576",
-        "Buffalo Grove": "1600000US1709447",
-        "Carbondale": "1600000US1711163",
-        "Carol Stream": "1600000US1711490",
-        "Carpentersville": "1600000US1711358",
-        "Champaign": "1600000US1712385",
-        "Chicago": "1600000US1714000",
-        "Cicero": "1600000US1714351",
-        "Countryside": "1600000US1716873",
-        "Crystal Lake": "1600000US1717887",
-        "Decatur": "1600000US1718919",
-        "DeKalb": "1600000US1719214",
-        "Deer Park": "1600000US1719083",
-       "Decatur": "1600000US1718823",
-        "Des Plaines": "1600000US1719642",
-        "Downers Grove": "1600000US1720591",
-        "Elgin": "1600000US1723074",
-        "Elk Grove Village": "1600000US1723256",
-        "Elmhurst": "1600000US1723620",
-        "Evanston": "1600000US1724582",
-        "Glenview": "1600000US1730190",
-        "Geneva": "1600000US1728872",
-        "Grayslake": "1600000US1731121",
-        "Hanover Park": "1600000US1732746",
-        "Hoffman Estates": "1600000US1735411",
-        "Joliet": "1600000US1738801",
-        "La Grange": "1600000US1740767",
-        "Lombard": "1600000US1744407",
-        "Moline": "1600000US1749867",
-        "Mount Prospect": "1600000US1751089",
-        "Naperville": "1600000US1751622",
-        "Normal": "1600000US1753590",
-        "Northbrook": "1600000US1753234",
-        "Oak Lawn": "1600000US1754820",
-        "Oak Park": "1600000US1754885",
-        "Orland Park": "1600000US1756640",
-        "Palatine": "1600000US1757225",
-        "Park Ridge": "1600000US1757875",
-        "Peoria": "1600000US1759000",
-        "Plainfield": "1600000US1760287",
-        "Quincy": "1600000US1762389",
-        "Rock Island": "1600000US1765092",
-        "Rockford": "1600000US1765001",
-        "Rolling Meadows": "1600000US1765338",
-        "Romeoville": "1600000US1765429",
-        "Schaumburg": "1600000US1768084",
-        "Skokie": "1600000US1770122",
-        "Springfield": "1600000US1772000",
-        "Streamwood": "1600000US1773157",
-        "Tinley Park": "1600000US1775484",
-        "Urbana": "1600000US1777007",
-        "Waukegan": "1600000US1779293",
-        "Wheaton": "1600000US1781048",
-        "Wheeling": "1600000US1781087",
-        "Wilmette": "1600000US1782075"
-    }
-
-    params = {
-        "get": f"group({group_id})"
-    }
-
-    all_data_frames = []
-
-    for city, geoid in cities_geoids.items():
-        print(f"Fetching data for: {city} (GEOID: {geoid})")
-        current_params = params.copy()
-        current_params["ucgid"] = geoid
+    import pandas as pd
+    import requests
 
-        try:
-            response = requests.get(base_url, params=current_params)
-            response.raise_for_status()
+    if cities is None:
+        cities = placeRegistry.study_places().cities()
+    city_by_geoid = {geoid: city for city, geoid in cities.items()}
 
-            data = response.json()
+    if variables is not None:
+        variables = list(dict.fromkeys(variables))
+        if len(variables) + 2 > MAX_VARIABLES:
+            raise ValueError(f"At most {MAX_VARIABLES - 2} variables can be requested at once, got {len(variables)}")
+        get = ",".join(["NAME", "GEO_ID"] + variables)
+    else:
+        get = f"group({group_id})"
 
-            if data and len(data) > 1:
-                header = data[0]
-                records = data[1:]
-                df_city = pd.DataFrame(records, columns=header)
-                df_city['City'] = city
-                all_data_frames.append(df_city)
-                print(f" -> Success.")
-            else:
-                print(f" -> No data returned for {city}.")
+    cache = censusCache.get_default_cache() if use_cache else None
+    if cache is not None and not refresh:
+        cached = cache.get(base_url, group_id, list(city_by_geoid), variables)
+        if cached is not None:
+            print(f"Loaded {group_id} for {len(cached)} cities from the local cache.")
+            return cached
 
+    def fetch(geography):
+        params = {"get": get, **geography}
+        try:
+            data = fetch_json(base_url, params)
         except requests.exceptions.RequestException as e:
-            print(f" -> Error fetching data for {city}: {e}")
-        except Exception as e:
-            print(f" -> An error occurred processing data for {city}: {e}")
-
-    if all_data_frames:
-        final_df = pd.concat(all_data_frames, ignore_index=True)
-        cols = ['City'] + [col for col in final_df.columns if col != 'City']
-        final_df = final_df[cols]
-        return final_df
-    else:
+            print(f" -> Error fetching {geography}: {e}")
+            return None, [], False
+        if not data or len(data) < 2:
+            print(f" -> No data returned for {geography}.")
+            return None, [], True
+        return data[0], data[1:], True
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        responses = list(executor.map(fetch, build_requests(city_by_geoid)))
+
+    headers = [h for h, _, _ in responses if h is not None]
+    if not headers:
         print("No data was successfully retrieved for any city.")
         return None
 
-# Example usage for profile data:
-profile_df = get_census_data(
-    base_url="https://api.census.gov/data/2023/acs/acs5/profile",
-    group_id="DP03"
-)
-
-# Example usage for subject data:
-# subject_df = get_census_data(
-#     base_url="https://api.census.gov/data/2023/acs/acs5/subject",
-#     group_id="S1501"
-# )
+    # Decode every response once into a single frame. Batches can come back with different
+    # columns (e.g. ucgid vs. state/place queries), so rows are aligned to the union by name.
+    header = list(dict.fromkeys(name for h in headers for name in h))
+    records = []
+    geo_ids = []
+    for h, rows, _ in responses:
+        if h is None:
+            continue
+        columns = {name: i for i, name in enumerate(h)}
+        records.extend([row[columns[name]] if name in columns else None for name in header] for row in rows)
+        if "GEO_ID" in columns:
+            geo_ids.extend(row[columns["GEO_ID"]] for row in rows)
+        else:
+            geo_ids.extend(PLACE_PREFIX + row[columns["state"]] + row[columns["place"]] for row in rows)
+
+    returned = pd.Series(geo_ids, dtype=object)
+    order = {geoid: i for i, geoid in enumerate(city_by_geoid)}
+
+    # State-wide responses carry every place in the state; keep the requested ones in request order
+    final_df = pd.DataFrame(records, columns=header)
+    final_df.insert(0, "City", returned.map(city_by_geoid).to_numpy())
+    final_df = final_df.assign(_order=returned.map(order).to_numpy()) \
+        .dropna(subset=["_order"]) \
+        .sort_values("_order", kind="stable") \
+        .drop(columns=["_order", "state", "place"], errors="ignore") \
+        .reset_index(drop=True)
+
+    # Parse numeric columns once here instead of leaving object strings for every consumer
+    numeric = [c for c in final_df.columns if is_numeric_variable(c)]
+    if numeric:
+        values = final_df[numeric].apply(pd.to_numeric, errors="coerce")
+        final_df[numeric] = values.mask(values.isin(MISSING_VALUE_CODES))
+
+    found = set(geo_ids)
+    missing = [city for city, geoid in cities.items() if geoid not in found]
+    if missing:
+        print(f" -> No data returned for: {', '.join(missing)}")
+    print(f"Fetched {group_id} for {len(final_df)} cities in {len(responses)} requests.")
+
+    if final_df.empty:
+        print("No data was successfully retrieved for any city.")
+        return None
+
+    # Only cache complete pulls, so a transient failure is retried next run
+    if cache is not None and all(ok for _, _, ok in responses):
+        cache.put(base_url, group_id, list(city_by_geoid), final_df, variables)
+    return final_df
+
+
+if __name__ == "__main__":
+    # Example usage for profile data:
+    profile_df = get_census_data(
+        base_url="https://api.census.gov/data/2023/acs/acs5/profile",
+        group_id="DP03"
+    )
+
+    # Example usage for subject data:
+    # subject_df = get_census_data(
+    #     base_url="https://api.census.gov/data/2023/acs/acs5/subject",
+    #     group_id="S1501"
+    # )
 
@@ -1,40 +1,44 @@
-import pandas as pd
-import requests
 import getCensusData
 
 
+# ACS table the education data comes from
+BASE_URL = "https://api.census.gov/data/2023/acs/acs1/subject"
+GROUP_ID = "S1501"
+
+# Census variable -> column name for the education table; only these variables are requested
+EDUCATION_COLUMNS = {
+    'S1501_C02_001E': 'Total Population',
+    'S1501_C02_002E': 'Less than high school graduate',
+    'S1501_C02_003E': 'High school graduate (includes equivalency)',
+    'S1501_C02_004E': 'Some college or associate\'s degree',
+    'S1501_C02_005E': 'Bachelor\'s degree',
+    'S1501_C02_006E': 'Graduate or professional degree'
+}
+
+
 def cleaning_education_data(data_education):
     # Drop unnecessary columns
-    data_education = data_education.drop(columns=['NAME', 'S1501_C01_001E', 'S1501_C01_001M'])
+    data_education = data_education.drop(columns=['NAME', 'S1501_C01_001E', 'S1501_C01_001M'], errors='ignore')
 
     # Rename columns for clarity
-    data_education = data_education.rename(columns={
-        'S1501_C02_001E': 'Total Population',
-        'S1501_C02_002E': 'Less than high school graduate',
-        'S1501_C02_003E': 'High school graduate (includes equivalency)',
-        'S1501_C02_004E': 'Some college or associate\'s degree',
-        'S1501_C02_005E': 'Bachelor\'s degree',
-        'S1501_C02_006E': 'Graduate or professional degree'
-    })
-
-    data_education = data_education[[
-        'City',
-        'Total Population',
-        'Less than high school graduate',
-        'High school graduate (includes equivalency)',
-        'Some college or associate\'s degree',
-        'Bachelor\'s degree',
-        'Graduate or professional degree'
-    ]]
+    data_education = data_education.rename(columns=EDUCATION_COLUMNS)
+
+    data_education = data_education[['City'] + list(EDUCATION_COLUMNS.values())]
 
     return data_education
 
-def get_education_data():
+def get_education_data(refresh=False, cities=None):
     data_education = getCensusData.get_census_data(
-        base_url="https://api.census.gov/data/2023/acs/acs1/subject",
-        group_id="S1501"
+        base_url=BASE_URL,
+        group_id=GROUP_ID,
+        variables=list(EDUCATION_COLUMNS),
+        refresh=refresh,
+        cities=cities
     )
 
+    if data_education is None:
+        return None
+
     data_education = cleaning_education_data(data_education)
     return data_education
 
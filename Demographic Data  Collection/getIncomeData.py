@@ -1,36 +1,43 @@
-import pandas as pd
-import requests
 import getCensusData
 
 
+# ACS table the income data comes from
+BASE_URL = "https://api.census.gov/data/2023/acs/acs1/subject"
+GROUP_ID = "S1901"
+
+# Census variable -> column name for the income table; only these variables are requested
+INCOME_COLUMNS = {
+    'S1901_C01_012E': 'Median Income',
+    'S1901_C01_013E': 'Mean Income'
+}
+
 
 def cleaning_income_data (data_income):
     # Drop unnecessary columns
   # data_income = data_income.drop(columns=['NAME', 'S1501_C01_001E', 'S1501_C01_001M'])
 
     # Rename columns for clarity
-  data_income.rename(columns={
-        'S1901_C01_012E': 'Median Income',
-        'S1901_C01_013E': 'Mean Income'
-    }, inplace=True)
+  data_income.rename(columns=INCOME_COLUMNS, inplace=True)
 
-  data_income = data_income[[
-        'City',
-        'Median Income',
-        'Mean Income'
-    ]]
+  data_income = data_income[['City'] + list(INCOME_COLUMNS.values())]
 
   return data_income
 
-def get_income_data():
+def get_income_data(refresh=False, cities=None):
     data_income = getCensusData.get_census_data(
-        base_url="https://api.census.gov/data/2023/acs/acs1/subject",
-        group_id="S1901"
+        base_url=BASE_URL,
+        group_id=GROUP_ID,
+        variables=list(INCOME_COLUMNS),
+        refresh=refresh,
+        cities=cities
     )
+    if data_income is None:
+        return None
     data_income = cleaning_income_data(data_income)
     return data_income
 
 
-# Example usage for income data:
-income_df = get_income_data()
-print(income_df)
\ No newline at end of file
+if __name__ == "__main__":
+    # Example usage for income data:
+    income_df = get_income_data()
+    print(income_df)
\ No newline at end of file
@@ -0,0 +1,43 @@
+import getCensusData
+
+
+# ACS table the economic profile data comes from
+BASE_URL = "https://api.census.gov/data/2023/acs/acs5/profile"
+GROUP_ID = "DP03"
+
+# Census variable -> column name for the economic profile table; only these variables are requested
+PROFILE_COLUMNS = {
+    'DP03_0001E': 'Population 16 Years and Over',
+    'DP03_0009PE': 'Unemployment Rate',
+    'DP03_0062E': 'Median Household Income',
+    'DP03_0063E': 'Mean Household Income'
+}
+
+
+def cleaning_profile_data(data_profile):
+    # Rename columns for clarity
+    data_profile = data_profile.rename(columns=PROFILE_COLUMNS)
+
+    data_profile = data_profile[['City'] + list(PROFILE_COLUMNS.values())]
+
+    return data_profile
+
+
+def get_profile_data(refresh=False, cities=None):
+    data_profile = getCensusData.get_census_data(
+        base_url=BASE_URL,
+        group_id=GROUP_ID,
+        variables=list(PROFILE_COLUMNS),
+        refresh=refresh,
+        cities=cities
+    )
+
+    if data_profile is None:
+        return None
+
+    data_profile = cleaning_profile_data(data_profile)
+    return data_profile
+
+
+if __name__ == "__main__":
+    print(get_profile_data())
@@ -0,0 +1,325 @@
+"""
+Registry of Census places (GEOID, name, state, counties) loaded from a compact local file.
+
+places.csv holds one row per place; study_places.txt lists the GEOIDs fetched
+by default. Both are plain data, so adding a city or fetching a whole state
+needs no code changes. To cover every place in a state, import the Census
+place-by-county file (or a place Gazetteer file, which has no counties):
+
+    python placeRegistry.py import national_place_by_county2020.txt --state IL
+
+Names that map to more than one GEOID are reported when the registry is
+loaded, and name lookups raise AmbiguousPlaceError for them instead of
+picking one.
+
+Example:
+    registry = get_default_registry()
+    registry.lookup("Naperville").geoid
+    registry.filter(state="IL", county="Cook").cities()
+"""
+import argparse
+import csv
+import os
+import re
+import threading
+from typing import NamedTuple
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+PLACES_PATH = os.environ.get("PLACES_FILE", os.path.join(DATA_DIR, "places.csv"))
+STUDY_PLACES_PATH = os.environ.get("STUDY_PLACES_FILE", os.path.join(DATA_DIR, "study_places.txt"))
+
+PLACE_PREFIX = "1600000US"  # Summary level 160 (place) GEOIDs: 1600000US + 2-digit state + 5-digit place
+
+# Legal/statistical area descriptions the Census appends to place names ("Decatur city")
+LSAD_SUFFIXES = ("city", "village", "town", "borough", "cdp", "municipality")
+
+STATE_FIPS = {
+    "AL": "01", "AK": "02", "AZ": "04", "AR": "05", "CA": "06", "CO": "08", "CT": "09", "DE": "10", "DC": "11",
+    "FL": "12", "GA": "13", "HI": "15", "ID": "16", "IL": "17", "IN": "18", "IA": "19", "KS": "20", "KY": "21",
+    "LA": "22", "ME": "23", "MD": "24", "MA": "25", "MI": "26", "MN": "27", "MS": "28", "MO": "29", "MT": "30",
+    "NE": "31", "NV": "32", "NH": "33", "NJ": "34", "NM": "35", "NY": "36", "NC": "37", "ND": "38", "OH": "39",
+    "OK": "40", "OR": "41", "PA": "42", "RI": "44", "SC": "45", "SD": "46", "TN": "47", "TX": "48", "UT": "49",
+    "VT": "50", "VA": "51", "WA": "53", "WV": "54", "WI": "55", "WY": "56", "PR": "72",
+}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+class Place(NamedTuple):
+    geoid: str
+    name: str
+    lsad: str
+    state: str
+    counties: tuple
+
+    @property
+    def state_fips(self):
+        return self.geoid[len(PLACE_PREFIX):len(PLACE_PREFIX) + 2]
+
+
+class AmbiguousPlaceError(KeyError):
+    """Raised when a name matches several places; ``places`` holds the candidates."""
+
+    def __init__(self, name, places):
+        super().__init__(f"{name!r} matches {len(places)} places: " +
+                         ", ".join(f"{p.geoid} ({', '.join(p.counties) or p.state})" for p in places))
+        self.places = places
+
+
+def normalize_name(name):
+    """
+    Normalizes a place name for lookups: case, punctuation and a trailing LSAD are ignored.
+
+    "Decatur city", "DECATUR" and "Decatur" all normalize to "decatur";
+    "O'Fallon" and "O Fallon" to "o fallon".
+    """
+    words = _NON_ALNUM.sub(" ", name.lower()).split()
+    if len(words) > 1 and words[-1] in LSAD_SUFFIXES:
+        words = words[:-1]
+    return " ".join(words)
+
+
+def _normalize_county(county):
+    words = normalize_name(county).split()
+    return " ".join(words[:-1] if words and words[-1] in ("county", "parish") else words)
+
+
+def _state_code(state):
+    state = str(state).upper()
+    return state if len(state) == 2 and state.isdigit() else STATE_FIPS.get(state, state)
+
+
+class PlaceRegistry:
+    """
+    Places indexed by GEOID and by normalized name.
+
+    Duplicate GEOIDs are an error. Names shared by several places are kept and
+    listed in ``ambiguous``; use the GEOID or a state/county filter to tell
+    them apart.
+    """
+
+    def __init__(self, places):
+        self.places = []
+        self._by_geoid = {}
+        self._by_name = {}
+        for place in places:
+            if place.geoid in self._by_geoid:
+                raise ValueError(f"Duplicate GEOID {place.geoid}: {self._by_geoid[place.geoid].name} and {place.name}")
+            self._by_geoid[place.geoid] = place
+            self._by_name.setdefault(normalize_name(place.name), []).append(place)
+            self.places.append(place)
+        self.ambiguous = {}
+        for name, matches in self._by_name.items():
+            # Same name in different states is normal; only duplicates within a state are ambiguous
+            states = [p.state for p in matches]
+            if len(set(states)) < len(states):
+                self.ambiguous[name] = matches
+
+    def __len__(self):
+        return len(self.places)
+
+    def __iter__(self):
+        return iter(self.places)
+
+    def __contains__(self, geoid):
+        return geoid in self._by_geoid
+
+    def get(self, geoid):
+        """Returns the place with a GEOID, or None."""
+        return self._by_geoid.get(geoid)
+
+    def find(self, name, state=None):
+        """Returns every place whose normalized name matches, optionally within a state."""
+        matches = self._by_name.get(normalize_name(name), [])
+        if state is not None:
+            code = _state_code(state)
+            matches = [p for p in matches if p.state_fips == code]
+        return list(matches)
+
+    def lookup(self, name, state=None):
+        """
+        Returns the single place with a name.
+
+        Raises:
+            KeyError: No place has the name
+            AmbiguousPlaceError: Several places have the name
+        """
+        matches = self.find(name, state)
+        if not matches:
+            raise KeyError(f"Unknown place: {name}")
+        if len(matches) > 1:
+            raise AmbiguousPlaceError(name, matches)
+        return matches[0]
+
+    def filter(self, state=None, county=None, geoids=None):
+        """
+        Returns a registry with the places matching every given filter.
+
+        Args:
+            state: USPS code ("IL") or FIPS code ("17")
+            county: County name, with or without the "County" suffix; matches places
+                that lie at least partly in the county
+            geoids: Iterable of GEOIDs; the result follows its order
+        """
+        if geoids is not None:
+            places = [self._by_geoid[g] for g in geoids if g in self._by_geoid]
+        else:
+            places = self.places
+        if state is not None:
+            code = _state_code(state)
+            places = [p for p in places if p.state_fips == code]
+        if county is not None:
+            wanted = _normalize_county(county)
+            places = [p for p in places if any(_normalize_county(c) == wanted for c in p.counties)]
+        return PlaceRegistry(places)
+
+    def labels(self):
+        """
+        Returns GEOID -> display name.
+
+        Names are used as they are unless several places share one, in which case
+        the county (or, failing that, the GEOID) is added: "Decatur (Macon County)".
+        """
+        labels = {}
+        for place in self.places:
+            siblings = [p for p in self._by_name[normalize_name(place.name)] if p.state == place.state]
+            if len(siblings) == 1:
+                labels[place.geoid] = place.name
+                continue
+            counties = [p.counties for p in siblings]
+            if place.counties and counties.count(place.counties) == 1:
+                labels[place.geoid] = f"{place.name} ({', '.join(place.counties)})"
+            else:
+                labels[place.geoid] = f"{place.name} ({place.geoid})"
+        return labels
+
+    def cities(self):
+        """Returns the places as a display name -> GEOID dict, as taken by getCensusData.get_census_data."""
+        return {label: geoid for geoid, label in self.labels().items()}
+
+    def to_csv(self, path):
+        """Writes the registry in the compact places.csv format."""
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(["geoid", "name", "lsad", "state", "counties"])
+            for p in self.places:
+                writer.writerow([p.geoid, p.name, p.lsad, p.state, "|".join(p.counties)])
+
+
+def load_places(path=PLACES_PATH):
+    """Loads a places.csv file into a PlaceRegistry and reports ambiguous names."""
+    with open(path, newline="", encoding="utf-8") as f:
+        registry = PlaceRegistry(
+            Place(row["geoid"], row["name"], row["lsad"], row["state"],
+                  tuple(c for c in row["counties"].split("|") if c))
+            for row in csv.DictReader(f)
+        )
+    for matches in registry.ambiguous.values():
+        print(f"Warning: {matches[0].name} ({matches[0].state}) is ambiguous: "
+              f"{', '.join(p.geoid for p in matches)}")
+    return registry
+
+
+def read_geoids(path=STUDY_PLACES_PATH):
+    """Reads a GEOID list file: one GEOID per line, # starts a comment."""
+    with open(path, encoding="utf-8") as f:
+        return [line.split("#", 1)[0].strip() for line in f if line.split("#", 1)[0].strip()]
+
+
+def _split_lsad(full_name):
+    words = full_name.split()
+    if len(words) > 1 and words[-1].lower() in LSAD_SUFFIXES:
+        return " ".join(words[:-1]), words[-1].lower()
+    return full_name, ""
+
+
+def from_census_file(path, state=None):
+    """
+    Builds a registry from a Census place file.
+
+    Supported formats are the pipe-delimited place-by-county file
+    (national_place_by_county2020.txt: one row per place and county) and the
+    tab-delimited place Gazetteer file (no county information).
+
+    Args:
+        path: Census file
+        state: Optional USPS or FIPS code to keep only one state's places
+    """
+    code = _state_code(state) if state is not None else None
+    places = {}
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        header = f.readline()
+        delimiter = "|" if "|" in header else "\t"
+        columns = [c.strip() for c in header.split(delimiter)]
+        for values in csv.reader(f, delimiter=delimiter):
+            row = dict(zip(columns, (v.strip() for v in values)))
+            if "PLACEFP" in row:
+                geoid = PLACE_PREFIX + row["STATEFP"] + row["PLACEFP"]
+                full_name, usps, county = row["PLACENAME"], row["STATE"], row.get("COUNTYNAME", "")
+            else:
+                geoid = PLACE_PREFIX + row["GEOID"]
+                full_name, usps, county = row["NAME"], row["USPS"], ""
+            if code is not None and geoid[len(PLACE_PREFIX):len(PLACE_PREFIX) + 2] != code:
+                continue
+            if geoid in places:
+                # Place-by-county files repeat a place once per county it lies in
+                place = places[geoid]
+                if county and county not in place.counties:
+                    places[geoid] = place._replace(counties=place.counties + (county,))
+                continue
+            name, lsad = _split_lsad(full_name)
+            places[geoid] = Place(geoid, name, lsad, usps, (county,) if county else ())
+    return PlaceRegistry(places.values())
+
+
+_default_registry = None
+_default_lock = threading.Lock()
+
+
+def get_default_registry():
+    """Returns the registry loaded once from PLACES_PATH."""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = load_places()
+        return _default_registry
+
+
+def study_places():
+    """Returns the default study places (study_places.txt), in file order."""
+    registry = get_default_registry()
+    geoids = read_geoids()
+    missing = [geoid for geoid in geoids if geoid not in registry]
+    if missing:
+        print(f"Warning: Study places not in {PLACES_PATH}: {', '.join(missing)}")
+    return registry.filter(geoids=geoids)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or rebuild the place registry.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="Rebuild places.csv from a Census place file")
+    importer.add_argument("source", help="Place-by-county or Gazetteer place file")
+    importer.add_argument("--state", help="Keep only this state (USPS or FIPS code)")
+    importer.add_argument("--output", default=PLACES_PATH)
+    lister = commands.add_parser("list", help="List places")
+    lister.add_argument("--state")
+    lister.add_argument("--county")
+    lister.add_argument("--study", action="store_true", help="Only the default study places")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        registry = from_census_file(args.source, state=args.state)
+        registry.to_csv(args.output)
+        print(f"Wrote {len(registry)} places to {args.output} ({len(registry.ambiguous)} ambiguous names)")
+        return
+
+    registry = study_places() if args.study else get_default_registry()
+    registry = registry.filter(state=args.state, county=args.county)
+    for geoid, label in registry.labels().items():
+        print(f"{geoid}\t{label}")
+    print(f"{len(registry)} places")
+
+
+if __name__ == "__main__":
+    main()
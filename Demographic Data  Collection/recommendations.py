@@ -0,0 +1,218 @@
+"""
+Peer recommendations: which cities in the same cluster should a city learn from?
+
+PeerIndex precomputes, for every cluster, a KD-tree over the scaled demographic
+features and a ranking of the cluster's cities for every rubric section, so
+queries are answered from the index without rescanning the feature table.
+Changing one city's scores or features only rebuilds the clusters it touches.
+
+Example:
+    index = PeerIndex(clustered_df)
+    index.recommend("Waukegan", section=3)
+"""
+import numpy as np
+
+SCORE_COLUMN = "Section {} Score"
+
+
+class _ClusterIndex:
+    """Members, scaled features, section scores, KD-tree and per-section rankings of one cluster."""
+
+    def __init__(self, cities, X, scores, leaf_size):
+        from sklearn.neighbors import KDTree
+        self.cities = np.asarray(cities, dtype=object)
+        self.X = X
+        self.scores = scores
+        self.leaf_size = leaf_size
+        self.tree = KDTree(X, leaf_size=leaf_size) if len(X) else None
+        self.rankings = [self._rank(column) for column in range(scores.shape[1])]
+        self.ranked_scores = [scores[ranking, column] for column, ranking in enumerate(self.rankings)]
+
+    def _rank(self, column):
+        # Row positions by descending score (stable, so ties keep table order); missing scores are left out
+        values = self.scores[:, column]
+        present = np.flatnonzero(~np.isnan(values))
+        return present[np.argsort(-values[present], kind="stable")]
+
+
+class PeerIndex:
+    """
+    Precomputed per-cluster peer index over a clustered feature table.
+
+    The table needs a 'City' column, a 'Cluster' column (e.g. from
+    clustering.perform_clustering or ClusterModel.assign), the rubric section
+    scores as 'Section N Score' columns, and the numeric demographic features.
+    """
+
+    def __init__(self, table, features=None, sections=None, model=None, leaf_size=16):
+        """
+        Args:
+            table: Clustered DataFrame with City, Cluster, feature and section score columns
+            features: Feature columns used for similarity; defaults to every other numeric column
+            sections: Rubric section numbers to index; defaults to every 'Section N Score' column present
+            model: Optional ClusterModel; its scaling is reused and it assigns the cluster of
+                cities whose features change
+            leaf_size: KD-tree leaf size
+        """
+        if sections is None:
+            sections = [n for n in range(1, 100) if SCORE_COLUMN.format(n) in table.columns]
+        self.sections = list(sections)
+        self.score_columns = [SCORE_COLUMN.format(n) for n in self.sections]
+        if features is None:
+            features = model.features if model is not None else [
+                column for column in table.select_dtypes(include=["number"]).columns
+                if column not in self.score_columns and column not in ("Cluster", "Total Score")
+            ]
+        self.features = list(features)
+        self.model = model
+        self.leaf_size = leaf_size
+
+        values = table[self.features].to_numpy(dtype=np.float64)
+        if model is not None:
+            self.mean, self.scale = model.mean, model.scale
+        else:
+            self.mean = np.nanmean(values, axis=0)
+            self.scale = np.nanstd(values, axis=0)
+            self.scale[~(self.scale > 0)] = 1.0
+
+        # City -> (cluster, raw feature row, score row); the source of truth for rebuilds
+        self._rows = {}
+        cities = table["City"].astype(str).to_numpy()
+        clusters = table["Cluster"].to_numpy()
+        scores = table[self.score_columns].to_numpy(dtype=np.float64)
+        for i, city in enumerate(cities):
+            self._rows[city] = (int(clusters[i]), values[i], scores[i])
+
+        self._clusters = {}
+        self._position = {}
+        for cluster in np.unique(clusters):
+            self._build(int(cluster))
+
+    def _scaled(self, values):
+        return np.nan_to_num((np.atleast_2d(values) - self.mean) / self.scale, nan=0.0)
+
+    def _build(self, cluster):
+        members = [city for city, row in self._rows.items() if row[0] == cluster]
+        if not members:
+            self._clusters.pop(cluster, None)
+            return
+        X = self._scaled(np.array([self._rows[city][1] for city in members]))
+        scores = np.array([self._rows[city][2] for city in members]).reshape(len(members), len(self.sections))
+        self._clusters[cluster] = _ClusterIndex(members, X, scores, self.leaf_size)
+        for position, city in enumerate(members):
+            self._position[city] = (cluster, position)
+
+    def _locate(self, city):
+        try:
+            cluster, position = self._position[city]
+        except KeyError:
+            raise KeyError(f"Unknown city: {city}") from None
+        return self._clusters[cluster], position
+
+    def cluster_of(self, city):
+        """Returns the cluster ID of an indexed city."""
+        return self._position[city][0] if city in self._position else None
+
+    def nearest_peers(self, city, n=5):
+        """
+        Returns the n cities of the same cluster closest in scaled feature space.
+
+        Returns:
+            List of (city, distance) pairs, nearest first
+        """
+        index, position = self._locate(city)
+        k = min(n + 1, len(index.cities))
+        distances, rows = index.tree.query(index.X[position:position + 1], k=k)
+        return [(index.cities[row], float(distance)) for row, distance in zip(rows[0], distances[0])
+                if row != position][:n]
+
+    def recommend(self, city, section, top_n=5, order="score"):
+        """
+        Suggests same-cluster peers that scored higher than a city on one rubric section.
+
+        Args:
+            city: City to find peers for
+            section: Rubric section number
+            top_n: Maximum number of peers returned
+            order: "score" for the highest scorers first, "similarity" for the most similar
+                better-scoring peers first
+
+        Returns:
+            List of dicts with city, score and distance (scaled feature distance to the city)
+        """
+        index, position = self._locate(city)
+        column = self.sections.index(section)
+        own = index.scores[position, column]
+        if order == "score":
+            # Rankings are sorted by descending score, so the better-scoring peers are a prefix
+            ranking = index.rankings[column]
+            better = ranking[:np.count_nonzero(index.ranked_scores[column] > own)] if not np.isnan(own) else ranking
+            rows = better[better != position][:top_n]
+            distances = np.sqrt(np.square(index.X[rows] - index.X[position]).sum(axis=1))
+        elif order == "similarity":
+            # Widen the KD-tree search until enough of the neighbours scored higher
+            k = min(len(index.cities), 4 * (top_n + 1))
+            while True:
+                distances, rows = index.tree.query(index.X[position:position + 1], k=k)
+                distances, rows = distances[0], rows[0]
+                scores = index.scores[rows, column]
+                keep = (rows != position) & ~np.isnan(scores)
+                if not np.isnan(own):
+                    keep &= scores > own
+                if keep.sum() >= top_n or k == len(index.cities):
+                    break
+                k = min(len(index.cities), 4 * k)
+            rows, distances = rows[keep][:top_n], distances[keep][:top_n]
+        else:
+            raise ValueError(f"Unknown recommendation order: {order}")
+        return [
+            {"city": index.cities[row], "score": float(index.scores[row, column]), "distance": float(distance)}
+            for row, distance in zip(rows, distances)
+        ]
+
+    def top_performers(self, cluster, section, n=5):
+        """Returns the n best (city, score) pairs of a cluster on one section."""
+        index = self._clusters[cluster]
+        column = self.sections.index(section)
+        return [(index.cities[row], float(index.scores[row, column])) for row in index.rankings[column][:n]]
+
+    def update_city(self, city, scores=None, features=None, cluster=None):
+        """
+        Updates (or adds) one city and rebuilds only the clusters it affects.
+
+        A score change only re-ranks the city's cluster. A feature change also
+        reassigns the cluster through the model (unless cluster is given).
+
+        Args:
+            city: City name
+            scores: Dict of section number -> score, for the sections that changed
+            features: Dict of feature -> value, for the features that changed
+            cluster: Explicit cluster ID for the city
+        """
+        old_cluster, values, score_row = self._rows.get(
+            city, (None, np.full(len(self.features), np.nan), np.full(len(self.sections), np.nan)))
+        values, score_row = values.copy(), score_row.copy()
+        for section, score in (scores or {}).items():
+            score_row[self.sections.index(section)] = np.nan if score is None else score
+        for feature, value in (features or {}).items():
+            values[self.features.index(feature)] = np.nan if value is None else value
+
+        if cluster is None:
+            if features and self.model is not None:
+                cluster = self.model.assign(dict(zip(self.features, values)))
+            elif old_cluster is not None:
+                cluster = old_cluster
+            else:
+                raise ValueError(f"Cluster of new city {city} is unknown; pass cluster= or build with a model")
+        self._rows[city] = (int(cluster), values, score_row)
+
+        if old_cluster is not None and old_cluster != cluster:
+            self._position.pop(city, None)
+            self._build(old_cluster)
+        self._build(int(cluster))
+
+    def to_frame(self):
+        """Returns the indexed cities as a DataFrame (City, Cluster, features, section scores)."""
+        import pandas as pd
+        rows = [[city, cluster, *values, *scores] for city, (cluster, values, scores) in self._rows.items()]
+        return pd.DataFrame(rows, columns=["City", "Cluster"] + self.features + self.score_columns)
@@ -1,13 +1,20 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
-import google.generativeai as genai
-import time
 import os
+import sys
 from werkzeug.utils import secure_filename
-import uuid
 import tempfile
-import google.generativeai as genai
+import time
+from concurrent.futures import ThreadPoolExecutor
 from google.generativeai.types import GenerationConfig # Import GenerationConfig
+from result_cache import ResultCache
+from uploads import SpooledUpload
+from jobs import JobManager, QueueFullError, FINISHED_STATES, SUCCEEDED
+from google.api_core import exceptions as google_exceptions
+from llm_provider import PROVIDER, get_provider
+from scores import RESPONSE_SCHEMA, parse_scores, merge_scores, format_report
+from vector_index import VectorIndex, retrieve_sections, render_context
+import rubric
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes to allow requests from your React frontend
@@ -17,385 +24,540 @@ UPLOAD_FOLDER = tempfile.gettempdir()  # Use system temp directory
 ALLOWED_EXTENSIONS = {'pdf'}
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # Limit file size to 16MB
+# Uploads larger than this spill from memory to a temporary file in UPLOAD_FOLDER while they are analyzed
+UPLOAD_SPOOL_BYTES = int(os.environ.get('UPLOAD_SPOOL_MB', 8)) * 1024 * 1024
+# Upload size limit; long reports are extracted page by page locally, so the default is well above 16MB
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 100)) * 1024 * 1024
+
+# Persistent cache of analysis results, keyed by PDF content + prompt + model + config
+RESULT_CACHE_PATH = os.environ.get(
+    'RESULT_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'analysis_results.sqlite3')
+)
+result_cache = ResultCache(RESULT_CACHE_PATH)
+
+# LLM calls go through a provider per API key (llm_provider; LLM_PROVIDER=simulated for load tests).
+# Each provider's file registry reuses uploads by content hash and deletes them once idle
+
+# Model used for every analysis
+MODEL_NAME = "gemini-1.5-pro-latest"
+
+# Define generation configuration with a lower temperature
+# Temperature: Controls randomness. Lower values (e.g., 0.2) make output more deterministic.
+# Higher values (e.g., 0.8) make it more random. Default is often around 0.7-0.9.
+# For deterministic output, 0.0 is the lowest, but 0.1 or 0.2 can be good compromises.
+# The response is requested as JSON matching the rubric schema so scores can be validated.
+GENERATION_CONFIG = GenerationConfig(
+    temperature=0.2,
+    response_mime_type="application/json",
+    response_schema=RESPONSE_SCHEMA,
+)
+
+# Rubric prompt, rendered once at import by the shared rubric module
+ANALYSIS_PROMPT = rubric.PROMPT
+
+# Analysis modes: "full" sends the whole PDF with the full rubric; "sections" scores each
+# section in its own concurrent call against the same uploaded PDF; "retrieval" scores each
+# section from only the report chunks retrieved for that section
+ANALYSIS_MODES = ('full', 'sections', 'retrieval')
+ANALYSIS_MODE = os.environ.get('ANALYSIS_MODE', 'full')
+RETRIEVAL_TOP_K = int(os.environ.get('RETRIEVAL_TOP_K', 6))
+# Concurrent section calls; by default every section is in flight at once
+SECTION_WORKERS = int(os.environ.get('SECTION_WORKERS', len(rubric.SECTIONS)))
+# Extra attempts for sections whose call failed or whose answer could not be parsed
+SECTION_RETRIES = int(os.environ.get('SECTION_RETRIES', 2))
+vector_index = VectorIndex()
+
+def analysis_version(mode):
+    """Identifies the prompt setup of a mode for result cache keys."""
+    if mode == 'retrieval':
+        return f"{rubric.RUBRIC_VERSION}:retrieval:k={RETRIEVAL_TOP_K}:{vector_index.embedder.name}"
+    if mode == 'sections':
+        return f"{rubric.RUBRIC_VERSION}:sections"
+    return rubric.RUBRIC_VERSION
+
+# Optional peer-group model written by clustering.fit_cluster_model(...).save(path)
+DEMOGRAPHIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Demographic Data  Collection')
+CLUSTER_MODEL_PATH = os.environ.get('CLUSTER_MODEL_PATH', os.path.join(DEMOGRAPHIC_DIR, 'features', 'cluster_model.npz'))
+
+def load_cluster_model(path):
+    """Loads the peer-group ClusterModel, or returns None if there is none at path."""
+    if not os.path.exists(path):
+        return None
+    if DEMOGRAPHIC_DIR not in sys.path:
+        sys.path.append(DEMOGRAPHIC_DIR)
+    try:
+        from clusterModel import ClusterModel
+        model = ClusterModel.load(path)
+    except (ImportError, OSError, ValueError, KeyError) as e:
+        print(f"Warning: Could not load cluster model {path}: {e}")
+        return None
+    if model.rubric_version not in (None, rubric.RUBRIC_VERSION):
+        print(f"Warning: Cluster model {path} was fitted with rubric {model.rubric_version}, "
+              f"current rubric is {rubric.RUBRIC_VERSION}")
+    print(f"Loaded cluster model {model.version} ({model.n_clusters} clusters, {len(model.features)} features)")
+    return model
+
+cluster_model = load_cluster_model(CLUSTER_MODEL_PATH)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def analyze_pdf_with_gemini(api_key, file_path):
+def generate_with_file(provider, prompt, pdf_file, digest):
+    """Runs one generate_content call on an uploaded PDF, forgetting the file if the server no longer has it."""
+    try:
+        return provider.generate_content(
+            MODEL_NAME,
+            [prompt, pdf_file],
+            generation_config=GENERATION_CONFIG  # Pass the config here
+        )
+    except (google_exceptions.NotFound, google_exceptions.PermissionDenied):
+        # The remote file is gone (e.g. deleted elsewhere); the next call uploads it again
+        provider.registry.invalidate(digest)
+        raise
+
+def upload_to(provider, upload):
+    """Returns a callable uploading a SpooledUpload through a provider."""
+    return lambda: provider.upload_file(upload.file(), mime_type="application/pdf",
+                                        display_name=secure_filename(upload.filename))
+
+def analyze_pdf_with_gemini(api_key, upload, on_stage=None):
     """
     Analyzes a PDF file using Gemini API with controlled temperature for more deterministic results.
     
     Args:
         api_key: Google Gemini API key
-        file_path: Path to the PDF file
+        upload: SpooledUpload holding the PDF
+        on_stage: Optional callback invoked with the name of each stage ("upload", "processing", "generate") as it starts
         
     Returns:
-        Analysis text from Gemini, or error message
+        Dict with the readable analysis text and the validated section scores, or an error message
     """
+    if on_stage is None:
+        on_stage = lambda name: None
+    
     try:
-        # Configure Gemini API
-        genai.configure(api_key=api_key)
-        
-        # Upload the file to Gemini
-        pdf_file = genai.upload_file(path=file_path)
+        # Provider for this API key, configured once and reused across requests
+        provider = get_provider(api_key)
         
-        # Wait for file processing to complete
-        while pdf_file.state.name == "PROCESSING":
-            time.sleep(2)  # Check every 2 seconds
-            pdf_file = genai.get_file(name=pdf_file.name)
-        
-        if pdf_file.state.name != "ACTIVE":
-            # It's good practice to try and delete the file from Gemini even if processing fails
-            try:
-                genai.delete_file(name=pdf_file.name)
-                print(f"Cleaned up file {pdf_file.name} from Gemini after processing failure.")
-            except Exception as cleanup_error:
-                print(f"Warning: Failed to delete file {pdf_file.name} from Gemini server after processing failure: {cleanup_error}")
-            return {"error": f"File processing failed. State: {pdf_file.state.name}"}
+        # Reuse this document's uploaded file if it is still live, otherwise upload it and wait for processing
+        with provider.registry.use(upload.digest, upload_to(provider, upload), on_stage=on_stage) as pdf_file:
+            if pdf_file.state.name != "ACTIVE":
+                # The registry has already deleted the failed file
+                return {"error": f"File processing failed. State: {pdf_file.state.name}"}
+            
+            # Generate content with the specified configuration (model: MODEL_NAME)
+            on_stage("generate")
+            response = generate_with_file(provider, ANALYSIS_PROMPT, pdf_file, upload.digest)
+        result = response.text
         
-        # Select model and define prompt
-        # Using gemini-1.5-flash as an example, as "gemini-2.5-pro-preview-03-25" might not be a standard or available model name.
-        # Please ensure you are using a valid and available model name.
-        # For example, "gemini-1.5-pro-latest" or "gemini-1.0-pro" are common.
-        # Let's assume you intended a Pro model, for instance "gemini-1.5-pro-latest"
-        model = genai.GenerativeModel(model_name="gemini-1.5-pro-latest") # Ensure this model name is correct and available
+        # Validate the structured response; legacy free-text answers fall back to the regex parser
+        scores = parse_scores(result)
+        if scores is None:
+            # Not a usable analysis; reported as an error so it is never cached
+            return {"error": "Could not parse scores from the model response"}
+        missing = scores.missing_sections()
+        if missing:
+            # A partial total would be cached and shown as a complete score
+            return {"error": f"Incomplete scores: sections {missing} are missing or partly answered"}
+        if scores.source == "json":
+            result = format_report(scores)
         
-        prompt = """
-            Comprehensive Climate Action Plan Analysis 
-
-You are tasked with analyzing a city’s Climate Action Plan (CAP) or related report. Based on the content, assess whether it addresses key areas across stakeholder engagement, emissions data, risk assessments, strategies, equity, and monitoring. 
-
-Please respond using Yes/No and provide brief justifications or references where applicable. Where methods, tools, or stakeholder names are mentioned, list or summarize them clearly. Give me a comprehensive analysis along with scores. A “Yes” must be given a score of 1 and a “No” must be given a score of 0.  
-
-Shape 
-
-🔹 1. Stakeholder & Community Engagement 
-
-1.1 Identifying Priority Stakeholders: 
-
-Does the report identify groups most impacted by climate change (e.g., children, women, disabled, marginalized, frontline communities)? 
-
-Are groups mentioned above excluded from previous engagement processes acknowledged? 
-
-1.2 Engagement & Collaboration: 
-
-Does the report mention planned engagement with private sector, national/regional governments, or other stakeholders? 
-
-Has the city identified influential actors supportive of its climate plans? 
-
-1.3 Engagement Methods: 
-
-Have key stakeholders been integrated through long-term engagement throughout planning and implementation? If yes, which methods and groups? 
-
-Has the broader public been engaged via surveys, consultations, summits, etc.? 
-
-Shape 
-
-🔹 2. GHG Emissions Inventory 
-
-Is the city measuring GHG emissions? If yes, what methodology is used? 
-
-Does it use a specific tool like for inventory management and reporting? 
-
-Are the emissions inventory calculations publicly published? 
-
-Shape 
-
-🔹 3. Climate Change Risk Assessment (CCRA) 
-
-Has the city conducted: 
-
-A climate hazard assessment (probability, intensity, timescale)? 
-
-A climate impact assessment (on people, infrastructure, services)? 
-
-A full CCRA? A Climate Change Risk Assessment (CCRA) seeks to understand the likelihood of current and future climate hazards and the potential impacts of these hazards on cities and their inhabitants. 
-
-Has the CCRA: 
-
-Been outsourced? If so, to whom? 
-
-Been updated or scheduled for renewal? 
-
-Included interdependent risks and adaptive capacity analysis? 
-
-Been made public? 
-
-Shape 
-
-🔹 4. City Needs Assessment 
-
-Has the city analyzed socioeconomic context, environmental quality, and alignment with SDGs (Sustainable Development Goals) through strategic appraisal? 
-
-Has it assessed city-wide priorities that climate actions could address? 
-
-Shape 
-
-🔹 5. Strategy Identification 
-
-5.1 Mitigation Strategies: 
-
-Has the city defined a planning horizon for its climate scenarios? 
-
-Has a Business-As-Usual (BAU) forecast been included? 
-
-Are modeling tools used for scenario development? 
-
-Are mitigation projections based on current plans available? 
-
-Is there an ambitious, long-term mitigation scenario? 
-
-Adaptation Strategies: 
-
-Has the city identified the root causes of climate risks? 
-
-Reactive adaptation fights the immediate negative consequences of climate-related hazards, protecting quality of life and the city’s systems during climate-related disasters and restoring them afterwards. Are any reactive adaptation plans addressed 
-
-Preventative adaptation reduces the negative consequences of climate-related hazards, aiming to protect quality of life and city systems to avoid those hazard events becoming disasters. Are any preventive adaptation plans included? 
-
-Transformative adaptation tackles the root causes of climate risk, making climate-related hazards less likely or severe through fundamental changes to the city’s fabric and systems. Are any transformation adaptation plans included?  
-
- 
-
-🔹 6. Action Prioritization & Detailing 
-
-Has a longlist of potential actions been developed from evidence base? 
-
-Has a shortlist of high-priority actions been defined using specific criteria/tools (e.g., ASAP, AMIA, cost-benefit)? 
-
-Does the plan assess the fit of actions within broader city agendas? 
-
-Is there evidence of inclusive stakeholder engagement in prioritization? 
-
-Has the city adopted a flexible, iterative planning process? 
-
- 
-
-🔹 7. Equity & Inclusivity 
-
-7.1 Stakeholder Inclusion: 
-
-Has the city included a diverse set of stakeholders in planning? (Yes/No) 
-
-7.2 Needs & Vulnerability Assessment: 
-
-Has the city identified vulnerable groups and reasons for vulnerability? (Yes/No) 
-
-Has a comprehensive needs assessment been done? (Yes/No) 
-
-7.3 Distributed Impact Analysis: 
-
-Are equity impacts and challenges of actions analyzed? (Yes/No) 
-
-Has the city used needs/stakeholder findings to guide climate actions? (Yes/No) 
-
-7.4 Monitoring Equity: 
-
-Is a Monitoring, Evaluation, and Reporting (MER) system used to track equity outcomes? 
-
- 
-
-🔹 8. Monitoring, Evaluation & Reporting (MER) 
-
-8.1 Integration with City Systems: 
-
-Are existing climate plans and tracking mechanisms referenced? (Yes/No) 
-
-Are inclusivity, public reporting, and data systems discussed? (Yes/No per question) 
-
-8.2 Governance & Stakeholders: 
-
-Are key stakeholders identified in MER? If yes, which ones? 
-
-8.3 Defining Indicators: 
-
-Are clear indicators set for each action (output, outcome, impact)? 
-
-Are GHG, risk, and co-benefits included? 
-
-8.4 Data Collection: 
-
-Has the city identified data sources, ownership, collection methods, and reporting responsibilities? 
-
- 
-
- 
-
-The scoring can be done in the way shown below. 
-
-Counting the Yes/No Questions: 
-
-Stakeholder & Community Engagement: 
-
-1.1: Identify impacted groups? (1), Acknowledge excluded groups? (1) = 2 points 
-
-1.2: Mention planned engagement? (1), Identified influential actors? (1) = 2 points 
-
-1.3: Integrated key stakeholders? (1), Engaged broader public? (1) = 2 points 
-
-Section 1 Total: 6 points 
-
-GHG Emissions Inventory: 
-
-Measuring GHG emissions? (1), Use a specific tool? (1), Calculations publicly published? (1) 
-
-Section 2 Total: 3 points 
-
-Climate Change Risk Assessment (CCRA): 
-
-Conducted hazard assessment? (1), Conducted impact assessment? (1), Conducted full CCRA? (1), CCRA outsourced? (1), CCRA updated/scheduled? (1), Included interdependent risks/adaptive capacity? (1), CCRA made public? (1) 
-
-Section 3 Total: 7 points 
-
-City Needs Assessment: 
-
-Analyzed socioeconomic context, etc.? (1), Assessed city-wide priorities? (1) 
-
-Section 4 Total: 2 points 
-
-Strategy Identification: 
-
-5.1: Defined planning horizon? (1), Included BAU forecast? (1), Modeling tools used? (1), Mitigation projections available? (1), Ambitious long-term scenario? (1) = 5 points 
-
-5.2: Identified root causes? (1), Reactive adaptation addressed? (1), Preventive adaptation included? (1), Transformative adaptation included? (1) = 4 points 
-
-Section 5 Total: 9 points 
-
-Action Prioritization & Detailing: 
-
-Developed longlist? (1), Defined shortlist? (1), Assessed fit? (1), Evidence of inclusive engagement? (1), Adopted flexible process? (1) 
-
-Section 6 Total: 5 points 
-
-Equity & Inclusivity: 
-
-7.1: Included diverse stakeholders? (1) = 1 point 
-
-7.2: Identified vulnerable groups/reasons? (1), Comprehensive needs assessment? (1) = 2 points 
-
-7.3: Equity impacts analyzed? (1), Used findings to guide actions? (1) = 2 points 
-
-7.4: MER system used for equity? (1) = 1 point 
-
-Section 7 Total: 6 points 
-
-Monitoring, Evaluation & Reporting (MER): 
-
-8.1: Existing plans referenced? (1), Inclusivity, public reporting, data systems discussed? (1)* = 2 points 
-
-8.2: Key stakeholders identified in MER? (1) = 1 point 
-
-8.3: Clear indicators set? (1), GHG, risk, co-benefits included? (1) = 2 points 
-
-8.4: Identified data sources, etc.? (1) = 1 point 
-
-Section 8 Total: 6 points 
-
-Note on 8.1.2: The question "Are inclusivity, public reporting, and data systems discussed? (Yes/No per question)" is slightly ambiguous. It lists three items but asks a single question grammatically. Based on the singular structure "Are...discussed?", count it as a single point.  
-
-Calculating the Total Maximum Score: 
-
-Adding the maximum points from each section: 6 + 3 + 7 + 2 + 9 + 5 + 6 + 6 = 44 points 
-
-Based on the provided structure and counting each distinct Yes/No question as one point, the maximum score any given report can get is 44. 
+        # The uploaded file is kept for reuse; the registry's reaper deletes it once it is idle
+        return {"result": result, "scores": scores.to_dict()}
+    
+    except Exception as e:
+        return {"error": str(e)}
+    
 
- Consolidate the socres and give them as
- Section 1: Stakeholder & Community Engagement: Score
- Section 2: GHG Emissions Inventory: Score
- Section 3: Climate Change Risk Assessment (CCRA): Score
- Section 4: City Needs Assessment: Score
- Section 5: Strategy Identification: Score
- Section 6: Action Prioritization & Detailing: Score
- Section 7: Equity & Inclusivity: Score
- Section 8: Monitoring, Evaluation & Reporting (MER): Score
+def section_result(number, text):
+    """Parses one section's response as (number, RubricScore, None), or (number, None, error message)."""
+    part = parse_scores(text)
+    if part is None or part.missing_sections([number]):
+        return number, None, "Could not parse the section's scores"
+    return number, part, None
 
- 
-        """
+def score_sections(score_section, numbers=None, time_scale=1.0):
+    """
+    Scores rubric sections concurrently, retrying failed sections on their own.
+    
+    Sections whose call fails or whose answer cannot be parsed are retried up to
+    SECTION_RETRIES times with a short backoff. Exceptions raised by
+    score_section (rather than returned) abort the whole run.
+    
+    Args:
+        score_section: Callable taking a section number and returning (number, RubricScore or None, error message or None)
+        numbers: Section numbers to score; defaults to the whole rubric
+        time_scale: Multiplier for the backoff delays (the provider's time_scale)
         
-        # Define generation configuration with a lower temperature
-        # Temperature: Controls randomness. Lower values (e.g., 0.2) make output more deterministic.
-        # Higher values (e.g., 0.8) make it more random. Default is often around 0.7-0.9.
-        # For deterministic output, 0.0 is the lowest, but 0.1 or 0.2 can be good compromises.
-        config = GenerationConfig(temperature=0.2) 
+    Returns:
+        (parts, errors, attempts): dicts of section number -> RubricScore, last error message and calls made
+    """
+    parts, errors, attempts = {}, {}, {}
+    pending = list(numbers) if numbers is not None else [section.number for section in rubric.SECTIONS]
+    with ThreadPoolExecutor(max_workers=SECTION_WORKERS) as executor:
+        for attempt in range(SECTION_RETRIES + 1):
+            if attempt:
+                time.sleep(2 ** (attempt - 1) * time_scale)  # Brief backoff in case the failures were rate limits
+            for number, part, error in executor.map(score_section, pending):
+                attempts[number] = attempt + 1
+                if part is not None:
+                    parts[number] = part
+                    errors.pop(number, None)
+                else:
+                    errors[number] = error
+            pending = sorted(errors)
+            if not pending:
+                break
+    return parts, errors, attempts
+
+def sections_error(errors):
+    """Error message listing the sections that could not be scored."""
+    failed = ", ".join(f"{number} ({error})" for number, error in sorted(errors.items()))
+    return f"Scoring failed for sections {failed}"
+
+def analyze_pdf_by_section(api_key, upload, on_stage=None):
+    """
+    Scores each rubric section in its own call, all against the same uploaded PDF.
+    
+    The section calls run concurrently, so the latency is close to that of the
+    slowest section rather than one long generation of the whole rubric. Sections
+    whose call fails or whose answer cannot be parsed are retried on their own
+    (up to SECTION_RETRIES times); the section results are merged into one score.
+    
+    Args:
+        api_key: Google Gemini API key
+        upload: SpooledUpload holding the PDF
+        on_stage: Optional callback invoked with the name of each stage ("upload", "processing", "generate") as it starts
         
-        # Generate content with the specified configuration
-        response = model.generate_content(
-            [prompt, pdf_file],
-            generation_config=config  # Pass the config here
-        )
-        result = response.text
+    Returns:
+        Dict with the readable analysis text, the merged section scores and per-section call statistics, or an error message
+    """
+    if on_stage is None:
+        on_stage = lambda name: None
+    
+    try:
+        provider = get_provider(api_key)
+        with provider.registry.use(upload.digest, upload_to(provider, upload), on_stage=on_stage) as pdf_file:
+            if pdf_file.state.name != "ACTIVE":
+                return {"error": f"File processing failed. State: {pdf_file.state.name}"}
+            
+            def score_section(number):
+                try:
+                    response = generate_with_file(provider, rubric.render_prompt([number]), pdf_file,
+                                                  upload.digest)
+                except (google_exceptions.NotFound, google_exceptions.PermissionDenied):
+                    raise
+                except Exception as e:
+                    return number, None, str(e)
+                return section_result(number, response.text)
+            
+            on_stage("generate")
+            started = time.time()
+            parts, errors, attempts = score_sections(score_section, time_scale=provider.time_scale)
         
-        # Clean up by deleting the file from Gemini
-        try:
-            genai.delete_file(name=pdf_file.name)
-            print(f"Successfully deleted file {pdf_file.name} from Gemini server.")
-        except Exception as cleanup_error:
-            print(f"Warning: Failed to delete file {pdf_file.name} from Gemini server during final cleanup: {cleanup_error}")
+        if errors:
+            return {"error": sections_error(errors)}
         
-        return {"result": result}
+        scores = merge_scores([parts[number] for number in sorted(parts)])
+        retried = sorted(number for number, count in attempts.items() if count > 1)
+        print(f"Scored {len(parts)} sections in {time.time() - started:.1f}s (retried: {retried or 'none'})")
+        return {
+            "result": format_report(scores),
+            "scores": scores.to_dict(),
+            "sections": {
+                "calls": sum(attempts.values()),
+                "retried": retried,
+            },
+        }
     
     except Exception as e:
-        # If an error occurs before pdf_file is defined or if its name is not available,
-        # we can't delete it.
-        if 'pdf_file' in locals() and hasattr(pdf_file, 'name'):
-            try:
-                genai.delete_file(name=pdf_file.name)
-                print(f"Cleaned up file {pdf_file.name} from Gemini after an exception.")
-            except Exception as cleanup_error:
-                print(f"Warning: Failed to delete file {pdf_file.name} from Gemini server after an exception: {cleanup_error}")
         return {"error": str(e)}
+
+def analyze_pdf_with_retrieval(api_key, upload, on_stage=None):
+    """
+    Scores a PDF section by section from locally retrieved excerpts instead of uploading it.
+    
+    The PDF text is extracted and indexed once per document, the top chunks for
+    each rubric section are retrieved, and the sections are scored in parallel
+    calls whose results are merged. Failed sections are retried as in
+    analyze_pdf_by_section; if any section still has no score, an error is
+    returned rather than a partial total.
+    
+    Args:
+        api_key: Google Gemini API key
+        upload: SpooledUpload holding the PDF; its SHA-256 keys the document in the vector index
+        on_stage: Optional callback invoked with the name of each stage ("extract", "retrieve", "generate") as it starts
+        
+    Returns:
+        Dict with the readable analysis text, the merged section scores and retrieval statistics, or an error message
+    """
+    if on_stage is None:
+        on_stage = lambda name: None
+    
+    try:
+        on_stage("extract")
+        chunk_count = vector_index.add_pdf(upload.digest, upload.source())
+        if chunk_count == 0:
+            return {"error": "No text could be extracted from the PDF; use the full analysis mode for scanned reports"}
+        
+        on_stage("retrieve")
+        retrieved = retrieve_sections(vector_index, upload.digest, k=RETRIEVAL_TOP_K)
+        contexts = {number: render_context(chunks) for number, chunks in retrieved.items()}
+        
+        provider = get_provider(api_key)
+        
+        def score_section(number):
+            try:
+                response = provider.generate_content(
+                    MODEL_NAME,
+                    [rubric.render_prompt([number]), contexts[number]],
+                    generation_config=GENERATION_CONFIG
+                )
+            except Exception as e:
+                return number, None, str(e)
+            return section_result(number, response.text)
+        
+        on_stage("generate")
+        parts, errors, attempts = score_sections(score_section, contexts, time_scale=provider.time_scale)
+        if errors:
+            # A partial score would be cached as if it were complete
+            return {"error": sections_error(errors)}
+        
+        scores = merge_scores([parts[number] for number in sorted(parts)])
+        context_chars = sum(len(context) for context in contexts.values())
+        retried = sorted(number for number, count in attempts.items() if count > 1)
+        print(f"Scored {len(parts)} sections from {chunk_count} indexed chunks ({context_chars} context characters, "
+              f"retried: {retried or 'none'})")
+        return {
+            "result": format_report(scores),
+            "scores": scores.to_dict(),
+            "retrieval": {
+                "chunks": chunk_count,
+                "top_k": RETRIEVAL_TOP_K,
+                "context_chars": context_chars,
+                "calls": sum(attempts.values()),
+                "retried": retried,
+            },
+        }
     
+    except Exception as e:
+        return {"error": str(e)}
 
-@app.route('/api/analyze-pdf', methods=['POST'])
-def analyze_pdf():
-    """API endpoint to analyze a PDF file using Gemini AI"""
+def run_analysis(api_key, upload, mode, on_stage=None):
+    """Runs the analysis of an upload in the requested mode."""
+    if mode == 'retrieval':
+        return analyze_pdf_with_retrieval(api_key, upload, on_stage=on_stage)
+    if mode == 'sections':
+        return analyze_pdf_by_section(api_key, upload, on_stage=on_stage)
+    return analyze_pdf_with_gemini(api_key, upload, on_stage=on_stage)
+
+def peer_cluster(city, scores):
+    """
+    Looks up the peer cluster of a city.
+    
+    Cities the model was fitted on keep their stored cluster; other cities are
+    assigned from their rubric scores (any model features they lack are imputed
+    with the training mean).
+    
+    Args:
+        city: City name from the request, or None
+        scores: Parsed rubric scores (RubricScore.to_dict()), or None
     
+    Returns:
+        dict with city, cluster, peers and model_version, or None without a model or city
+    """
+    if cluster_model is None or not city:
+        return None
+    cluster = cluster_model.cluster_of(city)
+    if cluster is None:
+        if not scores:
+            return None
+        row = {f"Section {section['number']} Score": section['score'] for section in scores['sections']}
+        row["Total Score"] = scores['total']
+        if not any(feature in row for feature in cluster_model.features):
+            return None
+        cluster = cluster_model.assign(row)
+    return {
+        "city": city,
+        "cluster": cluster,
+        "peers": [peer for peer in cluster_model.peers(cluster) if peer != city],
+        "model_version": cluster_model.version,
+    }
+
+def validate_upload():
+    """
+    Validates the API key and PDF file of the current request.
+    
+    Returns:
+        (api_key, file, None) on success, or (None, None, error response) on failure
+    """
     # Check if API key is provided
     api_key = request.form.get('api_key')
     if not api_key:
-        return jsonify({"error": "Gemini API key is required"}), 400
+        return None, None, (jsonify({"error": "Gemini API key is required"}), 400)
     
     # Check if file is included in the request
     if 'file' not in request.files:
-        return jsonify({"error": "No file provided"}), 400
+        return None, None, (jsonify({"error": "No file provided"}), 400)
     
     file = request.files['file']
     
     # Check if a file was selected
     if file.filename == '':
-        return jsonify({"error": "No file selected"}), 400
+        return None, None, (jsonify({"error": "No file selected"}), 400)
     
     # Check if file is allowed
     if not allowed_file(file.filename):
-        return jsonify({"error": "Only PDF files are allowed"}), 400
+        return None, None, (jsonify({"error": "Only PDF files are allowed"}), 400)
+    
+    return api_key, file, None
+
+def requested_mode():
+    """Returns (mode, None) for the request's analysis mode, or (None, error response) if it is unknown."""
+    mode = request.form.get('mode', ANALYSIS_MODE)
+    if mode not in ANALYSIS_MODES:
+        return None, (jsonify({"error": f"Unknown analysis mode: {mode}"}), 400)
+    return mode, None
+
+def spool_upload(file):
+    """Copies the uploaded file out of the request in one pass, hashing it on the way."""
+    return SpooledUpload(file.stream, file.filename, max_memory=UPLOAD_SPOOL_BYTES,
+                         spill_dir=app.config['UPLOAD_FOLDER'])
+
+def upload_cache_key(upload, mode):
+    """Result cache key of an upload analyzed in a mode."""
+    return ResultCache.make_key(upload.digest, analysis_version(mode), MODEL_NAME, GENERATION_CONFIG,
+                                provider=PROVIDER)
+
+def run_analysis_job(report_stage, api_key, upload, cache_key, mode='full', city=None):
+    """Job worker: analyzes an upload, caches a successful result and releases the upload's buffer."""
+    with upload:
+        result = run_analysis(api_key, upload, mode, on_stage=report_stage)
+    if "error" not in result:
+        result_cache.put(cache_key, result)
+        result = dict(result, peer_cluster=peer_cluster(city, result.get("scores")))
+    return result
+
+# Background analysis jobs; sized through environment variables
+job_manager = JobManager(
+    run_analysis_job,
+    max_workers=int(os.environ.get('ANALYSIS_WORKERS', 4)),
+    max_queue=int(os.environ.get('ANALYSIS_MAX_QUEUE', 64)),
+)
+
+@app.route('/api/analyze-pdf', methods=['POST'])
+def analyze_pdf():
+    """API endpoint to analyze a PDF file using Gemini AI"""
+    
+    api_key, file, error_response = validate_upload()
+    if error_response is None:
+        mode, error_response = requested_mode()
+    if error_response is not None:
+        return error_response
     
     try:
-        # Generate a unique filename to avoid collisions
-        unique_filename = str(uuid.uuid4()) + '_' + secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        
-        # Save uploaded file
-        file.save(file_path)
-        
-        # Process the file with Gemini
-        result = analyze_pdf_with_gemini(api_key, file_path)
-        
-        # Clean up the temporary file
-        try:
-            os.remove(file_path)
-        except:
-            pass  # Continue even if cleanup fails
+        # Hash the upload while copying it out of the request; the buffer is released on every path
+        with spool_upload(file) as upload:
+            # Serve repeated analyses of the same document straight from the cache
+            cache_key = upload_cache_key(upload, mode)
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                return jsonify({"result": cached["result"], "scores": cached.get("scores"), "cached": True,
+                                "peer_cluster": peer_cluster(request.form.get('city'), cached.get("scores"))}), 200
+            
+            # Process the file with Gemini
+            result = run_analysis(api_key, upload, mode)
         
         # Return the analysis result
         if "error" in result:
             return jsonify({"error": result["error"]}), 500
         
-        return jsonify({"result": result["result"]}), 200
+        result_cache.put(cache_key, result)
+        return jsonify({"result": result["result"], "scores": result.get("scores"), "cached": False,
+                        "peer_cluster": peer_cluster(request.form.get('city'), result.get("scores"))}), 200
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """API endpoint that queues a PDF analysis and returns a job ID immediately"""
+    
+    api_key, file, error_response = validate_upload()
+    if error_response is None:
+        mode, error_response = requested_mode()
+    if error_response is not None:
+        return error_response
+    
+    try:
+        upload = spool_upload(file)
+        try:
+            cache_key = upload_cache_key(upload, mode)
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                peer = peer_cluster(request.form.get('city'), cached.get("scores"))
+                job_id = job_manager.complete({"filename": file.filename}, dict(cached, cached=True, peer_cluster=peer))
+                return jsonify({"job_id": job_id, "status": SUCCEEDED}), 200
+            
+            job_id = job_manager.submit({"api_key": api_key, "upload": upload, "cache_key": cache_key,
+                                         "mode": mode, "city": request.form.get('city')})
+            # The job worker owns the upload from here and closes it when the analysis finishes
+            upload = None
+        except QueueFullError as e:
+            return jsonify({"error": str(e)}), 503
+        finally:
+            if upload is not None:
+                upload.close()
+        
+        return jsonify({"job_id": job_id, "status": "queued"}), 202
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/jobs/stats', methods=['GET'])
+def job_stats():
+    """API endpoint reporting queue depth, in-flight jobs and mean per-stage timings"""
+    return jsonify(job_manager.stats()), 200
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """API endpoint returning the status and stage timings of a job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """API endpoint returning the analysis result of a finished job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if job.status not in FINISHED_STATES:
+        return jsonify(job.to_dict()), 202
+    if job.status != SUCCEEDED:
+        return jsonify({"error": job.error}), 500
+    return jsonify({
+        "result": job.result["result"],
+        "scores": job.result.get("scores"),
+        "cached": job.result.get("cached", False),
+        "peer_cluster": job.result.get("peer_cluster"),
+    }), 200
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-sent event stream of a job's status changes"""
+    if job_manager.get(job_id) is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return Response(job_manager.events(job_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """API endpoint reporting hit/miss counters and size of the analysis result cache"""
+    return jsonify(result_cache.stats()), 200
+
 if __name__ == '__main__':
     # Get port from environment variable or use default
     # Using port 8000 instead of 5000 to avoid conflicts with AirPlay on macOS
@@ -0,0 +1,261 @@
+import argparse
+import random
+import statistics
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+# Default seconds between status checks of one file: the first check after INITIAL_DELAY, growing to MAX_DELAY
+INITIAL_DELAY = 0.25
+MAX_DELAY = 2.0
+
+
+class _PendingFile:
+    def __init__(self, file, initial_delay):
+        self.file = file
+        self.delay = initial_delay
+        self.next_check = time.monotonic() + initial_delay
+        self.done = threading.Event()
+        self.error = None
+        self.errors = 0
+        self.waiters = 0
+
+
+class FilePoller:
+    """
+    Tracks every uploaded Gemini file that is still PROCESSING and wakes its
+    waiters as soon as it leaves that state.
+
+    A single background thread polls all pending files. Each file is checked
+    with exponential backoff starting at ``initial_delay``, so short processing
+    times are noticed quickly without hammering the API on long ones. While many
+    files are pending, a due check fetches the state of all of them with one
+    ``list_files`` call instead of one ``get_file`` call per file.
+    """
+
+    def __init__(self, client, initial_delay=INITIAL_DELAY, max_delay=MAX_DELAY, factor=1.6, batch_threshold=4, max_errors=5):
+        """
+        Args:
+            client: Provider exposing ``get_file(name=...)`` and ``list_files()`` (see llm_provider)
+            initial_delay: Seconds before the first status check of a new file
+            max_delay: Upper bound for the interval between checks of one file
+            factor: Multiplier applied to a file's interval after each check
+            batch_threshold: Number of pending files at which a single ``list_files`` call is used
+            max_errors: Consecutive status-check failures after which a waiter receives the error
+        """
+        self.client = client
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.batch_threshold = batch_threshold
+        self.max_errors = max_errors
+        self.status_calls = 0
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def wait(self, file, timeout=None):
+        """
+        Blocks until an uploaded file is no longer PROCESSING.
+
+        Args:
+            file: File object returned by ``upload_file``
+            timeout: Maximum number of seconds to wait, or None to wait indefinitely
+
+        Returns:
+            The latest file object (state ACTIVE, FAILED, ...)
+
+        Raises:
+            TimeoutError: If the file is still processing after ``timeout`` seconds
+        """
+        if file.state.name != "PROCESSING":
+            return file
+
+        with self._condition:
+            entry = self._pending.get(file.name)
+            if entry is None:
+                entry = _PendingFile(file, self.initial_delay)
+                self._pending[file.name] = entry
+            entry.waiters += 1
+            self._ensure_thread()
+            self._condition.notify()
+
+        try:
+            if not entry.done.wait(timeout):
+                raise TimeoutError(f"File {file.name} still processing after {timeout} seconds")
+        finally:
+            with self._condition:
+                entry.waiters -= 1
+                if entry.waiters == 0 and self._pending.get(file.name) is entry:
+                    del self._pending[file.name]
+
+        if entry.error is not None:
+            raise entry.error
+        return entry.file
+
+    def close(self):
+        """Lets the polling thread exit once no file is pending; later waits start it again briefly."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def _ensure_thread(self):
+        # Caller holds the condition lock
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="gemini-file-poller", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    active = [e for e in self._pending.values() if not e.done.is_set()]
+                    if not active:
+                        if self._closed:
+                            return
+                        self._condition.wait()
+                        continue
+                    now = time.monotonic()
+                    due = [e for e in active if e.next_check <= now]
+                    if due:
+                        break
+                    self._condition.wait(min(e.next_check for e in active) - now)
+
+            if len(active) >= self.batch_threshold:
+                self._check_batch(active, due)
+            else:
+                for entry in due:
+                    self._check_one(entry)
+
+    def _check_batch(self, active, due):
+        try:
+            self.status_calls += 1
+            listed = {f.name: f for f in self.client.list_files()}
+        except Exception:
+            listed = {}
+        due = set(id(entry) for entry in due)
+        for entry in active:
+            latest = listed.get(entry.file.name)
+            if latest is not None:
+                self._update(entry, latest)
+            elif id(entry) in due:
+                # Not in the listing (e.g. uploaded under another key); fall back to a direct lookup
+                self._check_one(entry)
+
+    def _check_one(self, entry):
+        try:
+            self.status_calls += 1
+            latest = self.client.get_file(name=entry.file.name)
+        except Exception as e:
+            entry.errors += 1
+            if entry.errors >= self.max_errors:
+                entry.error = e
+                entry.done.set()
+            else:
+                self._reschedule(entry)
+            return
+        self._update(entry, latest)
+
+    def _update(self, entry, latest):
+        entry.file = latest
+        entry.errors = 0
+        if latest.state.name != "PROCESSING":
+            entry.done.set()
+        else:
+            self._reschedule(entry)
+
+    def _reschedule(self, entry):
+        entry.delay = min(self.max_delay, entry.delay * self.factor)
+        entry.next_check = time.monotonic() + entry.delay
+
+
+# --- Benchmark ---
+
+class _SimulatedFiles:
+    """Fake file client whose files finish processing after a preset duration."""
+
+    def __init__(self):
+        self.ready_at = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def add(self, name, processing_seconds):
+        self.ready_at[name] = time.monotonic() + processing_seconds
+        return self._file(name)
+
+    def _file(self, name):
+        state = "ACTIVE" if time.monotonic() >= self.ready_at[name] else "PROCESSING"
+        return types.SimpleNamespace(name=name, state=types.SimpleNamespace(name=state))
+
+    def get_file(self, name):
+        with self._lock:
+            self.calls += 1
+        return self._file(name)
+
+    def list_files(self):
+        with self._lock:
+            self.calls += 1
+        return [self._file(name) for name in list(self.ready_at)]
+
+
+def _fixed_interval_wait(client, file, interval):
+    while file.state.name == "PROCESSING":
+        time.sleep(interval)
+        file = client.get_file(name=file.name)
+    return file
+
+
+def run_benchmark(n_files=24, median_seconds=1.5, sigma=0.6, interval=2.0, seed=0):
+    """
+    Compares fixed-interval polling with FilePoller on simulated uploads whose
+    processing times follow a log-normal distribution.
+
+    Returns:
+        Dict with mean wait overhead per file and status-call counts for both strategies.
+    """
+    rng = random.Random(seed)
+    durations = [rng.lognormvariate(0, sigma) * median_seconds for _ in range(n_files)]
+    results = {}
+
+    for strategy in ("fixed", "poller"):
+        client = _SimulatedFiles()
+        poller = FilePoller(client)
+
+        def run(i):
+            start = time.monotonic()
+            file = client.add(f"files/{strategy}-{i}", durations[i])
+            if strategy == "fixed":
+                _fixed_interval_wait(client, file, interval)
+            else:
+                poller.wait(file)
+            return time.monotonic() - start - durations[i]
+
+        with ThreadPoolExecutor(max_workers=n_files) as executor:
+            overheads = list(executor.map(run, range(n_files)))
+        results[strategy] = {
+            "mean_overhead_seconds": statistics.mean(overheads),
+            "max_overhead_seconds": max(overheads),
+            "status_calls": client.calls,
+        }
+
+    results["saved_seconds_per_file"] = (
+        results["fixed"]["mean_overhead_seconds"] - results["poller"]["mean_overhead_seconds"]
+    )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark FilePoller against fixed-interval polling.")
+    parser.add_argument("--files", type=int, default=24)
+    parser.add_argument("--median", type=float, default=1.5, help="Median simulated processing time in seconds")
+    parser.add_argument("--interval", type=float, default=2.0, help="Fixed polling interval used as the baseline")
+    args = parser.parse_args()
+
+    report = run_benchmark(n_files=args.files, median_seconds=args.median, interval=args.interval)
+    for strategy in ("fixed", "poller"):
+        stats = report[strategy]
+        print(f"{strategy:>6}: mean overhead {stats['mean_overhead_seconds']:.3f}s, "
+              f"max overhead {stats['max_overhead_seconds']:.3f}s, {stats['status_calls']} status calls")
+    print(f"Saved wall-clock per file: {report['saved_seconds_per_file']:.3f}s")
@@ -0,0 +1,253 @@
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+
+from file_poller import FilePoller
+
+# Gemini deletes uploaded files after 48 hours; handles are retired a little before that
+DEFAULT_TTL_SECONDS = 46 * 3600
+
+
+def key_fingerprint(api_key):
+    """Short, non-reversible identifier of an API key; uploaded files belong to the key's project."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def sha256_file(path, chunk_size=1024 * 1024):
+    """Returns the hex SHA-256 digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _RemoteFile:
+    def __init__(self):
+        self.file = None
+        self.ready = threading.Event()
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.users = 0
+        self.retired = False
+
+
+class FileRegistry:
+    """
+    Maps PDF content hashes to uploaded Gemini files so repeated analyses of the
+    same document reuse one upload.
+
+    The first caller for a document uploads it and waits for processing;
+    concurrent callers for the same document wait for that upload instead of
+    starting their own. Handles are released rather than deleted after a call,
+    and a background reaper deletes files that have been idle for
+    ``idle_seconds`` or are close to the server-side expiry. A handle past
+    ``ttl_seconds`` is no longer handed out, but its file is only deleted once
+    the callers still using it have released it.
+    """
+
+    def __init__(self, client, poller=None, ttl_seconds=DEFAULT_TTL_SECONDS, idle_seconds=3600, reap_interval=300):
+        """
+        Args:
+            client: Provider exposing ``delete_file(name=...)`` (see llm_provider)
+            poller: FilePoller used to wait for processing; defaults to a new poller on the client
+            ttl_seconds: Age after which a handle is no longer handed out
+            idle_seconds: Unused handles older than this are deleted by the reaper
+            reap_interval: Seconds between reaper passes
+        """
+        self.client = client
+        self.poller = poller or FilePoller(client)
+        self.ttl_seconds = ttl_seconds
+        self.idle_seconds = idle_seconds
+        self.reap_interval = reap_interval
+        self.uploads = 0
+        self.reuses = 0
+        self._files = {}
+        self._retired = {}  # File name -> retired entry still in use
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _start_reaper(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._reap_loop, name="gemini-file-reaper", daemon=True)
+            self._thread.start()
+
+    def _reap_loop(self):
+        while not self._stop.wait(self.reap_interval):
+            self.reap()
+
+    def acquire(self, digest, upload, owner="", on_stage=None):
+        """
+        Returns the uploaded file for a document, uploading it only if there is no live handle.
+
+        Every successful acquire must be paired with release (or use ``use``).
+        A file that does not become ACTIVE is deleted and returned without being
+        registered, so the caller can report its state.
+
+        Args:
+            digest: Content hash of the document
+            upload: Callable performing the upload and returning the new file
+            owner: Identifies the API key (see key_fingerprint); files are not shared across keys
+            on_stage: Optional callback invoked with "upload" and "processing" when a new upload starts them
+
+        Returns:
+            The remote file object
+        """
+        key = (owner, digest)
+        while True:
+            with self._lock:
+                self._start_reaper()
+                entry = self._files.get(key)
+                if entry is None:
+                    entry = self._files[key] = _RemoteFile()
+                    break
+                if entry.ready.is_set() and time.time() - entry.created_at < self.ttl_seconds:
+                    entry.users += 1
+                    entry.last_used = time.time()
+                    self.reuses += 1
+                    return entry.file
+            # Another caller is uploading this document (or the handle is stale); wait and retry
+            if entry.ready.is_set():
+                self._retire(key, entry)
+            else:
+                entry.ready.wait()
+
+        try:
+            if on_stage is not None:
+                on_stage("upload")
+            remote = upload()
+            with self._lock:
+                self.uploads += 1
+            if on_stage is not None:
+                on_stage("processing")
+            remote = self.poller.wait(remote)
+        except BaseException:
+            with self._lock:
+                self._files.pop(key, None)
+            entry.ready.set()
+            raise
+
+        if remote.state.name != "ACTIVE":
+            with self._lock:
+                self._files.pop(key, None)
+            entry.ready.set()
+            self._delete(remote.name)
+            return remote
+
+        with self._lock:
+            entry.file = remote
+            entry.users = 1
+            entry.last_used = time.time()
+        entry.ready.set()
+        return remote
+
+    def release(self, digest, owner="", remote=None):
+        """
+        Marks one use of a document's file as finished; the file stays available for reuse.
+
+        Args:
+            digest: Content hash of the document
+            owner: As passed to acquire
+            remote: The file returned by acquire; needed to release a handle that was retired
+                (replaced after ttl_seconds) while it was in use
+        """
+        with self._lock:
+            entry = self._files.get((owner, digest))
+            if remote is not None and (entry is None or entry.file is not remote):
+                entry = self._retired.get(remote.name)
+            if entry is None or entry.users == 0:
+                return
+            entry.users -= 1
+            entry.last_used = time.time()
+            if entry.users:
+                return
+            if entry.retired:
+                del self._retired[entry.file.name]
+            elif self._stop.is_set():
+                # Closed registry: the last user deletes the file
+                del self._files[(owner, digest)]
+            else:
+                return
+        self._delete(entry.file.name)
+
+    @contextmanager
+    def use(self, digest, upload, owner="", on_stage=None):
+        """Context manager around acquire/release."""
+        remote = self.acquire(digest, upload, owner, on_stage)
+        try:
+            yield remote
+        finally:
+            if remote.state.name == "ACTIVE":
+                self.release(digest, owner, remote)
+
+    def invalidate(self, digest, owner=""):
+        """Forgets and deletes a document's file, e.g. after the server reported it missing."""
+        with self._lock:
+            entry = self._files.pop((owner, digest), None)
+        if entry is not None and entry.file is not None:
+            self._delete(entry.file.name)
+
+    def _retire(self, key, entry):
+        # Stops handing out a stale handle; callers still using it keep the file until they release it
+        with self._lock:
+            if self._files.get(key) is not entry:
+                return
+            del self._files[key]
+            if entry.users:
+                entry.retired = True
+                self._retired[entry.file.name] = entry
+                return
+        self._delete(entry.file.name)
+
+    def _delete(self, name):
+        try:
+            self.client.delete_file(name=name)
+            print(f"Deleted file {name} from Gemini server.")
+        except Exception as e:
+            print(f"Warning: Failed to delete file {name} from Gemini server: {e}")
+
+    def reap(self, now=None):
+        """
+        Deletes unused files that have been idle too long or are near expiry.
+
+        Returns:
+            Number of files deleted
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            stale = [
+                (key, entry) for key, entry in self._files.items()
+                if entry.ready.is_set() and entry.users == 0 and (
+                    now - entry.last_used > self.idle_seconds or now - entry.created_at > self.ttl_seconds
+                )
+            ]
+            for key, _ in stale:
+                del self._files[key]
+        for _, entry in stale:
+            self._delete(entry.file.name)
+        return len(stale)
+
+    def clear(self):
+        """Deletes every registered file that is not in use."""
+        return self.reap(now=float("inf"))
+
+    def close(self):
+        """
+        Stops the reaper and deletes the idle files; files still in use are
+        deleted when they are released. Calls made after close still work but
+        leave no files behind.
+        """
+        self._stop.set()
+        self.poller.close()
+        return self.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "in_use": sum(1 for entry in self._files.values() if entry.users),
+                "uploads": self.uploads,
+                "reuses": self.reuses,
+            }
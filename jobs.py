@@ -0,0 +1,226 @@
+import itertools
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATES = {SUCCEEDED, FAILED}
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class Job:
+    """
+    A single unit of work tracked by JobManager.
+
+    Stage timings are recorded as the worker reports stage transitions through
+    the callback passed to it, so each job can show how long it spent uploading,
+    waiting on file processing and generating.
+    """
+
+    def __init__(self, job_id, payload):
+        self.id = job_id
+        self.payload = payload
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.stage = None
+        self.stage_started_at = None
+        self.stage_timings = OrderedDict()
+        self.version = 0
+
+    def to_dict(self):
+        now = time.time()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "stage_timings": dict(self.stage_timings),
+            "queued_seconds": (self.started_at or now) - self.created_at,
+            "run_seconds": ((self.finished_at or now) - self.started_at) if self.started_at else None,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Runs submitted jobs on a bounded thread pool and keeps their status in memory.
+
+    The worker is called as ``worker(report_stage, **payload)`` and must return a
+    dict containing either ``"result"`` or ``"error"`` (the same shape returned by
+    ``analyze_pdf_with_gemini``). ``report_stage(name)`` marks the start of a new
+    stage; the previous stage's duration is recorded when it is called.
+    """
+
+    def __init__(self, worker, max_workers=4, max_queue=64, max_finished=1000):
+        """
+        Args:
+            worker: Callable executed for every job
+            max_workers: Number of jobs processed concurrently
+            max_queue: Maximum number of jobs waiting to start before submissions are rejected
+            max_finished: Number of finished jobs kept for status lookups
+        """
+        self.worker = worker
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        self._jobs = OrderedDict()
+        self._condition = threading.Condition()
+        self._queued = 0
+        self._in_flight = 0
+        self._counters = {"submitted": 0, SUCCEEDED: 0, FAILED: 0, "rejected": 0}
+        self._stage_totals = {}
+
+    def submit(self, payload):
+        """
+        Queues a job and returns its ID immediately.
+
+        Raises:
+            QueueFullError: If ``max_queue`` jobs are already waiting
+        """
+        with self._condition:
+            if self._queued >= self.max_queue:
+                self._counters["rejected"] += 1
+                raise QueueFullError(f"Job queue is full ({self.max_queue} jobs waiting)")
+            job = Job(uuid.uuid4().hex, payload)
+            self._jobs[job.id] = job
+            self._queued += 1
+            self._counters["submitted"] += 1
+            self._prune()
+        self._executor.submit(self._run, job)
+        return job.id
+
+    def complete(self, payload, result):
+        """
+        Records an already-finished job (e.g. a cache hit) and returns its ID.
+        """
+        with self._condition:
+            job = Job(uuid.uuid4().hex, payload)
+            job.started_at = job.finished_at = job.created_at
+            job.status = SUCCEEDED
+            job.result = result
+            self._jobs[job.id] = job
+            self._counters["submitted"] += 1
+            self._counters[SUCCEEDED] += 1
+            self._prune()
+        return job.id
+
+    def _run(self, job):
+        with self._condition:
+            self._queued -= 1
+            self._in_flight += 1
+            job.status = RUNNING
+            job.started_at = time.time()
+            self._touch(job)
+
+        def report_stage(name):
+            with self._condition:
+                self._close_stage(job)
+                job.stage = name
+                job.stage_started_at = time.time()
+                self._touch(job)
+
+        try:
+            outcome = self.worker(report_stage, **job.payload)
+        except Exception as e:
+            outcome = {"error": str(e)}
+
+        with self._condition:
+            self._close_stage(job)
+            job.stage = None
+            job.finished_at = time.time()
+            self._in_flight -= 1
+            if "error" in outcome:
+                job.status = FAILED
+                job.error = outcome["error"]
+            else:
+                job.status = SUCCEEDED
+                job.result = outcome
+            self._counters[job.status] += 1
+            self._touch(job)
+
+    def _close_stage(self, job):
+        # Caller holds the condition lock
+        if job.stage is None:
+            return
+        elapsed = time.time() - job.stage_started_at
+        job.stage_timings[job.stage] = job.stage_timings.get(job.stage, 0.0) + elapsed
+        count, total = self._stage_totals.get(job.stage, (0, 0.0))
+        self._stage_totals[job.stage] = (count + 1, total + elapsed)
+
+    def _touch(self, job):
+        # Caller holds the condition lock
+        job.version += 1
+        self._condition.notify_all()
+
+    def _prune(self):
+        # Caller holds the condition lock; drop the oldest finished jobs beyond the retention limit
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATES]
+        for job_id in itertools.islice(finished, max(0, len(finished) - self.max_finished)):
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """Returns the Job for an ID, or None if it is unknown."""
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def events(self, job_id, timeout=15.0):
+        """
+        Yields server-sent event strings for every status change of a job until it finishes.
+
+        A comment line is emitted every ``timeout`` seconds without a change to keep
+        the connection alive.
+        """
+        seen = -1
+        while True:
+            with self._condition:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    yield f"event: error\ndata: {json.dumps({'error': 'Unknown job'})}\n\n"
+                    return
+                if job.version == seen:
+                    self._condition.wait(timeout)
+                    if job.version == seen:
+                        yield ": keep-alive\n\n"
+                        continue
+                seen = job.version
+                snapshot = job.to_dict()
+                finished = job.status in FINISHED_STATES
+            yield f"event: status\ndata: {json.dumps(snapshot)}\n\n"
+            if finished:
+                return
+
+    def stats(self):
+        """
+        Returns queue depth, in-flight count, totals and mean per-stage timings.
+        """
+        with self._condition:
+            return {
+                "queue_depth": self._queued,
+                "in_flight": self._in_flight,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "jobs_submitted": self._counters["submitted"],
+                "jobs_succeeded": self._counters[SUCCEEDED],
+                "jobs_failed": self._counters[FAILED],
+                "jobs_rejected": self._counters["rejected"],
+                "stage_mean_seconds": {
+                    stage: total / count for stage, (count, total) in self._stage_totals.items()
+                },
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,385 @@
+"""
+LLM providers used by the backend, the batch scorer and the re-scoring pipeline.
+
+A provider offers the file and generation calls the scorers make:
+
+    upload_file(path, mime_type=None, display_name=None) -> file with .name and .state.name
+    get_file(name), list_files(), delete_file(name)
+    generate_content(model_name, contents, generation_config=None) -> response with .text
+
+and owns a FileRegistry (``provider.registry``) through which uploads are
+reused and cleaned up.
+
+GeminiProvider talks to the Gemini API with its own clients, configured once
+per API key, so requests with different keys never reconfigure the global
+google.generativeai state. SimulatedProvider is an offline stand-in with
+configurable latency distributions and failure modes for load tests.
+
+Set LLM_PROVIDER=simulated to run the backend or the batch scorer against the
+simulator; SIMULATOR_CONFIG may hold a JSON object of SimulatedProvider
+arguments, e.g. '{"generate_seconds": [40, 110], "rate_limit_rate": 0.02}'.
+"""
+import atexit
+import hashlib
+import itertools
+import json
+import math
+import mimetypes
+import os
+import random
+import re
+import threading
+import time
+import types
+from collections import OrderedDict
+from io import IOBase
+from pathlib import Path
+
+from file_poller import INITIAL_DELAY, MAX_DELAY, FilePoller
+from file_registry import FileRegistry, key_fingerprint
+
+PROVIDER = os.environ.get("LLM_PROVIDER", "gemini")
+PROVIDERS = ("gemini", "simulated")
+
+# Providers (each with a file registry and its threads) kept for recently used API keys
+MAX_PROVIDERS = int(os.environ.get("LLM_MAX_PROVIDERS", 32))
+
+# GeminiProvider uses the SDK's private client manager; this is the release series it was checked against
+GENAI_SDK_SERIES = "0.8."
+
+
+class _Provider:
+    """Shared plumbing: a lazily created FileRegistry whose files are deleted at exit."""
+
+    # Multiplier for client-side waits (status polling, retry backoff); the simulator runs faster than real time
+    time_scale = 1.0
+
+    _registry = None
+    _registry_lock = threading.Lock()
+
+    @property
+    def registry(self):
+        with self._registry_lock:
+            if self._registry is None:
+                poller = FilePoller(self, initial_delay=INITIAL_DELAY * self.time_scale,
+                                    max_delay=MAX_DELAY * self.time_scale)
+                self._registry = FileRegistry(self, poller=poller)
+                atexit.register(self._registry.clear)
+            return self._registry
+
+    def close(self):
+        """Stops the provider's background threads and deletes its uploaded files (see FileRegistry.close)."""
+        with self._registry_lock:
+            registry = self._registry
+        if registry is not None:
+            atexit.unregister(registry.clear)
+            registry.close()
+
+
+class GeminiProvider(_Provider):
+    """
+    Gemini API adapter bound to one API key.
+
+    google.generativeai keeps one global configuration; this adapter builds
+    its own set of service clients for the key instead (the SDK's client
+    manager, used privately), so concurrent requests with different keys are
+    isolated and nothing is reconfigured per call.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key):
+        import google.generativeai as genai
+        from google.generativeai import client as genai_client
+        if not hasattr(genai_client, "_ClientManager"):
+            raise RuntimeError(f"google-generativeai {genai.__version__} is not supported; "
+                               f"install a {GENAI_SDK_SERIES}x release")
+        if not genai.__version__.startswith(GENAI_SDK_SERIES):
+            print(f"Warning: GeminiProvider was checked with google-generativeai {GENAI_SDK_SERIES}x, "
+                  f"found {genai.__version__}")
+        self._clients = genai_client._ClientManager()
+        self._clients.configure(api_key=api_key)
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _client(self, service):
+        with self._lock:
+            return self._clients.get_default_client(service)
+
+    def upload_file(self, path, mime_type=None, display_name=None):
+        """Uploads a file given as a path or a binary file object (which requires mime_type)."""
+        from google.generativeai.types import file_types
+        if not isinstance(path, IOBase):
+            path = Path(os.fspath(path))
+            display_name = display_name or path.name
+            mime_type = mime_type or mimetypes.guess_type(path)[0]
+        if mime_type is None:
+            raise ValueError("Unknown mime type: pass mime_type for file objects and unknown extensions")
+        response = self._client("file").create_file(path=path, mime_type=mime_type, display_name=display_name)
+        return file_types.File(response)
+
+    def get_file(self, name):
+        from google.generativeai.types import file_types
+        return file_types.File(self._client("file").get_file(name=name))
+
+    def list_files(self, page_size=100):
+        from google.generativeai import protos
+        from google.generativeai.types import file_types
+        response = self._client("file").list_files(protos.ListFilesRequest(page_size=page_size))
+        return [file_types.File(proto) for proto in response]
+
+    def delete_file(self, name):
+        from google.generativeai import protos
+        self._client("file").delete_file(request=protos.DeleteFileRequest(name=name))
+
+    def generate_content(self, model_name, contents, generation_config=None):
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is None:
+                import google.generativeai as genai
+                model = genai.GenerativeModel(model_name=model_name)
+                model._client = self._clients.get_default_client("generative")
+                self._models[model_name] = model
+        return model.generate_content(contents, generation_config=generation_config)
+
+
+def _lognormal(rng, p50, p99):
+    """Samples a log-normal latency with the given median and 99th percentile."""
+    if p99 <= p50:
+        return p50
+    sigma = (math.log(p99) - math.log(p50)) / 2.326  # z-score of the 99th percentile
+    return rng.lognormvariate(math.log(p50), sigma)
+
+
+class SimulatedProvider(_Provider):
+    """
+    Offline provider that mimics Gemini's latencies and failure modes.
+
+    Latencies are log-normal with the configured (p50, p99) in seconds. A
+    generate call takes ``generate_seconds`` for the whole rubric and a share of
+    it for a section subset (a fifth of the time is fixed, the rest scales with
+    the number of questions asked). Answers are deterministic: each Yes/No is
+    derived from the uploaded bytes and the question, so a document always gets
+    the same scores.
+
+    Failure modes, each drawn per call:
+        upload_error_rate: upload_file raises ServiceUnavailable
+        processing_failure_rate: the file ends processing in state FAILED
+        rate_limit_rate: generate_content raises ResourceExhausted
+        server_error_rate: generate_content raises InternalServerError
+        file_lost_rate: generate_content raises NotFound (file expired or deleted)
+        malformed_rate: the response is truncated, invalid JSON
+    ``max_concurrent_generations`` additionally rejects calls beyond a quota of
+    in-flight generations with ResourceExhausted.
+    """
+
+    name = "simulated"
+
+    def __init__(self, upload_seconds=(1.0, 4.0), processing_seconds=(3.0, 12.0),
+                 generate_seconds=(45.0, 120.0), upload_error_rate=0.0, processing_failure_rate=0.0,
+                 rate_limit_rate=0.0, server_error_rate=0.0, file_lost_rate=0.0, malformed_rate=0.0,
+                 max_concurrent_generations=None, time_scale=1.0, seed=0):
+        """
+        Args:
+            upload_seconds: (p50, p99) of upload_file
+            processing_seconds: (p50, p99) of the time a file stays PROCESSING
+            generate_seconds: (p50, p99) of a full-rubric generate_content call
+            max_concurrent_generations: Generations allowed in flight at once, or None for no limit
+            time_scale: Multiplier applied to every latency (e.g. 0.01 for fast tests), and to the
+                status polling and retry backoff of the code driving the provider
+            seed: Seed of the latency and failure draws
+        """
+        self.upload_seconds = tuple(upload_seconds)
+        self.processing_seconds = tuple(processing_seconds)
+        self.generate_seconds = tuple(generate_seconds)
+        self.upload_error_rate = upload_error_rate
+        self.processing_failure_rate = processing_failure_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.file_lost_rate = file_lost_rate
+        self.malformed_rate = malformed_rate
+        self.max_concurrent_generations = max_concurrent_generations
+        self.time_scale = time_scale
+        self.calls = {"upload": 0, "get": 0, "list": 0, "delete": 0, "generate": 0, "errors": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._files = {}  # name -> dict(digest, display_name, ready_at, failed)
+        self._ids = itertools.count()
+        self._in_flight = 0
+
+    @classmethod
+    def from_env(cls):
+        """Builds a simulator from the JSON object in SIMULATOR_CONFIG (if set)."""
+        return cls(**json.loads(os.environ.get("SIMULATOR_CONFIG") or "{}"))
+
+    def _draw(self, rate):
+        with self._lock:
+            return rate > 0 and self._rng.random() < rate
+
+    def _sleep(self, p50_p99, fraction=1.0):
+        with self._lock:
+            seconds = _lognormal(self._rng, *p50_p99)
+        time.sleep(seconds * fraction * self.time_scale)
+
+    def _fail(self, error_type, message):
+        from google.api_core import exceptions
+        with self._lock:
+            self.calls["errors"] += 1
+        raise getattr(exceptions, error_type)(message)
+
+    def _file(self, name):
+        with self._lock:
+            entry = self._files.get(name)
+        if entry is None:
+            self._fail("NotFound", f"File {name} not found")
+        if time.monotonic() < entry["ready_at"]:
+            state = "PROCESSING"
+        else:
+            state = "FAILED" if entry["failed"] else "ACTIVE"
+        return types.SimpleNamespace(name=name, display_name=entry["display_name"],
+                                     state=types.SimpleNamespace(name=state))
+
+    def upload_file(self, path, mime_type=None, display_name=None):
+        with self._lock:
+            self.calls["upload"] += 1
+        digest = hashlib.sha256()
+        if isinstance(path, IOBase):
+            for chunk in iter(lambda: path.read(1024 * 1024), b""):
+                digest.update(chunk)
+        else:
+            display_name = display_name or Path(path).name
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+        self._sleep(self.upload_seconds)
+        if self._draw(self.upload_error_rate):
+            self._fail("ServiceUnavailable", "Simulated upload failure")
+        with self._lock:
+            processing = _lognormal(self._rng, *self.processing_seconds) * self.time_scale
+            name = f"files/sim-{next(self._ids)}"
+            self._files[name] = {
+                "digest": digest.hexdigest(),
+                "display_name": display_name or name,
+                "ready_at": time.monotonic() + processing,
+                "failed": self._rng.random() < self.processing_failure_rate,
+            }
+        return self._file(name)
+
+    def get_file(self, name):
+        with self._lock:
+            self.calls["get"] += 1
+        return self._file(name)
+
+    def list_files(self, page_size=100):
+        with self._lock:
+            self.calls["list"] += 1
+            names = list(self._files)
+        return [self._file(name) for name in names]
+
+    def delete_file(self, name):
+        with self._lock:
+            self.calls["delete"] += 1
+            found = self._files.pop(name, None) is not None
+        if not found:
+            self._fail("NotFound", f"File {name} not found")
+
+    def generate_content(self, model_name, contents, generation_config=None):
+        import rubric
+        with self._lock:
+            self.calls["generate"] += 1
+        prompt = next(part for part in contents if isinstance(part, str))
+        numbers = [int(n) for n in re.findall(r"^Section (\d+) Total:", prompt, flags=re.MULTILINE)]
+        questions = [q for n in numbers for q in rubric.SECTIONS_BY_NUMBER[n].questions]
+        document = ""
+        for part in contents:
+            if hasattr(part, "name") and hasattr(part, "state"):
+                self._file(part.name)  # Raises NotFound for deleted files
+                with self._lock:
+                    document = self._files[part.name]["digest"]
+            elif part is not prompt:
+                document = hashlib.sha256(str(part).encode("utf-8")).hexdigest()
+
+        with self._lock:
+            over_quota = self.max_concurrent_generations is not None and \
+                self._in_flight >= self.max_concurrent_generations
+            if not over_quota:
+                self._in_flight += 1
+        if over_quota:
+            self._fail("ResourceExhausted", "Simulated quota exceeded (too many concurrent requests)")
+        try:
+            if self._draw(self.rate_limit_rate):
+                self._fail("ResourceExhausted", "Simulated rate limit")
+            fraction = 0.2 + 0.8 * len(questions) / max(1, sum(len(s.questions) for s in rubric.SECTIONS))
+            self._sleep(self.generate_seconds, fraction)
+            if self._draw(self.server_error_rate):
+                self._fail("InternalServerError", "Simulated server error")
+            if self._draw(self.file_lost_rate):
+                self._fail("NotFound", "Simulated missing file")
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        answers = {q.text: hashlib.sha256(f"{document}:{q.text}".encode("utf-8")).digest()[0] % 2 == 0
+                   for q in questions}
+        if "Return the analysis as JSON" in prompt:
+            data = {
+                "sections": [
+                    {
+                        "section": n,
+                        "questions": [
+                            {"question": q.text, "answer": "Yes" if answers[q.text] else "No",
+                             "justification": "Simulated answer."}
+                            for q in rubric.SECTIONS_BY_NUMBER[n].questions
+                        ],
+                        "subtotal": sum(answers[q.text] for q in rubric.SECTIONS_BY_NUMBER[n].questions),
+                    }
+                    for n in numbers
+                ],
+                "total": sum(answers.values()),
+                "summary": "Simulated analysis.",
+            }
+            text = json.dumps(data)
+        else:
+            text = "\n".join(
+                f"Section {n}: {rubric.SECTIONS_BY_NUMBER[n].title}: "
+                f"{sum(answers[q.text] for q in rubric.SECTIONS_BY_NUMBER[n].questions)}"
+                for n in numbers
+            )
+        if self._draw(self.malformed_rate):
+            text = text[:len(text) // 2]
+        return types.SimpleNamespace(text=text)
+
+
+_providers = OrderedDict()
+_providers_lock = threading.Lock()
+
+
+def get_provider(api_key=None, kind=None):
+    """
+    Returns the provider for an API key, creating (and configuring) it only once.
+
+    At most MAX_PROVIDERS providers are kept; the least recently used one is
+    closed when another key needs a slot, so a server taking user-supplied
+    keys does not accumulate clients, registries and threads.
+
+    Args:
+        api_key: Gemini API key; ignored by the simulator
+        kind: "gemini" or "simulated"; defaults to LLM_PROVIDER
+    """
+    kind = kind or PROVIDER
+    if kind not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {kind}")
+    key = (kind, key_fingerprint(api_key or "") if kind == "gemini" else "")
+    evicted = []
+    with _providers_lock:
+        provider = _providers.get(key)
+        if provider is not None:
+            _providers.move_to_end(key)
+            return provider
+        provider = GeminiProvider(api_key) if kind == "gemini" else SimulatedProvider.from_env()
+        _providers[key] = provider
+        while len(_providers) > MAX_PROVIDERS:
+            evicted.append(_providers.popitem(last=False)[1])
+    for old in evicted:
+        old.close()
+    return provider
@@ -0,0 +1,122 @@
+"""
+Load test of the analysis endpoint against the simulated LLM provider.
+
+Posts fake PDFs to /api/analyze-pdf from concurrent clients, with every
+Gemini call answered by llm_provider.SimulatedProvider, and reports request
+latency percentiles, error counts and the provider calls made. No API key or
+network access is needed. The simulator's latencies and failure rates come
+from SIMULATOR_CONFIG; --time-scale shrinks them, together with the
+backend's status polling and retry backoff, so a run finishes quickly
+(reported latencies are scaled back).
+
+Usage:
+    python loadtest.py [--requests 200] [--concurrency 16] [--mode full] [--repeat 0.2]
+    SIMULATOR_CONFIG='{"generate_seconds": [40, 110], "rate_limit_rate": 0.02}' python loadtest.py
+"""
+import argparse
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+def fake_pdf(index, rng):
+    """A minimal one-page PDF with unique, extractable text, so every mode (including retrieval) can run."""
+    words = " ".join(f"emissions{rng.randrange(10 ** 6)}" for _ in range(40))
+    text = f"Climate action plan {index}: greenhouse gas inventory, adaptation and resilience. {words}"
+    stream = f"BT /F1 10 Tf 40 750 Td ({text}) Tj ET".encode("latin-1")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(pdf)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the backend against the simulated LLM provider.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mode", default="full", help="Analysis mode (full, sections or retrieval)")
+    parser.add_argument("--repeat", type=float, default=0.0,
+                        help="Share of requests that resend an earlier document")
+    parser.add_argument("--time-scale", type=float, default=0.01, help="Multiplier applied to simulated latencies")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Configure the simulator, a throwaway result cache and vector index before the backend reads them
+    config = json.loads(os.environ.get("SIMULATOR_CONFIG") or "{}")
+    config.setdefault("time_scale", args.time_scale)
+    config.setdefault("seed", args.seed)
+    os.environ["SIMULATOR_CONFIG"] = json.dumps(config)
+    os.environ["LLM_PROVIDER"] = "simulated"
+    scratch = tempfile.mkdtemp(prefix="loadtest-")
+    os.environ["RESULT_CACHE_PATH"] = os.path.join(scratch, "analysis_results.sqlite3")
+    os.environ["VECTOR_INDEX_DIR"] = os.path.join(scratch, "vector_index")
+
+    import backend
+    from llm_provider import get_provider
+
+    rng = random.Random(args.seed)
+    documents = []
+    for i in range(args.requests):
+        if documents and rng.random() < args.repeat:
+            documents.append(rng.choice(documents))
+        else:
+            documents.append(fake_pdf(i, rng))
+
+    def post(index):
+        client = backend.app.test_client()
+        data = {"api_key": "simulated", "mode": args.mode,
+                "file": (io.BytesIO(documents[index]), f"report_{index}.pdf")}
+        start = time.perf_counter()
+        response = client.post("/api/analyze-pdf", data=data, content_type="multipart/form-data")
+        elapsed = (time.perf_counter() - start) / config["time_scale"]
+        body = response.get_json() or {}
+        if response.status_code == 200:
+            outcome = "cached" if body.get("cached") else "ok"
+        else:
+            outcome = f"{response.status_code} {str(body.get('error', ''))[:60]}"
+        return elapsed, outcome
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(post, range(args.requests)))
+    wall = time.perf_counter() - start
+
+    latencies = [elapsed for elapsed, outcome in results if outcome == "ok"]
+    outcomes = Counter(outcome for _, outcome in results)
+    provider = get_provider("simulated")
+    print(f"{args.requests} requests, concurrency {args.concurrency}, mode {args.mode}: "
+          f"{wall:.1f}s wall ({wall / config['time_scale']:.0f}s simulated)")
+    print(f"Latency of uncached successes (simulated seconds): p50 {percentile(latencies, 50):.1f}, "
+          f"p90 {percentile(latencies, 90):.1f}, p99 {percentile(latencies, 99):.1f}, "
+          f"max {max(latencies, default=0):.1f}")
+    for outcome, count in outcomes.most_common():
+        print(f"  {count:>5}  {outcome}")
+    print(f"Provider calls: {provider.calls}")
+    print(f"File registry: {provider.registry.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Local PDF text extraction and chunking.
+
+Pages are streamed through generators: text is extracted page by page (across
+a process pool for long documents) and turned into overlapping word chunks
+that remember their pages, so only a bounded window of the document is in
+memory at any time.
+"""
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Documents with fewer pages are extracted in-process; starting workers would cost more than it saves
+PARALLEL_MIN_PAGES = 24
+
+# Pages extracted per worker task
+PAGES_PER_TASK = 8
+
+
+def _reader(source):
+    from pypdf import PdfReader
+    if hasattr(source, "read"):
+        source.seek(0)
+    return PdfReader(source)
+
+
+def page_count(source):
+    """Returns the number of pages of a PDF given as a path or a binary file object."""
+    return len(_reader(source).pages)
+
+
+def iter_pages(source, start=0, stop=None):
+    """
+    Yields (page number, text) for pages [start, stop) of a PDF, numbered from 1.
+
+    pypdf reads page objects on demand, so pages are parsed one at a time.
+
+    Args:
+        source: Path to the PDF or a seekable binary file object
+    """
+    reader = _reader(source)
+    stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+    for index in range(start, stop):
+        yield index + 1, reader.pages[index].extract_text() or ""
+
+
+# Reader opened once per worker process
+_worker = {}
+
+
+def _open_worker_reader(file_path):
+    _worker["reader"] = _reader(file_path)
+
+
+def _extract_range(start, stop):
+    reader = _worker["reader"]
+    return [(index + 1, reader.pages[index].extract_text() or "") for index in range(start, stop)]
+
+
+def extract_pages(source, workers=None, pages_per_task=PAGES_PER_TASK):
+    """
+    Yields (page number, text) for every page of a PDF, in page order.
+
+    Long documents are split into page ranges extracted by a process pool.
+    At most two ranges per worker are in flight, so memory stays bounded no
+    matter how many pages the document has.
+
+    Args:
+        source: Path to the PDF, or a binary file object (always extracted in-process)
+        workers: Worker processes; None uses every CPU, 1 extracts in-process
+        pages_per_task: Pages per worker task
+    """
+    total = page_count(source)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or total < PARALLEL_MIN_PAGES or hasattr(source, "read"):
+        yield from iter_pages(source)
+        return
+
+    ranges = iter([(start, min(start + pages_per_task, total)) for start in range(0, total, pages_per_task)])
+    # The backend extracts from request threads, where forking the whole process is unsafe
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method),
+                             initializer=_open_worker_reader, initargs=(source,)) as executor:
+        pending = deque()
+        for page_range in ranges:
+            pending.append(executor.submit(_extract_range, *page_range))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            pages = pending.popleft().result()
+            next_range = next(ranges, None)
+            if next_range is not None:
+                pending.append(executor.submit(_extract_range, *next_range))
+            yield from pages
+
+
+def iter_chunks(pages, chunk_words=220, overlap=40):
+    """
+    Turns a stream of (page number, text) into overlapping word chunks.
+
+    Only the words of the chunk being built are kept, so arbitrarily long
+    documents can be chunked from a page generator.
+
+    Args:
+        pages: Iterable of (page number, text)
+        chunk_words: Words per chunk
+        overlap: Words shared by consecutive chunks
+
+    Yields:
+        Dicts with "text", "page" (first page) and "end_page" (last page)
+    """
+    if not 0 <= overlap < chunk_words:
+        raise ValueError("overlap must be smaller than chunk_words")
+    window = deque()  # (word, page)
+    emitted_to = 0  # Words of the window already covered by the previous chunk
+    for number, text in pages:
+        for word in text.split():
+            window.append((word, number))
+            if len(window) == chunk_words:
+                yield _chunk(window)
+                for _ in range(chunk_words - overlap):
+                    window.popleft()
+                emitted_to = overlap
+    # The tail, unless it is only the overlap of the last chunk
+    if len(window) > emitted_to:
+        yield _chunk(window)
+
+
+def _chunk(window):
+    return {
+        "text": " ".join(word for word, _ in window),
+        "page": window[0][1],
+        "end_page": window[-1][1],
+    }
+
+
+def chunk_pdf(source, chunk_words=220, overlap=40, workers=None):
+    """Streams the overlapping chunks of a PDF path or file object (see extract_pages and iter_chunks)."""
+    return iter_chunks(extract_pages(source, workers=workers), chunk_words, overlap)
@@ -0,0 +1,308 @@
+"""
+Incremental re-scoring of a report collection.
+
+A JSON manifest records every score under the key (PDF SHA-256, rubric
+version, model, plus the LLM provider unless it is Gemini). A run hashes the PDFs, and only documents whose key has no
+successful score yet are sent to Gemini. Unchanged files are recognised by
+their size and modification time, so they are not even re-hashed. The score
+table is updated in place for the cities whose scores changed, and their peer
+cluster is re-assigned with the saved ClusterModel (nearest centroid) instead
+of refitting the clustering. A run with no changes makes no model calls.
+
+Usage:
+    python rescore.py reports/ [--table city_scores.csv] [--manifest rescore_manifest.json]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import rubric
+from file_registry import sha256_file
+from llm_provider import PROVIDER, get_provider
+from scores import SECTION_TITLES, parse_scores
+
+MANIFEST_PATH = "rescore_manifest.json"
+TABLE_PATH = "city_scores.csv"
+
+DEMOGRAPHIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Demographic Data  Collection")
+CLUSTER_MODEL_PATH = os.environ.get("CLUSTER_MODEL_PATH",
+                                    os.path.join(DEMOGRAPHIC_DIR, "features", "cluster_model.npz"))
+
+SCORE_COLUMNS = [f"Section {number} Score" for number in SECTION_TITLES] + ["Total Score"]
+
+
+def city_from_path(pdf_path):
+    """Default city of a report: its file name without extension, with underscores as spaces."""
+    return Path(pdf_path).stem.replace("_", " ").strip()
+
+
+class ScoreManifest:
+    """
+    Scores keyed by (document hash, rubric version, model), plus a stat cache
+    of the document hashes so unchanged files are not read again.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            data = {}
+        self.scores = data.get("scores", {})
+        self.files = data.get("files", {})
+
+    @staticmethod
+    def key(digest, rubric_version, model_name, provider=PROVIDER):
+        key = f"{digest}:{rubric_version}:{model_name}"
+        # Scores from other providers (e.g. the simulator) never stand in for Gemini scores
+        return key if provider == "gemini" else f"{key}:{provider}"
+
+    def digest(self, pdf_path):
+        """Returns a PDF's SHA-256, reusing the recorded hash while its size and mtime are unchanged."""
+        path = str(Path(pdf_path).resolve())
+        stat = os.stat(path)
+        cached = self.files.get(path)
+        if cached is not None and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+            return cached["sha256"]
+        digest = sha256_file(path)
+        with self._lock:
+            self.files[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+        return digest
+
+    def get(self, key):
+        """Returns the recorded successful score for a key, or None."""
+        entry = self.scores.get(key)
+        return entry if entry is not None and entry.get("status") == "ok" else None
+
+    def put(self, key, entry):
+        with self._lock:
+            self.scores[key] = entry
+
+    def save(self):
+        """Writes the manifest atomically."""
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"scores": self.scores, "files": self.files}, f, indent=1)
+            os.replace(tmp_path, self.path)
+
+
+def merged_scores(row, scores):
+    """
+    Returns the score columns of a table row updated with newly scored sections.
+
+    Sections that were not scored (None, e.g. outside a --sections subset) keep
+    their current value. Total Score is recomputed from the section columns
+    when all of them are known, and otherwise left unchanged.
+    """
+    values = {column: str(scores[column]) for column in SCORE_COLUMNS[:-1] if scores.get(column) is not None}
+    sections = [values.get(column, row.get(column, "")) for column in SCORE_COLUMNS[:-1]]
+    if all(value != "" for value in sections):
+        values["Total Score"] = str(sum(int(float(value)) for value in sections))
+    return values
+
+
+def read_table(path):
+    """Reads the score table as (columns, rows by city), or empty if it does not exist."""
+    if not os.path.exists(path):
+        return [], {}
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        return list(reader.fieldnames or []), {row["City"]: row for row in reader}
+
+
+def write_table(path, columns, rows):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows.values())
+    os.replace(tmp_path, path)
+
+
+def load_cluster_model(path=CLUSTER_MODEL_PATH):
+    """Loads the saved ClusterModel, or returns None if there is none."""
+    if not path or not os.path.exists(path):
+        return None
+    if DEMOGRAPHIC_DIR not in sys.path:
+        sys.path.append(DEMOGRAPHIC_DIR)
+    from clusterModel import ClusterModel
+    model = ClusterModel.load(path)
+    if model.rubric_version not in (None, rubric.RUBRIC_VERSION):
+        print(f"Warning: Cluster model {model.version} was fitted with rubric {model.rubric_version}, "
+              f"current rubric is {rubric.RUBRIC_VERSION}")
+    return model
+
+
+def assign_clusters(model, rows, features_path=None):
+    """
+    Assigns clusters to score table rows with a fitted model (no refit).
+
+    Model features missing from the rows are taken from the feature table
+    (matched on City) when one is given; anything still missing is imputed by
+    the model.
+
+    Returns:
+        Dict of city -> cluster ID
+    """
+    extra = {}
+    wanted = [f for f in model.features if any(f not in row for row in rows.values())]
+    if wanted and features_path:
+        if DEMOGRAPHIC_DIR not in sys.path:
+            sys.path.append(DEMOGRAPHIC_DIR)
+        import pandas as pd
+        from clustering import load_feature_table
+        features = load_feature_table(features_path) if not str(features_path).lower().endswith(".csv") \
+            else pd.read_csv(features_path)
+        features = features[features["City"].astype(str).isin(list(rows))]
+        extra = {str(row["City"]): row for row in features.to_dict("records")}
+
+    def value(city, feature):
+        raw = rows[city].get(feature)
+        if raw in (None, ""):
+            raw = extra.get(city, {}).get(feature)
+        try:
+            return float(raw)
+        except (TypeError, ValueError):
+            return None
+
+    cities = list(rows)
+    labels = model.assign([{f: value(city, f) for f in model.features} for city in cities])
+    return {city: int(label) for city, label in zip(cities, labels)}
+
+
+def rescore(api_key, pdf_paths, table_path=TABLE_PATH, manifest_path=MANIFEST_PATH, model_name=None,
+            sections=None, concurrency=4, city_of=city_from_path, cluster_model_path=CLUSTER_MODEL_PATH,
+            features_path=None):
+    """
+    Scores new or changed reports and updates the score table and cluster assignments.
+
+    Args:
+        api_key: Gemini API key; only used if something needs scoring
+        pdf_paths: Report PDFs, one per city
+        table_path: CSV score table (City, section scores, Total Score, Cluster, ...) updated in place
+        manifest_path: JSON manifest of past scores
+        model_name: Gemini model; defaults to GeminiAPIReport.MODEL_NAME
+        sections: Rubric section numbers to score, or None for the full rubric; only their columns
+            (and the total) are updated
+        concurrency: Reports scored at once
+        city_of: Callable mapping a PDF path to its city
+        cluster_model_path: Saved ClusterModel used to re-assign changed cities (skipped if missing)
+        features_path: Optional feature table supplying the model's non-score features
+
+    Returns:
+        Dict with counts of files, scored, reused, failed and updated cities, the cluster changes
+        and the elapsed seconds
+    """
+    import GeminiAPIReport
+    model_name = model_name or GeminiAPIReport.MODEL_NAME
+    version = rubric.rubric_version(sections)
+    started = time.time()
+
+    manifest = ScoreManifest(manifest_path)
+    pending, reused, results = [], 0, {}
+    for pdf_path in pdf_paths:
+        key = manifest.key(manifest.digest(pdf_path), version, model_name)
+        entry = manifest.get(key)
+        if entry is None:
+            pending.append((pdf_path, key))
+        else:
+            reused += 1
+            results[city_of(pdf_path)] = entry
+    print(f"{len(pdf_paths)} reports: {reused} unchanged, {len(pending)} to score.")
+
+    failed = 0
+    if pending:
+        provider = get_provider(api_key)
+
+        def run(pdf_path, key):
+            entry = {"file": str(Path(pdf_path).resolve()), "city": city_of(pdf_path), "model": model_name,
+                     "rubric_version": version, "scored_at": time.time()}
+            try:
+                scores = parse_scores(GeminiAPIReport.score_pdf(pdf_path, model_name, sections, provider=provider))
+                if scores is None:
+                    raise ValueError("Response could not be parsed into rubric scores")
+                missing = scores.missing_sections(sections)
+                if missing:
+                    raise ValueError(f"Incomplete scores: sections {missing} are missing or partly answered")
+                entry.update(status="ok", scores=scores.as_row(), warnings=list(scores.warnings))
+            except Exception as e:
+                entry.update(status="error", error=str(e))
+            manifest.put(key, entry)
+            manifest.save()  # After every report, so an interrupted run keeps its progress
+            return entry
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(run, pdf_path, key) for pdf_path, key in pending]
+            for done, future in enumerate(as_completed(futures), start=1):
+                entry = future.result()
+                print(f"[{done}/{len(pending)}] {entry['city']}: {entry['status']}")
+                if entry["status"] == "ok":
+                    results[entry["city"]] = entry
+                else:
+                    failed += 1
+    manifest.save()
+
+    # Update only the table rows whose scores differ from the manifest
+    columns, rows = read_table(table_path)
+    for column in ["City"] + SCORE_COLUMNS:
+        if column not in columns:
+            columns.append(column)
+    changed = {}
+    for city, entry in results.items():
+        row = rows.get(city, {"City": city})
+        values = merged_scores(row, entry["scores"])
+        if any(row.get(column, "") != value for column, value in values.items()):
+            row.update(values)
+            rows[city] = changed[city] = row
+
+    clusters = {}
+    model = load_cluster_model(cluster_model_path) if changed else None
+    if model is not None:
+        if "Cluster" not in columns:
+            columns.append("Cluster")
+        for city, cluster in assign_clusters(model, changed, features_path).items():
+            if changed[city].get("Cluster", "") != str(cluster):
+                clusters[city] = (changed[city].get("Cluster") or None, cluster)
+            changed[city]["Cluster"] = str(cluster)
+
+    if changed:
+        write_table(table_path, columns, rows)
+    summary = {
+        "files": len(pdf_paths),
+        "scored": len(pending) - failed,
+        "reused": reused,
+        "failed": failed,
+        "updated": sorted(changed),
+        "cluster_changes": clusters,
+        "seconds": round(time.time() - started, 2),
+    }
+    print(f"Updated {len(changed)} cities in {table_path}, {len(clusters)} changed cluster "
+          f"({summary['seconds']}s, {len(pending)} model calls).")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-score only new or changed climate action plan PDFs.")
+    parser.add_argument("reports", help="Directory of PDFs or manifest file (one path per line)")
+    parser.add_argument("--table", default=TABLE_PATH, help="Score table updated in place")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="JSON manifest of past scores")
+    parser.add_argument("--cluster-model", default=CLUSTER_MODEL_PATH, help="Saved ClusterModel (.npz)")
+    parser.add_argument("--features", help="Feature table with the model's demographic features")
+    parser.add_argument("--model", help="Gemini model name")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--sections", type=int, nargs="+", help="Score only these rubric sections")
+    args = parser.parse_args()
+
+    from GeminiAPIReport import collect_pdfs
+    rescore(os.environ.get("GEMINI_API_KEY", ""), collect_pdfs(args.reports), table_path=args.table,
+            manifest_path=args.manifest, model_name=args.model, sections=args.sections,
+            concurrency=args.concurrency, cluster_model_path=args.cluster_model, features_path=args.features)
@@ -5,6 +5,7 @@ function App() {
   const [file, setFile] = useState(null);
   const [apiKey, setApiKey] = useState('');
   const [analysis, setAnalysis] = useState(null);
+  const [scores, setScores] = useState(null);
   const [error, setError] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
 
@@ -51,6 +52,7 @@ function App() {
       }
       
       setAnalysis(data.result);
+      setScores(data.scores || null);
     } catch (err) {
       setError(err.message || 'An error occurred');
     } finally {
@@ -107,6 +109,28 @@ function App() {
         {analysis && (
           <div className="analysis-results">
             <h2>Analysis Results</h2>
+            {scores && (
+              <table className="scores-table">
+                <thead>
+                  <tr>
+                    <th>Section</th>
+                    <th>Score</th>
+                  </tr>
+                </thead>
+                <tbody>
+                  {scores.sections.map((section) => (
+                    <tr key={section.number}>
+                      <td>{section.number}. {section.title}</td>
+                      <td>{section.score} / {section.max_points}</td>
+                    </tr>
+                  ))}
+                  <tr className="scores-total">
+                    <td>Total</td>
+                    <td>{scores.total} / {scores.max_total}</td>
+                  </tr>
+                </tbody>
+              </table>
+            )}
             <div className="results-content">
               {/* Render the analysis with proper formatting */}
               <pre>{analysis}</pre>
@@ -0,0 +1,164 @@
+import dataclasses
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResultCache:
+    """
+    Persistent, content-addressed cache of PDF analysis results backed by SQLite.
+
+    Entries are keyed by the SHA-256 of the uploaded PDF bytes together with the
+    prompt, model name and generation config, so the same report scored with the
+    same settings is answered from disk instead of another Gemini call.
+    """
+
+    def __init__(self, db_path, max_entries=5000, max_bytes=256 * 1024 * 1024, max_age_seconds=30 * 24 * 3600):
+        """
+        Args:
+            db_path: Path to the SQLite database file (created if missing)
+            max_entries: Maximum number of cached results kept before eviction
+            max_bytes: Maximum total size of the stored results in bytes
+            max_age_seconds: Entries older than this are treated as misses and evicted
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed_at)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    @staticmethod
+    def make_key(pdf_digest, prompt_id, model_name, generation_config=None, provider="gemini"):
+        """
+        Builds the cache key for one analysis request.
+
+        Args:
+            pdf_digest: Hex SHA-256 digest of the PDF bytes
+            prompt_id: Prompt text, or a version hash identifying it (e.g. rubric.RUBRIC_VERSION)
+            model_name: Gemini model name
+            generation_config: GenerationConfig (or dict) used for the call
+            provider: LLM provider that produced the result (llm_provider.PROVIDER), so results
+                of the simulator never answer real requests
+
+        Returns:
+            Hex SHA-256 digest identifying the request
+        """
+        if generation_config is None:
+            config = None
+        elif dataclasses.is_dataclass(generation_config):
+            config = dataclasses.asdict(generation_config)
+        else:
+            config = generation_config
+        material = {
+            "pdf": pdf_digest,
+            "prompt": hashlib.sha256(prompt_id.encode("utf-8")).hexdigest(),
+            "model": model_name,
+            "config": config,
+        }
+        if provider != "gemini":
+            # Only other providers are added, so existing Gemini keys stay valid
+            material["provider"] = provider
+        material = json.dumps(
+            material,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Returns the cached result for a key, or None on a miss.
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, created_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age_seconds:
+                if row is not None:
+                    conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            conn.execute(
+                "UPDATE results SET accessed_at = ?, hit_count = hit_count + 1 WHERE key = ?",
+                (now, key),
+            )
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        """
+        Stores a result dict under a key and evicts old entries if the cache is over its limits.
+        """
+        value = json.dumps(result)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO results (key, value, size, created_at, accessed_at, hit_count)
+                VALUES (?, ?, ?, ?, ?, 0)
+                """,
+                (key, value, len(value.encode("utf-8")), now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        # Age first, then least-recently-used until both the entry and byte budgets fit
+        conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.max_age_seconds,))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT key, size FROM results ORDER BY accessed_at ASC").fetchall()
+        stale = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            stale.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM results WHERE key = ?", stale)
+
+    def clear(self):
+        """Removes every cached result."""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM results")
+
+    def stats(self):
+        """
+        Returns hit/miss counters for this process and the current size of the cache.
+        """
+        with self._connect() as conn:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": count,
+            "bytes": total,
+        }
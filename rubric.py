@@ -0,0 +1,279 @@
+import hashlib
+from dataclasses import dataclass
+from functools import lru_cache
+
+
+@dataclass(frozen=True)
+class Question:
+    text: str
+    label: str  # Short form used in the scoring guide
+    points: int = 1
+
+
+@dataclass(frozen=True)
+class Subsection:
+    title: str
+    questions: tuple
+    number: str = ""  # e.g. "1.1"; empty for unnumbered groups such as "Has the city conducted:"
+
+
+@dataclass(frozen=True)
+class Section:
+    number: int
+    title: str
+    subsections: tuple
+    note: str = ""  # Scoring clarification appended after the scoring guide
+
+    @property
+    def questions(self):
+        return tuple(q for sub in self.subsections for q in sub.questions)
+
+    @property
+    def max_points(self):
+        return sum(q.points for q in self.questions)
+
+
+def _q(text, label):
+    return Question(text=text, label=label)
+
+
+# The climate action plan rubric: 8 sections, 44 Yes/No questions worth one point each
+SECTIONS = (
+    Section(1, "Stakeholder & Community Engagement", (
+        Subsection("Identifying Priority Stakeholders", (
+            _q("Does the report identify groups most impacted by climate change (e.g., children, women, disabled, marginalized, frontline communities)?",
+               "Identify impacted groups?"),
+            _q("Are groups mentioned above excluded from previous engagement processes acknowledged?",
+               "Acknowledge excluded groups?"),
+        ), "1.1"),
+        Subsection("Engagement & Collaboration", (
+            _q("Does the report mention planned engagement with private sector, national/regional governments, or other stakeholders?",
+               "Mention planned engagement?"),
+            _q("Has the city identified influential actors supportive of its climate plans?",
+               "Identified influential actors?"),
+        ), "1.2"),
+        Subsection("Engagement Methods", (
+            _q("Have key stakeholders been integrated through long-term engagement throughout planning and implementation? If yes, which methods and groups?",
+               "Integrated key stakeholders?"),
+            _q("Has the broader public been engaged via surveys, consultations, summits, etc.?",
+               "Engaged broader public?"),
+        ), "1.3"),
+    )),
+    Section(2, "GHG Emissions Inventory", (
+        Subsection("", (
+            _q("Is the city measuring GHG emissions? If yes, what methodology is used?",
+               "Measuring GHG emissions?"),
+            _q("Does it use a specific tool like for inventory management and reporting?",
+               "Use a specific tool?"),
+            _q("Are the emissions inventory calculations publicly published?",
+               "Calculations publicly published?"),
+        )),
+    )),
+    Section(3, "Climate Change Risk Assessment (CCRA)", (
+        Subsection("Has the city conducted:", (
+            _q("A climate hazard assessment (probability, intensity, timescale)?",
+               "Conducted hazard assessment?"),
+            _q("A climate impact assessment (on people, infrastructure, services)?",
+               "Conducted impact assessment?"),
+            _q("A full CCRA? A Climate Change Risk Assessment (CCRA) seeks to understand the likelihood of current and future climate hazards and the potential impacts of these hazards on cities and their inhabitants.",
+               "Conducted full CCRA?"),
+        )),
+        Subsection("Has the CCRA:", (
+            _q("Been outsourced? If so, to whom?", "CCRA outsourced?"),
+            _q("Been updated or scheduled for renewal?", "CCRA updated/scheduled?"),
+            _q("Included interdependent risks and adaptive capacity analysis?",
+               "Included interdependent risks/adaptive capacity?"),
+            _q("Been made public?", "CCRA made public?"),
+        )),
+    )),
+    Section(4, "City Needs Assessment", (
+        Subsection("", (
+            _q("Has the city analyzed socioeconomic context, environmental quality, and alignment with SDGs (Sustainable Development Goals) through strategic appraisal?",
+               "Analyzed socioeconomic context, etc.?"),
+            _q("Has it assessed city-wide priorities that climate actions could address?",
+               "Assessed city-wide priorities?"),
+        )),
+    )),
+    Section(5, "Strategy Identification", (
+        Subsection("Mitigation Strategies", (
+            _q("Has the city defined a planning horizon for its climate scenarios?", "Defined planning horizon?"),
+            _q("Has a Business-As-Usual (BAU) forecast been included?", "Included BAU forecast?"),
+            _q("Are modeling tools used for scenario development?", "Modeling tools used?"),
+            _q("Are mitigation projections based on current plans available?", "Mitigation projections available?"),
+            _q("Is there an ambitious, long-term mitigation scenario?", "Ambitious long-term scenario?"),
+        ), "5.1"),
+        Subsection("Adaptation Strategies", (
+            _q("Has the city identified the root causes of climate risks?", "Identified root causes?"),
+            _q("Reactive adaptation fights the immediate negative consequences of climate-related hazards, protecting quality of life and the city’s systems during climate-related disasters and restoring them afterwards. Are any reactive adaptation plans addressed?",
+               "Reactive adaptation addressed?"),
+            _q("Preventative adaptation reduces the negative consequences of climate-related hazards, aiming to protect quality of life and city systems to avoid those hazard events becoming disasters. Are any preventive adaptation plans included?",
+               "Preventive adaptation included?"),
+            _q("Transformative adaptation tackles the root causes of climate risk, making climate-related hazards less likely or severe through fundamental changes to the city’s fabric and systems. Are any transformation adaptation plans included?",
+               "Transformative adaptation included?"),
+        ), "5.2"),
+    )),
+    Section(6, "Action Prioritization & Detailing", (
+        Subsection("", (
+            _q("Has a longlist of potential actions been developed from evidence base?", "Developed longlist?"),
+            _q("Has a shortlist of high-priority actions been defined using specific criteria/tools (e.g., ASAP, AMIA, cost-benefit)?",
+               "Defined shortlist?"),
+            _q("Does the plan assess the fit of actions within broader city agendas?", "Assessed fit?"),
+            _q("Is there evidence of inclusive stakeholder engagement in prioritization?",
+               "Evidence of inclusive engagement?"),
+            _q("Has the city adopted a flexible, iterative planning process?", "Adopted flexible process?"),
+        )),
+    )),
+    Section(7, "Equity & Inclusivity", (
+        Subsection("Stakeholder Inclusion", (
+            _q("Has the city included a diverse set of stakeholders in planning?", "Included diverse stakeholders?"),
+        ), "7.1"),
+        Subsection("Needs & Vulnerability Assessment", (
+            _q("Has the city identified vulnerable groups and reasons for vulnerability?",
+               "Identified vulnerable groups/reasons?"),
+            _q("Has a comprehensive needs assessment been done?", "Comprehensive needs assessment?"),
+        ), "7.2"),
+        Subsection("Distributed Impact Analysis", (
+            _q("Are equity impacts and challenges of actions analyzed?", "Equity impacts analyzed?"),
+            _q("Has the city used needs/stakeholder findings to guide climate actions?",
+               "Used findings to guide actions?"),
+        ), "7.3"),
+        Subsection("Monitoring Equity", (
+            _q("Is a Monitoring, Evaluation, and Reporting (MER) system used to track equity outcomes?",
+               "MER system used for equity?"),
+        ), "7.4"),
+    )),
+    Section(8, "Monitoring, Evaluation & Reporting (MER)", (
+        Subsection("Integration with City Systems", (
+            _q("Are existing climate plans and tracking mechanisms referenced?", "Existing plans referenced?"),
+            _q("Are inclusivity, public reporting, and data systems discussed?",
+               "Inclusivity, public reporting, data systems discussed?"),
+        ), "8.1"),
+        Subsection("Governance & Stakeholders", (
+            _q("Are key stakeholders identified in MER? If yes, which ones?", "Key stakeholders identified in MER?"),
+        ), "8.2"),
+        Subsection("Defining Indicators", (
+            _q("Are clear indicators set for each action (output, outcome, impact)?", "Clear indicators set?"),
+            _q("Are GHG, risk, and co-benefits included?", "GHG, risk, co-benefits included?"),
+        ), "8.3"),
+        Subsection("Data Collection", (
+            _q("Has the city identified data sources, ownership, collection methods, and reporting responsibilities?",
+               "Identified data sources, etc.?"),
+        ), "8.4"),
+    ), note=(
+        'Note on 8.1.2: The question "Are inclusivity, public reporting, and data systems discussed?" lists three '
+        'items but asks a single question grammatically. Based on the singular structure "Are...discussed?", '
+        "count it as a single point."
+    )),
+)
+
+SECTIONS_BY_NUMBER = {section.number: section for section in SECTIONS}
+MAX_SCORE = sum(section.max_points for section in SECTIONS)
+
+_INTRO = """Comprehensive Climate Action Plan Analysis
+
+You are tasked with analyzing a city’s Climate Action Plan (CAP) or related report. Based on the content, assess whether it addresses key areas across {focus}.
+
+Please respond using Yes/No and provide brief justifications or references where applicable. Where methods, tools, or stakeholder names are mentioned, list or summarize them clearly. Give me a comprehensive analysis along with scores. A “Yes” must be given a score of 1 and a “No” must be given a score of 0."""
+
+_FULL_FOCUS = "stakeholder engagement, emissions data, risk assessments, strategies, equity, and monitoring"
+
+_JSON_INSTRUCTIONS = """Return the analysis as JSON only. Include one entry in "sections" for each of {sections}, with one entry in "questions" per Yes/No question of that section, in the order listed above (answer "Yes" or "No" plus a brief justification or reference), the section "subtotal", the overall "total" out of {max_score} and a short overall "summary"."""
+
+
+def _select(sections):
+    if sections is None:
+        return SECTIONS
+    unknown = [n for n in sections if n not in SECTIONS_BY_NUMBER]
+    if unknown:
+        raise ValueError(f"Unknown rubric sections: {unknown}")
+    return tuple(SECTIONS_BY_NUMBER[n] for n in sorted(set(sections)))
+
+
+def _render_questions(section):
+    lines = [f"🔹 {section.number}. {section.title}", ""]
+    for sub in section.subsections:
+        if sub.title:
+            heading = f"{sub.number} {sub.title}:" if sub.number else sub.title
+            lines.extend([heading, ""])
+        for q in sub.questions:
+            lines.extend([q.text, ""])
+    return lines
+
+
+def _render_scoring(section):
+    lines = [f"{section.title}:", ""]
+    for sub in section.subsections:
+        items = ", ".join(f"{q.label} ({q.points})" for q in sub.questions)
+        if sub.number:
+            points = sum(q.points for q in sub.questions)
+            lines.extend([f"{sub.number}: {items} = {points} point{'s' if points != 1 else ''}", ""])
+        else:
+            lines.extend([items, ""])
+    lines.extend([f"Section {section.number} Total: {section.max_points} points", ""])
+    if section.note:
+        lines.extend([section.note, ""])
+    return lines
+
+
+@lru_cache(maxsize=None)
+def _render(numbers, structured):
+    selected = _select(numbers)
+    max_score = sum(s.max_points for s in selected)
+    focus = _FULL_FOCUS if numbers is None else ", ".join(s.title for s in selected)
+
+    lines = [_INTRO.format(focus=focus), ""]
+    for section in selected:
+        lines.extend(_render_questions(section))
+
+    lines.extend(["The scoring can be done in the way shown below.", "", "Counting the Yes/No Questions:", ""])
+    for section in selected:
+        lines.extend(_render_scoring(section))
+
+    lines.extend(["Calculating the Total Maximum Score:", ""])
+    if len(selected) > 1:
+        additions = " + ".join(str(s.max_points) for s in selected)
+        lines.extend([f"Adding the maximum points from each section: {additions} = {max_score} points", ""])
+    lines.extend([
+        "Based on the provided structure and counting each distinct Yes/No question as one point, "
+        f"the maximum score any given report can get is {max_score}.", "",
+    ])
+
+    if structured:
+        names = ", ".join(f"Section {s.number}" for s in selected)
+        lines.append(_JSON_INSTRUCTIONS.format(sections=names, max_score=max_score))
+    else:
+        lines.append("Consolidate the scores and give them as")
+        lines.extend(f"Section {s.number}: {s.title}: Score" for s in selected)
+    return "\n".join(lines) + "\n"
+
+
+def render_prompt(sections=None, structured=True):
+    """
+    Renders the analysis prompt for the whole rubric or a subset of sections.
+
+    Rendered prompts are memoized, so repeated calls return the same string.
+
+    Args:
+        sections: Iterable of section numbers to score, or None for all eight
+        structured: Ask for JSON matching scores.RESPONSE_SCHEMA (True) or for
+            the legacy consolidated "Section N: Title: Score" text (False)
+
+    Returns:
+        Prompt text
+    """
+    numbers = None if sections is None else tuple(sorted(set(sections)))
+    return _render(numbers, structured)
+
+
+def rubric_version(sections=None, structured=True):
+    """
+    Returns a short, stable hash of the rendered prompt, suitable for cache keys
+    and for recording which rubric produced a score.
+    """
+    return hashlib.sha256(render_prompt(sections, structured).encode("utf-8")).hexdigest()[:16]
+
+
+# Rendered once at import and shared by the backend and the batch scorer
+PROMPT = render_prompt()
+TEXT_PROMPT = render_prompt(structured=False)
+RUBRIC_VERSION = rubric_version()
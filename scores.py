@@ -0,0 +1,269 @@
+import json
+import re
+from dataclasses import dataclass, field, asdict
+
+import rubric
+
+SECTION_TITLES = {section.number: section.title for section in rubric.SECTIONS}
+SECTION_MAX_POINTS = {section.number: section.max_points for section in rubric.SECTIONS}
+SECTION_QUESTIONS = {section.number: len(section.questions) for section in rubric.SECTIONS}
+TOTAL_POINTS = rubric.MAX_SCORE
+
+# JSON schema requested from Gemini through GenerationConfig.response_schema
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sections": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "section": {"type": "integer"},
+                    "questions": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "question": {"type": "string"},
+                                "answer": {"type": "string", "enum": ["Yes", "No"]},
+                                "justification": {"type": "string"},
+                            },
+                            "required": ["question", "answer", "justification"],
+                        },
+                    },
+                    "subtotal": {"type": "integer"},
+                },
+                "required": ["section", "questions", "subtotal"],
+            },
+        },
+        "total": {"type": "integer"},
+        "summary": {"type": "string"},
+    },
+    "required": ["sections", "total"],
+}
+
+
+@dataclass(frozen=True)
+class QuestionScore:
+    question: str
+    answer: bool
+    justification: str = ""
+
+
+@dataclass(frozen=True)
+class SectionScore:
+    number: int
+    title: str
+    score: int
+    max_points: int
+    questions: tuple = ()
+
+
+@dataclass(frozen=True)
+class RubricScore:
+    """
+    Validated rubric result for one report.
+
+    ``source`` records whether the scores came from a structured JSON response
+    or were recovered from legacy free text.
+    """
+    sections: tuple
+    total: int
+    max_total: int = TOTAL_POINTS
+    summary: str = ""
+    source: str = "json"
+    warnings: tuple = field(default=())
+
+    def section(self, number):
+        for section in self.sections:
+            if section.number == number:
+                return section
+        return None
+
+    def missing_sections(self, sections=None):
+        """
+        Returns the requested sections (default: the whole rubric) that have no
+        score or, when answers are listed, fewer answers than questions.
+        """
+        missing = []
+        for number in (sections if sections is not None else SECTION_TITLES):
+            section = self.section(number)
+            if section is None or (section.questions and len(section.questions) < SECTION_QUESTIONS[number]):
+                missing.append(number)
+        return missing
+
+    def to_dict(self):
+        return asdict(self)
+
+    def as_row(self):
+        """
+        Returns the scores as flat numeric columns, e.g. for a clustering feature table.
+        """
+        row = {f"Section {number} Score": None for number in SECTION_TITLES}
+        for section in self.sections:
+            row[f"Section {section.number} Score"] = section.score
+        row["Total Score"] = self.total
+        return row
+
+
+def _clamp(value, upper):
+    return max(0, min(int(value), upper))
+
+
+def parse_json_response(text):
+    """
+    Validates a structured JSON response into a RubricScore.
+
+    Section subtotals are recomputed from the Yes/No answers when questions are
+    present, and all scores are clamped to the rubric's maximum points.
+
+    Raises:
+        ValueError: If the text is not valid JSON of the expected shape
+    """
+    try:
+        data = json.loads(text)
+    except (TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Response is not valid JSON: {e}")
+    if not isinstance(data, dict) or not isinstance(data.get("sections"), list):
+        raise ValueError("Response JSON has no 'sections' list")
+
+    warnings = []
+    sections = {}
+    for item in data["sections"]:
+        try:
+            number = int(item["section"])
+        except (KeyError, TypeError, ValueError):
+            warnings.append(f"Skipped section entry without a number: {item!r:.80}")
+            continue
+        if number not in SECTION_TITLES:
+            warnings.append(f"Skipped unknown section {number}")
+            continue
+
+        questions = tuple(
+            QuestionScore(
+                question=str(q.get("question", "")),
+                answer=str(q.get("answer", "")).strip().lower() == "yes",
+                justification=str(q.get("justification", "")),
+            )
+            for q in item.get("questions") or []
+            if isinstance(q, dict)
+        )
+        max_points = SECTION_MAX_POINTS[number]
+        if questions:
+            score = sum(q.answer for q in questions)
+            if "subtotal" in item and int(item["subtotal"]) != score:
+                warnings.append(f"Section {number}: subtotal {item['subtotal']} does not match {score} Yes answers")
+        else:
+            score = item.get("subtotal", 0)
+        if score > max_points:
+            warnings.append(f"Section {number}: score {score} exceeds maximum {max_points}")
+        if questions and len(questions) < SECTION_QUESTIONS[number]:
+            warnings.append(f"Section {number}: {len(questions)} of {SECTION_QUESTIONS[number]} questions answered")
+        sections[number] = SectionScore(number, SECTION_TITLES[number], _clamp(score, max_points), max_points, questions)
+
+    if not sections:
+        raise ValueError("Response JSON contains no valid sections")
+
+    ordered = tuple(sections[n] for n in sorted(sections))
+    missing = [n for n in SECTION_TITLES if n not in sections]
+    if missing:
+        warnings.append(f"Missing scores for sections {missing}")
+    return RubricScore(
+        sections=ordered,
+        total=sum(s.score for s in ordered),
+        summary=str(data.get("summary", "")),
+        source="json",
+        warnings=tuple(warnings),
+    )
+
+
+# Matches consolidated lines such as "Section 3: Climate Change Risk Assessment (CCRA): 5" or "**Section 3 ...:** 5/7"
+_SECTION_LINE = re.compile(
+    r"Section\s*(?P<number>[1-8])\b[^\n]*?[:\-–]\s*\**\s*(?P<score>\d+(?:\.\d+)?)\s*(?:/\s*\d+|points?|out of \d+)?\s*\**\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def parse_text_response(text):
+    """
+    Recovers section scores from a legacy free-text response.
+
+    The last "Section N: ...: score" line for each section wins, since the
+    consolidated summary is at the end of the answer.
+
+    Raises:
+        ValueError: If no section scores can be found
+    """
+    found = {}
+    for match in _SECTION_LINE.finditer(text or ""):
+        found[int(match.group("number"))] = float(match.group("score"))
+    if not found:
+        raise ValueError("No section scores found in response text")
+
+    ordered = tuple(
+        SectionScore(n, SECTION_TITLES[n], _clamp(found[n], SECTION_MAX_POINTS[n]), SECTION_MAX_POINTS[n])
+        for n in sorted(found)
+    )
+    missing = [n for n in SECTION_TITLES if n not in found]
+    warnings = (f"Missing scores for sections {missing}",) if missing else ()
+    return RubricScore(sections=ordered, total=sum(s.score for s in ordered), source="text", warnings=warnings)
+
+
+def parse_scores(text):
+    """
+    Parses a model response into a RubricScore, preferring structured JSON and
+    falling back to the legacy text format.
+
+    Returns:
+        RubricScore, or None if neither parser recognizes the response.
+    """
+    try:
+        return parse_json_response(text)
+    except ValueError:
+        pass
+    try:
+        return parse_text_response(text)
+    except ValueError:
+        return None
+
+
+def merge_scores(parts):
+    """
+    Combines RubricScores for separate section subsets (e.g. one call per
+    section) into a single result. A section present in several parts keeps its
+    last occurrence.
+    """
+    sections = {}
+    for part in parts:
+        for section in part.sections:
+            sections[section.number] = section
+    ordered = tuple(sections[n] for n in sorted(sections))
+    missing = [n for n in SECTION_TITLES if n not in sections]
+    # Each part lacks the other parts' sections; only the merged result's gaps are reported
+    warnings = tuple(w for part in parts for w in part.warnings if not w.startswith("Missing scores for sections"))
+    if missing:
+        warnings += (f"Missing scores for sections {missing}",)
+    sources = {part.source for part in parts}
+    return RubricScore(
+        sections=ordered,
+        total=sum(s.score for s in ordered),
+        summary="\n".join(part.summary for part in parts if part.summary),
+        source=sources.pop() if len(sources) == 1 else "mixed",
+        warnings=warnings,
+    )
+
+
+def format_report(score):
+    """
+    Renders a RubricScore as readable text for display.
+    """
+    lines = []
+    for section in score.sections:
+        lines.append(f"Section {section.number}: {section.title}: {section.score}/{section.max_points}")
+        for q in section.questions:
+            answer = "Yes" if q.answer else "No"
+            lines.append(f"  - {q.question} {answer}" + (f" ({q.justification})" if q.justification else ""))
+    lines.append(f"Total: {score.total}/{score.max_total}")
+    if score.summary:
+        lines.extend(["", score.summary])
+    return "\n".join(lines)
@@ -0,0 +1,21 @@
+"""
+Shared test setup: every test runs offline against llm_provider.SimulatedProvider,
+with caches and indexes in a temporary directory.
+"""
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "Demographic Data  Collection"))
+
+# Read at import time by llm_provider and backend, so they are set before any test module imports them
+_tmp = tempfile.mkdtemp(prefix="sustainability-tests-")
+os.environ["LLM_PROVIDER"] = "simulated"
+os.environ["SIMULATOR_CONFIG"] = json.dumps({"time_scale": 0.001})
+os.environ["RESULT_CACHE_PATH"] = os.path.join(_tmp, "analysis_results.sqlite3")
+os.environ["VECTOR_INDEX_DIR"] = os.path.join(_tmp, "vector_index")
+os.environ["CENSUS_CACHE_DIR"] = os.path.join(_tmp, "census")
+os.environ["SECTION_RETRIES"] = "1"
@@ -0,0 +1,168 @@
+import io
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import backend
+from llm_provider import get_provider
+
+
+@pytest.fixture
+def client():
+    return backend.app.test_client()
+
+
+@pytest.fixture
+def provider():
+    return get_provider("test-key")
+
+
+def pdf_file(name="report.pdf"):
+    return io.BytesIO(b"%PDF-1.4 " + os.urandom(64)), name
+
+
+def post(client, path, mode="full"):
+    return client.post(path, data={"api_key": "test-key", "mode": mode, "file": pdf_file()},
+                       content_type="multipart/form-data")
+
+
+def test_analyze_pdf_returns_and_caches_scores(client):
+    data = b"%PDF-1.4 " + os.urandom(64)
+    responses = [
+        client.post("/api/analyze-pdf", data={"api_key": "test-key", "file": (io.BytesIO(data), "a.pdf")},
+                    content_type="multipart/form-data")
+        for _ in range(2)
+    ]
+    assert [r.status_code for r in responses] == [200, 200]
+    first, second = (r.get_json() for r in responses)
+    assert len(first["scores"]["sections"]) == 8
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert second["scores"] == first["scores"]
+
+
+def test_job_api_runs_a_job_to_completion(client):
+    response = post(client, "/api/jobs")
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+
+    events = client.get(f"/api/jobs/{job_id}/events").get_data(as_text=True)
+    assert '"status": "succeeded"' in events
+    status = client.get(f"/api/jobs/{job_id}").get_json()
+    assert status["status"] == "succeeded"
+    assert {"upload", "processing", "generate"} <= set(status["stage_timings"])
+    result = client.get(f"/api/jobs/{job_id}/result").get_json()
+    assert len(result["scores"]["sections"]) == 8
+    assert client.get("/api/jobs/unknown").status_code == 404
+    assert client.get("/api/jobs/stats").get_json()["jobs_succeeded"] >= 1
+
+
+def test_failed_job_reports_its_error(client, provider, monkeypatch):
+    monkeypatch.setattr(provider, "processing_failure_rate", 1.0)
+    job_id = post(client, "/api/jobs").get_json()["job_id"]
+    client.get(f"/api/jobs/{job_id}/events").get_data()
+    response = client.get(f"/api/jobs/{job_id}/result")
+    assert response.status_code == 500
+    assert "State: FAILED" in response.get_json()["error"]
+
+
+def test_unparseable_response_is_an_error_and_not_cached(client, provider, monkeypatch):
+    monkeypatch.setattr(provider, "malformed_rate", 1.0)
+    entries = backend.result_cache.stats()["entries"]
+    response = post(client, "/api/analyze-pdf")
+    assert response.status_code == 500
+    assert "Could not parse" in response.get_json()["error"]
+    assert backend.result_cache.stats()["entries"] == entries
+
+
+def test_incomplete_rubric_is_an_error_and_not_cached(client, provider, monkeypatch):
+    one_section = '{"sections": [{"section": 1, "questions": [], "subtotal": 1}], "total": 1}'
+    monkeypatch.setattr(provider, "generate_content", lambda *args, **kwargs: SimpleNamespace(text=one_section))
+    entries = backend.result_cache.stats()["entries"]
+    response = post(client, "/api/analyze-pdf")
+    assert response.status_code == 500
+    assert "Incomplete scores" in response.get_json()["error"]
+    assert backend.result_cache.stats()["entries"] == entries
+
+
+@pytest.fixture
+def peer_model(tmp_path, monkeypatch):
+    from clusterModel import ClusterModel
+    model = ClusterModel(["Section 1 Score", "Total Score"], mean=[5.0, 20.0], scale=[2.0, 8.0],
+                         centroids=[[-1.0, -1.0], [1.0, 1.0]],
+                         members={"Urbana": 0, "Champaign": 0, "Naperville": 1})
+    loaded = backend.load_cluster_model(model.save(str(tmp_path / "cluster_model.npz")))
+    monkeypatch.setattr(backend, "cluster_model", loaded)
+    return loaded
+
+
+def test_peer_cluster_uses_the_stored_cluster_of_known_cities(peer_model):
+    peer = backend.peer_cluster("Urbana", None)
+
+    assert peer == {"city": "Urbana", "cluster": 0, "peers": ["Champaign"], "model_version": peer_model.version}
+
+
+def test_peer_cluster_assigns_new_cities_from_their_scores(peer_model):
+    scores = {"total": 30, "sections": [{"number": 1, "score": 8}, {"number": 2, "score": 3}]}
+
+    peer = backend.peer_cluster("Evanston", scores)
+
+    assert peer["cluster"] == 1
+    assert peer["peers"] == ["Naperville"]
+    assert backend.peer_cluster("Evanston", None) is None
+    assert backend.peer_cluster(None, scores) is None
+
+
+def test_missing_cluster_model_is_skipped(tmp_path):
+    assert backend.load_cluster_model(str(tmp_path / "missing.npz")) is None
+
+
+def test_only_failed_sections_are_retried(provider):
+    calls = []
+
+    def score_section(number):
+        calls.append(number)
+        if number in (2, 5) and calls.count(number) == 1:
+            return number, None, "429 Resource exhausted"
+        return backend.section_result(number, f"Section {number}: Title: 1")
+
+    parts, errors, attempts = backend.score_sections(score_section, time_scale=provider.time_scale)
+
+    assert errors == {}
+    assert sorted(parts) == list(range(1, 9))
+    assert sorted(calls) == sorted(list(range(1, 9)) + [2, 5])
+    assert {n for n, count in attempts.items() if count > 1} == {2, 5}
+
+
+def test_sections_that_keep_failing_are_reported(provider):
+    parts, errors, attempts = backend.score_sections(lambda number: (number, None, "bad"), [3],
+                                                     time_scale=provider.time_scale)
+
+    assert parts == {} and errors == {3: "bad"}
+    assert attempts[3] == int(os.environ["SECTION_RETRIES"]) + 1
+
+
+def test_sections_mode_merges_every_section(client):
+    response = post(client, "/api/analyze-pdf", mode="sections")
+
+    assert response.status_code == 200
+    assert [s["number"] for s in response.get_json()["scores"]["sections"]] == list(range(1, 9))
+
+
+def index_fake_text(digest):
+    chunks = ({"text": f"greenhouse gas emissions inventory and climate adaptation plan {i}",
+               "page": i, "end_page": i} for i in range(12))
+    backend.vector_index.add(digest, chunks)
+
+
+@pytest.mark.parametrize("malformed_rate, succeeds", [(0.0, True), (1.0, False)])
+def test_retrieval_mode_never_returns_partial_scores(provider, monkeypatch, malformed_rate, succeeds):
+    monkeypatch.setattr(provider, "malformed_rate", malformed_rate)
+    stream, name = pdf_file()
+    with backend.SpooledUpload(stream, name) as upload:
+        index_fake_text(upload.digest)
+        result = backend.run_analysis("test-key", upload, "retrieval")
+    if succeeds:
+        assert len(result["scores"]["sections"]) == 8
+    else:
+        assert result["error"].startswith("Scoring failed for sections")
@@ -0,0 +1,54 @@
+import csv
+import json
+
+import GeminiAPIReport
+
+
+def make_reports(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"City_{i}.pdf"
+        path.write_bytes(b"%PDF-1.4 report " + str(i).encode())
+        paths.append(str(path))
+    return paths
+
+
+def test_batch_writes_checkpoint_and_table_and_skips_scored_reports(tmp_path, monkeypatch):
+    paths = make_reports(tmp_path, 3)
+    options = dict(checkpoint_path=str(tmp_path / "checkpoint.jsonl"), output_path=str(tmp_path / "scores.csv"))
+    records = GeminiAPIReport.score_batch("test-key", paths, concurrency=2, **options)
+    assert [r["status"] for r in records] == ["ok"] * 3
+    with open(options["output_path"], newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 3 and all(row["Total Score"] for row in rows)
+
+    calls = []
+    monkeypatch.setattr(GeminiAPIReport, "score_pdf", lambda *args, **kwargs: calls.append(args))
+    GeminiAPIReport.score_batch("test-key", paths, **options)
+    assert calls == []
+
+
+def test_collect_pdfs_reads_directories_and_manifests(tmp_path):
+    paths = make_reports(tmp_path, 2)
+    (tmp_path / "notes.txt").write_text("not a report")
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("City_1.pdf\n")
+    assert [str(p) for p in GeminiAPIReport.collect_pdfs(tmp_path)] == sorted(paths)
+    assert [str(p) for p in GeminiAPIReport.collect_pdfs(manifest)] == [paths[1]]
+
+
+def test_unusable_answers_are_not_checkpointed_as_ok(tmp_path, monkeypatch):
+    paths = make_reports(tmp_path, 2)
+    answers = {paths[0]: "no scores here", paths[1]: "Section 1: Intro: 2"}
+    monkeypatch.setattr(GeminiAPIReport, "score_pdf", lambda pdf_path, *args, **kwargs: answers[pdf_path])
+    checkpoint = tmp_path / "checkpoint.jsonl"
+    GeminiAPIReport.score_batch("test-key", paths, checkpoint_path=str(checkpoint),
+                                output_path=str(tmp_path / "scores.csv"))
+    records = {r["file"]: r for r in map(json.loads, checkpoint.read_text().splitlines())}
+    assert records[paths[0]]["status"] == "error" and "could not be parsed" in records[paths[0]]["error"]
+    assert records[paths[1]]["status"] == "error" and "Incomplete scores" in records[paths[1]]["error"]
+
+    # A subset run only needs the requested sections
+    GeminiAPIReport.score_batch("test-key", paths[1:], checkpoint_path=str(tmp_path / "subset.jsonl"),
+                                output_path=str(tmp_path / "subset.csv"), sections=[1])
+    assert json.loads((tmp_path / "subset.jsonl").read_text())["status"] == "ok"
@@ -0,0 +1,227 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+import censusCache
+import getCensusData
+from censusCache import CensusCache
+from getCensusData import get_census_data
+
+CHICAGO = "1600000US1714000"
+EVANSTON = "1600000US1724582"
+MADISON = "1600000US5548000"
+COOK_COUNTY = "0500000US17031"
+CITIES = {"Madison, WI": MADISON, "Chicago, IL": CHICAGO, "Evanston, IL": EVANSTON}
+
+
+class StubCensusAPI(BaseHTTPRequestHandler):
+    """Census API stand-in: answers place:* and ucgid queries with fixed values and records every query."""
+
+    places = [CHICAGO, EVANSTON, "1600000US1738570", MADISON]
+    queries = []
+    failures = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        query = {name: values[0] for name, values in parse_qs(urlparse(self.path).query).items()}
+        with self.lock:
+            StubCensusAPI.queries.append(query)
+            fail = StubCensusAPI.failures > 0
+            StubCensusAPI.failures -= fail
+        if fail:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        get = query["get"]
+        columns = ["NAME", "S1901_C01_012E", "GEO_ID"] if get.startswith("group(") else get.split(",")
+        if "ucgid" in query:
+            geoids = query["ucgid"].split(",")
+        else:
+            state = query["in"].split(":")[1]
+            geoids = [g for g in self.places if g[9:11] == state]
+            columns = columns + ["state", "place"]
+
+        values = {"NAME": lambda g: f"Place {g[-5:]}", "GEO_ID": lambda g: g, "state": lambda g: g[9:11],
+                  "place": lambda g: g[11:], "S1901_C01_012E": lambda g: str(int(g[-5:]) * 2)}
+        rows = [columns] + [[values.get(c, lambda g: "-666666666")(g) for c in columns] for g in geoids]
+        body = json.dumps(rows).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def census_url():
+    StubCensusAPI.queries = []
+    StubCensusAPI.failures = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubCensusAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/data/2023/acs/acs5/subject"
+    server.shutdown()
+    server.server_close()
+
+
+def test_rows_follow_city_order_with_numeric_columns(census_url):
+    df = get_census_data(census_url, "S1901", cities=CITIES, use_cache=False)
+
+    assert list(df["City"]) == list(CITIES)
+    assert list(df["GEO_ID"]) == list(CITIES.values())
+    assert list(df["S1901_C01_012E"]) == [96000, 28000, 49164]
+    assert "state" not in df.columns and "place" not in df.columns
+
+
+def test_unavailable_responses_are_retried(census_url, monkeypatch):
+    monkeypatch.setattr(getCensusData.time, "sleep", lambda seconds: None)
+    StubCensusAPI.failures = 2
+
+    data = getCensusData.fetch_json(census_url, {"get": "group(S1901)", "ucgid": CHICAGO})
+
+    assert data[1][2] == CHICAGO
+    assert len(StubCensusAPI.queries) == 3
+
+
+def test_missing_cities_are_left_out(census_url):
+    cities = dict(CITIES, **{"Nowhere, IL": "1600000US1799999"})
+
+    df = get_census_data(census_url, "S1901", cities=cities, use_cache=False)
+
+    assert list(df["City"]) == list(CITIES)
+
+
+def test_places_are_batched_per_state_and_other_geographies_by_ucgid(monkeypatch):
+    monkeypatch.setattr(getCensusData, "UCGID_BATCH_SIZE", 2)
+    counties = ["0500000US17031", "0500000US17043", "0500000US55025"]
+
+    queries = getCensusData.build_requests([CHICAGO, MADISON, EVANSTON] + counties)
+
+    assert queries == [
+        {"for": "place:*", "in": "state:17"},
+        {"for": "place:*", "in": "state:55"},
+        {"ucgid": "0500000US17031,0500000US17043"},
+        {"ucgid": "0500000US55025"},
+    ]
+
+
+def test_one_request_per_state(census_url):
+    get_census_data(census_url, "S1901", cities=CITIES, use_cache=False)
+
+    assert sorted(q["in"] for q in StubCensusAPI.queries) == ["state:17", "state:55"]
+
+
+def test_batches_with_different_columns_are_merged_by_name(census_url):
+    # The state query adds state/place columns that the ucgid query does not return
+    cities = {"Chicago, IL": CHICAGO, "Cook County, IL": COOK_COUNTY}
+
+    df = get_census_data(census_url, "S1901", cities=cities, use_cache=False)
+
+    assert list(df["City"]) == list(cities)
+    assert list(df["GEO_ID"]) == [CHICAGO, COOK_COUNTY]
+    assert list(df["S1901_C01_012E"]) == [28000, 34062]
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = CensusCache(str(tmp_path / "census"))
+    monkeypatch.setattr(censusCache, "_default_cache", cache)
+    return cache
+
+
+def test_warm_runs_are_served_from_the_cache(census_url, cache):
+    cold = get_census_data(census_url, "S1901", cities=CITIES)
+    requests = len(StubCensusAPI.queries)
+
+    warm = get_census_data(census_url, "S1901", cities=CITIES)
+
+    assert len(StubCensusAPI.queries) == requests
+    pd.testing.assert_frame_equal(warm, cold)
+    get_census_data(census_url, "S1901", cities=CITIES, refresh=True)
+    assert len(StubCensusAPI.queries) == 2 * requests
+
+
+def test_incomplete_pulls_are_not_cached(census_url, cache, monkeypatch):
+    monkeypatch.setattr(getCensusData.time, "sleep", lambda seconds: None)
+    StubCensusAPI.failures = getCensusData.MAX_RETRIES + 1  # Every attempt of the first request fails
+
+    df = get_census_data(census_url, "S1901", cities=CITIES, max_workers=1)
+
+    assert list(df["City"]) == ["Chicago, IL", "Evanston, IL"]
+    assert cache.get(census_url, "S1901", list(CITIES.values())) is None
+
+
+def test_newer_vintage_invalidates_older_entries(cache):
+    df = pd.DataFrame({"City": ["Chicago, IL"], "S1901_C01_012E": [1.0]})
+    old_url = "https://api.census.gov/data/2022/acs/acs5/subject"
+    cache.put(old_url, "S1501", [CHICAGO], df)
+    cache.put(old_url, "S1901", [CHICAGO], df)
+
+    cache.put("https://api.census.gov/data/2023/acs/acs5/subject", "S1901", [CHICAGO], df)
+
+    assert cache.get(old_url, "S1901", [CHICAGO]) is None
+    pd.testing.assert_frame_equal(cache.get(old_url, "S1501", [CHICAGO]), df)
+    assert cache.get("https://api.census.gov/data/2023/acs/acs5/subject", "S1901", [CHICAGO]) is not None
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = CensusCache(str(tmp_path), ttl_seconds=-1)
+    cache.put("https://api.census.gov/data/2023/acs/acs5/subject", "S1901", [CHICAGO], pd.DataFrame({"a": [1]}))
+
+    assert cache.get("https://api.census.gov/data/2023/acs/acs5/subject", "S1901", [CHICAGO]) is None
+    assert not list(tmp_path.glob("*.parquet"))
+
+
+def test_only_requested_variables_are_fetched(census_url):
+    df = get_census_data(census_url, "S1901", cities=CITIES, use_cache=False,
+                         variables=["S1901_C01_012E", "S1901_C01_013E", "S1901_C01_012E"])
+
+    assert {q["get"] for q in StubCensusAPI.queries} == {"NAME,GEO_ID,S1901_C01_012E,S1901_C01_013E"}
+    assert list(df.columns) == ["City", "NAME", "GEO_ID", "S1901_C01_012E", "S1901_C01_013E"]
+    # The stub answers unknown variables with a Census "not available" code, which is read as missing
+    assert df["S1901_C01_013E"].isna().all()
+
+
+def test_too_many_variables_are_rejected(census_url):
+    variables = [f"S1901_C01_{i:03d}E" for i in range(1, getCensusData.MAX_VARIABLES)]
+
+    with pytest.raises(ValueError):
+        get_census_data(census_url, "S1901", cities=CITIES, use_cache=False, variables=variables)
+    assert not StubCensusAPI.queries
+
+
+def test_projections_are_cached_separately(census_url, cache):
+    get_census_data(census_url, "S1901", cities=CITIES, variables=["S1901_C01_012E"])
+
+    assert cache.get(census_url, "S1901", list(CITIES.values()), ["S1901_C01_012E"]) is not None
+    assert cache.get(census_url, "S1901", list(CITIES.values())) is None
+    assert cache.get(census_url, "S1901", list(CITIES.values()), ["S1901_C01_013E"]) is None
+
+
+def test_feature_table_joins_every_source_onto_the_city_list(census_url, cache, monkeypatch, tmp_path):
+    import buildFeatures
+    profile_url = census_url.replace("acs5/subject", "acs5/profile")
+    monkeypatch.setattr(buildFeatures, "FEATURE_SOURCES", [
+        (census_url, "S1901", {"S1901_C01_012E": "Median Income"}),
+        (profile_url, "DP03", {"DP03_0009PE": "Unemployment Rate"}),
+    ])
+    cities = dict(CITIES, **{"Nowhere, IL": "1600000US1799999"})
+
+    features = buildFeatures.build_feature_table(cities=cities)
+
+    assert list(features.columns) == ["City", "GEO_ID", "Median Income", "Unemployment Rate"]
+    assert list(features["City"]) == list(cities)
+    assert list(features["Median Income"].iloc[:3]) == [96000, 28000, 49164]
+    assert features["Median Income"].dtype == "float32"  # Nowhere has no value, so not int32
+    assert features["Unemployment Rate"].isna().all()
+
+    path = buildFeatures.write_feature_table(features, output_dir=str(tmp_path))
+    assert buildFeatures.latest_feature_table(str(tmp_path)) == path
+    pd.testing.assert_frame_equal(pd.read_feather(path), features)
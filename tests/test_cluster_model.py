@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import clusterModel
+from clusterModel import ClusterModel
+
+
+def make_model(**kwargs):
+    return ClusterModel(["a", "b"], mean=[10.0, 100.0], scale=[2.0, 20.0],
+                        centroids=[[1.0, 1.0], [-1.0, -1.0], [1.0, -1.0]], **kwargs)
+
+
+def test_cluster_ids_are_canonical():
+    model = make_model(members={"Springfield": 0, "Peoria": 1})
+    permuted = ClusterModel(["a", "b"], [10.0, 100.0], [2.0, 20.0], [[1.0, -1.0], [1.0, 1.0], [-1.0, -1.0]])
+
+    assert model.centroids.tolist() == [[-1.0, -1.0], [1.0, -1.0], [1.0, 1.0]]
+    assert permuted.version == model.version
+    # Members are renumbered along with the centroids
+    assert model.cluster_of("Springfield") == 2
+    assert model.cluster_of("Peoria") == 0
+    assert model.peers(2) == ["Springfield"]
+
+
+def test_assign_accepts_frames_dicts_and_arrays():
+    model = make_model()
+    rows = [{"a": 12.0, "b": 120.0}, {"a": 8.0, "b": 80.0}, {"a": 12.0, "b": 80.0}]
+
+    assert model.assign(rows[0]) == 2
+    assert list(model.assign(rows)) == [2, 0, 1]
+    assert list(model.assign(pd.DataFrame(rows)[["b", "a"]])) == [2, 0, 1]
+    assert list(model.assign(np.array([[12.0, 120.0], [8.0, 80.0]]))) == [2, 0]
+
+
+def test_missing_features_are_imputed_with_the_training_mean():
+    model = make_model()
+
+    # b is imputed as 100 (0 after scaling), so only a decides between the clusters
+    assert model.assign({"a": 8.0}) == 0
+    assert list(model.assign(pd.DataFrame({"a": [8.0]}))) == [0]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    model = make_model(rubric_version="v3", members={"Springfield": 0}, created_at=1.5)
+
+    loaded = ClusterModel.load(model.save(tmp_path / "model.npz"))
+
+    assert loaded.version == model.version
+    assert loaded.features == model.features
+    assert loaded.members == model.members
+    assert (loaded.rubric_version, loaded.created_at) == ("v3", 1.5)
+    rows = np.random.default_rng(0).normal([10, 100], [2, 20], size=(50, 2))
+    assert list(loaded.assign(rows)) == list(model.assign(rows))
+
+
+def test_unknown_format_is_rejected(tmp_path, monkeypatch):
+    path = make_model().save(tmp_path / "model.npz")
+    monkeypatch.setattr(clusterModel, "MODEL_FORMAT", 2)
+
+    with pytest.raises(ValueError):
+        ClusterModel.load(path)
@@ -0,0 +1,156 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from clustering import (cluster_views, fit_cluster_model, iter_feature_chunks, kmeans_1d, perform_clustering, select_k,
+                        stream_clustering, sweep_k)
+
+
+def feature_table(n=12, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"City": [f"City {i}" for i in range(n)], "a": rng.random(n), "b": rng.random(n)})
+
+
+def blobs(centres, per_blob=15, seed=0):
+    rng = np.random.default_rng(seed)
+    points = np.concatenate([rng.normal(centre, 0.1, size=(per_blob, 2)) for centre in centres])
+    return pd.DataFrame({"City": [f"City {i}" for i in range(len(points))], "a": points[:, 0], "b": points[:, 1]})
+
+
+def test_perform_clustering_imputes_missing_features():
+    df = feature_table()
+    df.loc[[3, 7], "a"] = np.nan
+
+    clustered = perform_clustering(df, n_clusters=3)
+
+    assert "Cluster" in clustered.columns
+    assert clustered["Cluster"].nunique() == 3
+
+
+def test_sweep_k_scores_every_feasible_k():
+    data = np.random.default_rng(0).random((6, 2))
+
+    diagnostics = sweep_k(data, k_range=range(1, 9))
+
+    assert list(diagnostics["k"]) == [2, 3, 4, 5]
+    assert list(diagnostics.columns) == ["k", "inertia", "silhouette", "davies_bouldin"]
+    assert diagnostics["inertia"].is_monotonic_decreasing
+
+
+def test_parallel_sweep_matches_serial_sweep():
+    data = blobs([(0, 0), (3, 0), (0, 3)]).iloc[:, 1:].to_numpy()
+
+    serial = sweep_k(data, k_range=range(2, 6), n_jobs=1)
+    parallel = sweep_k(data, k_range=range(2, 6), n_jobs=2)
+
+    pd.testing.assert_frame_equal(serial, parallel)
+
+
+def test_select_k_criteria():
+    diagnostics = pd.DataFrame({"k": [2, 3, 4, 5], "inertia": [100.0, 30.0, 25.0, 22.0],
+                                "silhouette": [0.5, 0.7, 0.6, 0.4], "davies_bouldin": [0.9, 0.8, 0.5, 0.7]})
+
+    assert select_k(diagnostics, "silhouette") == 3
+    assert select_k(diagnostics, "davies_bouldin") == 4
+    assert select_k(diagnostics, "elbow") == 3
+    with pytest.raises(ValueError):
+        select_k(diagnostics, "gap")
+
+
+def test_auto_k_finds_separated_groups_and_reuses_the_swept_fit():
+    df = blobs([(0, 0), (3, 0), (0, 3), (3, 3)])
+
+    clustered, diagnostics = perform_clustering(df, n_clusters="auto", k_range=range(2, 7),
+                                                return_diagnostics=True)
+    model = fit_cluster_model(df, n_clusters="auto", k_range=range(2, 7))
+
+    assert clustered["Cluster"].nunique() == 4
+    assert len(model.centroids) == 4
+    # The final fit uses the same seed and restarts as the sweep, so it has the inertia the sweep scored
+    scaled = (df[["a", "b"]].to_numpy() - model.mean) / model.scale
+    inertia = ((scaled - model.centroids[model.assign(df)]) ** 2).sum()
+    assert inertia == pytest.approx(diagnostics.set_index("k").loc[4, "inertia"])
+
+
+@pytest.mark.parametrize("suffix", [".feather", ".csv"])
+def test_iter_feature_chunks_reads_fixed_size_chunks(tmp_path, suffix):
+    df = feature_table(n=25)
+    path = tmp_path / f"features{suffix}"
+    df.to_feather(path) if suffix == ".feather" else df.to_csv(path, index=False)
+
+    chunks = list(iter_feature_chunks(path, chunk_size=10, columns=["City", "a"]))
+
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    combined = pd.concat(chunks, ignore_index=True)
+    assert list(combined.columns) == ["City", "a"]
+    assert np.allclose(combined["a"], df["a"])
+
+
+@pytest.mark.parametrize("suffix", [".feather", ".csv"])
+def test_stream_clustering_labels_every_row_with_the_model(tmp_path, suffix):
+    df = blobs([(0, 0), (3, 0), (0, 3)], per_blob=40)
+    df.loc[5, "a"] = np.nan
+    source = tmp_path / "features.feather"
+    df.to_feather(source)
+    output = tmp_path / f"labels{suffix}"
+
+    result = stream_clustering(source, output, n_clusters=3, chunk_size=25, batch_size=16, n_epochs=3)
+
+    labels = pd.read_feather(output) if suffix == ".feather" else pd.read_csv(output)
+    assert result["rows"] == len(df) == len(labels)
+    assert list(labels.columns) == ["City", "Cluster"]
+    assert list(labels["City"]) == list(df["City"])
+    # Labels are the model's canonical IDs, so the saved model reproduces them
+    assert list(labels["Cluster"]) == list(result["model"].assign(df))
+    assert labels["Cluster"].iloc[np.r_[0:40]].nunique() == 1
+    assert labels["Cluster"].nunique() == 3
+
+
+def brute_force_cost(values, n_clusters):
+    # Optimal 1-D clusters are contiguous runs of the sorted values, so trying every split is exhaustive
+    x = np.sort(values)
+    best = np.inf
+    for cuts in itertools.combinations(range(1, len(x)), n_clusters - 1):
+        runs = np.split(x, cuts)
+        best = min(best, sum(((run - run.mean()) ** 2).sum() for run in runs))
+    return best
+
+
+def clustering_cost(values, labels):
+    return sum(((values[labels == c] - values[labels == c].mean()) ** 2).sum() for c in np.unique(labels))
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_kmeans_1d_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 30, size=int(rng.integers(6, 12))).astype(float)  # Integers, so with ties
+    for n_clusters in range(1, 5):
+        labels, centroids = kmeans_1d(values, n_clusters)
+        assert clustering_cost(values, labels) == pytest.approx(brute_force_cost(values, n_clusters), abs=1e-9)
+        assert list(np.unique(labels)) == list(range(n_clusters))
+        assert np.all(np.diff(centroids) > 0)
+        assert np.allclose(centroids, [values[labels == c].mean() for c in range(n_clusters)])
+
+
+def test_kmeans_1d_rejects_too_many_clusters():
+    with pytest.raises(ValueError):
+        kmeans_1d([1.0, 2.0], 3)
+
+
+def test_cluster_views_orders_ids_by_centroid_and_skips_missing_rows():
+    df = blobs([(0, 0), (3, 3), (6, 6)], per_blob=5)
+    df.loc[2, "a"] = np.nan
+
+    labels, centroids = cluster_views(df, ["a", ["a", "b"]], n_clusters=3)
+
+    assert list(labels.columns) == ["a Cluster", "a + b Cluster"]
+    assert labels.loc[2, "a Cluster"] == -1 and labels.loc[2, "a + b Cluster"] == -1
+    expected = np.repeat([0, 1, 2], 5)
+    expected[2] = -1
+    for name in labels.columns:
+        assert list(labels[name]) == list(expected)
+    assert np.all(np.diff(centroids["a Cluster"]["a"]) > 0)
+    assert list(centroids["a + b Cluster"].columns) == ["a", "b"]
+    assert np.allclose(centroids["a + b Cluster"].loc[2], [6, 6], atol=0.2)
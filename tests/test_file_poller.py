@@ -0,0 +1,81 @@
+import threading
+import time
+import types
+
+import pytest
+
+from file_poller import FilePoller
+
+
+class FakeFiles:
+    """File client whose files finish processing at preset times; records every status call."""
+
+    def __init__(self):
+        self.ready_at = {}
+        self.get_calls = []
+        self.list_calls = 0
+        self.fail = False
+
+    def add(self, name, seconds):
+        self.ready_at[name] = time.monotonic() + seconds
+        return self._file(name)
+
+    def _file(self, name):
+        state = "ACTIVE" if time.monotonic() >= self.ready_at[name] else "PROCESSING"
+        return types.SimpleNamespace(name=name, state=types.SimpleNamespace(name=state))
+
+    def get_file(self, name):
+        self.get_calls.append(time.monotonic())
+        if self.fail:
+            raise ConnectionError("status check failed")
+        return self._file(name)
+
+    def list_files(self):
+        self.list_calls += 1
+        return [self._file(name) for name in self.ready_at]
+
+
+def test_finished_file_is_returned_without_status_calls():
+    files = FakeFiles()
+    remote = files.add("files/a", 0)
+    assert FilePoller(files).wait(remote) is remote
+    assert files.get_calls == [] and files.list_calls == 0
+
+
+def test_checks_back_off_up_to_the_maximum_interval():
+    files = FakeFiles()
+    poller = FilePoller(files, initial_delay=0.01, max_delay=0.04, factor=2.0)
+    remote = files.add("files/a", 0.25)
+    assert poller.wait(remote).state.name == "ACTIVE"
+    gaps = [b - a for a, b in zip(files.get_calls, files.get_calls[1:])]
+    assert 4 <= len(files.get_calls) < 20  # Far fewer than a tight loop, more than one check
+    assert gaps[0] < gaps[-1] <= 0.04 + 0.02
+    assert max(gaps) <= 0.04 + 0.02
+
+
+def test_many_pending_files_are_checked_with_one_listing():
+    files = FakeFiles()
+    poller = FilePoller(files, initial_delay=0.01, max_delay=0.02, batch_threshold=4)
+    remotes = [files.add(f"files/{i}", 0.1) for i in range(8)]
+    threads = [threading.Thread(target=poller.wait, args=(remote,)) for remote in remotes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert files.list_calls > 0
+    assert len(files.get_calls) < files.list_calls
+
+
+def test_repeated_check_failures_reach_the_waiter():
+    files = FakeFiles()
+    files.fail = True
+    poller = FilePoller(files, initial_delay=0.001, max_delay=0.002, max_errors=3)
+    with pytest.raises(ConnectionError):
+        poller.wait(files.add("files/a", 10))
+    assert len(files.get_calls) == 3
+
+
+def test_wait_times_out():
+    files = FakeFiles()
+    with pytest.raises(TimeoutError):
+        FilePoller(files, initial_delay=0.01).wait(files.add("files/a", 10), timeout=0.05)
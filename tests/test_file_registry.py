@@ -0,0 +1,104 @@
+import threading
+import time
+
+from file_registry import FileRegistry
+from llm_provider import SimulatedProvider
+
+
+def make_registry(tmp_path, **options):
+    provider = SimulatedProvider(upload_seconds=(0.5, 1.0), processing_seconds=(1.0, 2.0), time_scale=0.01)
+    path = tmp_path / "report.pdf"
+    path.write_bytes(b"%PDF-1.4 report")
+    return provider, FileRegistry(provider, **options), lambda: provider.upload_file(path)
+
+
+def test_concurrent_callers_share_one_upload(tmp_path):
+    provider, registry, upload = make_registry(tmp_path)
+    names = []
+
+    def use():
+        with registry.use("digest", upload) as remote:
+            names.append(remote.name)
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(names)) == 1
+    assert provider.calls["upload"] == 1
+    assert registry.stats() == {"files": 1, "in_use": 0, "uploads": 1, "reuses": 7}
+
+
+def test_reaper_deletes_idle_and_expired_files(tmp_path):
+    provider, registry, upload = make_registry(tmp_path, idle_seconds=60, ttl_seconds=3600)
+    registry.acquire("digest", upload)
+    assert registry.reap(now=time.time() + 7200) == 0  # Still in use
+    registry.release("digest")
+    assert registry.reap() == 0  # Recently used
+    assert registry.reap(now=time.time() + 61) == 1
+    assert provider.calls["delete"] == 1
+    assert registry.stats()["files"] == 0
+
+
+def test_stale_handle_is_replaced_and_invalidate_forgets_the_file(tmp_path):
+    provider, registry, upload = make_registry(tmp_path, ttl_seconds=0)
+    with registry.use("digest", upload):
+        pass
+    with registry.use("digest", upload):
+        pass
+    assert provider.calls["upload"] == 2
+
+    registry.invalidate("digest")
+    assert registry.stats()["files"] == 0
+
+
+def test_failed_processing_is_not_registered(tmp_path):
+    provider = SimulatedProvider(processing_failure_rate=1.0, time_scale=0.001)
+    path = tmp_path / "report.pdf"
+    path.write_bytes(b"%PDF-1.4")
+    registry = FileRegistry(provider)
+    with registry.use("digest", lambda: provider.upload_file(path)) as remote:
+        assert remote.state.name == "FAILED"
+    assert registry.stats()["files"] == 0
+    assert provider.calls["delete"] == 1
+
+
+def test_close_deletes_files_once_released(tmp_path):
+    provider, registry, upload = make_registry(tmp_path)
+    registry.acquire("digest", upload)
+    assert registry.close() == 0
+    registry.release("digest")
+    assert provider.calls["delete"] == 1
+
+
+def test_expired_handle_in_use_is_deleted_only_after_release(tmp_path):
+    provider, registry, upload = make_registry(tmp_path, ttl_seconds=3600)
+    old = registry.acquire("digest", upload)
+    registry._files[("", "digest")].created_at -= 7200  # Past the TTL while still in use
+
+    new = registry.acquire("digest", upload)
+    assert new.name != old.name
+    assert provider.calls["delete"] == 0
+    assert registry.reap(now=float("inf")) == 0
+
+    # Releasing the old handle deletes its file and leaves the new handle's use count alone
+    registry.release("digest", remote=old)
+    assert provider.calls["delete"] == 1
+    assert registry.stats()["in_use"] == 1
+    registry.release("digest", remote=new)
+    assert registry.stats() == {"files": 1, "in_use": 0, "uploads": 2, "reuses": 0}
+    assert registry.clear() == 1
+    assert provider.calls["delete"] == 2
+
+
+def test_concurrent_uploads_are_all_counted(tmp_path):
+    provider, registry, upload = make_registry(tmp_path)
+
+    threads = [threading.Thread(target=lambda i=i: registry.acquire(f"digest-{i}", upload)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert registry.stats()["uploads"] == provider.calls["upload"] == 16
@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobManager, QueueFullError
+
+
+def wait_finished(manager, job_id):
+    for _ in manager.events(job_id, timeout=5):
+        pass
+    return manager.get(job_id)
+
+
+def test_job_succeeds_with_stage_timings():
+    def worker(report_stage, value):
+        report_stage("upload")
+        report_stage("generate")
+        return {"result": value * 2}
+
+    manager = JobManager(worker, max_workers=1)
+    job = wait_finished(manager, manager.submit({"value": 21}))
+    assert job.status == SUCCEEDED
+    assert job.result == {"result": 42}
+    assert list(job.stage_timings) == ["upload", "generate"]
+    assert manager.stats()["jobs_succeeded"] == 1
+    manager.shutdown()
+
+
+def test_error_result_and_exception_fail_the_job():
+    def worker(report_stage, fail):
+        if fail == "raise":
+            raise RuntimeError("boom")
+        return {"error": "bad input"}
+
+    manager = JobManager(worker, max_workers=2)
+    returned = wait_finished(manager, manager.submit({"fail": "return"}))
+    raised = wait_finished(manager, manager.submit({"fail": "raise"}))
+    assert (returned.status, returned.error) == (FAILED, "bad input")
+    assert (raised.status, raised.error) == (FAILED, "boom")
+    assert manager.stats()["jobs_failed"] == 2
+    manager.shutdown()
+
+
+def test_queued_running_and_full_queue():
+    release = threading.Event()
+    started = threading.Event()
+
+    def worker(report_stage):
+        started.set()
+        release.wait(5)
+        return {"result": "done"}
+
+    manager = JobManager(worker, max_workers=1, max_queue=1)
+    first = manager.submit({})
+    assert started.wait(5)
+    second = manager.submit({})
+    assert manager.get(first).status == RUNNING
+    assert manager.get(second).status == QUEUED
+    with pytest.raises(QueueFullError):
+        manager.submit({})
+    assert manager.stats()["jobs_rejected"] == 1
+
+    release.set()
+    assert wait_finished(manager, second).status == SUCCEEDED
+    assert manager.get(first).status == SUCCEEDED
+    manager.shutdown()
+
+
+def test_complete_records_a_finished_job_and_old_jobs_are_pruned():
+    manager = JobManager(lambda report_stage: {"result": None}, max_finished=2)
+    ids = [manager.complete({}, {"result": i}) for i in range(3)]
+    assert manager.get(ids[0]) is None
+    assert manager.get(ids[2]).result == {"result": 2}
+    manager.shutdown()
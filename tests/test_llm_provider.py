@@ -0,0 +1,149 @@
+import statistics
+import threading
+import time
+from collections import OrderedDict
+
+import pytest
+from google.api_core import exceptions
+
+import backend
+import llm_provider
+import rubric
+from llm_provider import GeminiProvider, SimulatedProvider, _lognormal, get_provider
+from scores import parse_scores
+
+
+def uploaded(provider, tmp_path, data=b"%PDF-1.4 report"):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(data)
+    return provider.registry.poller.wait(provider.upload_file(path))
+
+
+def test_answers_depend_only_on_the_document(tmp_path):
+    prompt = rubric.render_prompt()
+    answers = []
+    for seed in (0, 1):
+        provider = SimulatedProvider(time_scale=0, seed=seed)
+        answers.append(provider.generate_content("model", [prompt, uploaded(provider, tmp_path)]).text)
+    other = SimulatedProvider(time_scale=0)
+    other_answer = other.generate_content("model", [prompt, uploaded(other, tmp_path, b"%PDF-1.4 other")]).text
+
+    assert answers[0] == answers[1] != other_answer
+    scores = parse_scores(answers[0])
+    assert scores is not None and scores.missing_sections() == []
+
+
+def test_section_prompts_are_answered_for_those_sections(tmp_path):
+    provider = SimulatedProvider(time_scale=0)
+
+    text = provider.generate_content("model", [rubric.render_prompt([2, 5]), "Relevant excerpts: ..."]).text
+
+    assert [s.number for s in parse_scores(text).sections] == [2, 5]
+
+
+@pytest.mark.parametrize("option, error", [
+    ("rate_limit_rate", exceptions.ResourceExhausted),
+    ("server_error_rate", exceptions.InternalServerError),
+    ("file_lost_rate", exceptions.NotFound),
+])
+def test_generation_failure_modes(tmp_path, option, error):
+    provider = SimulatedProvider(time_scale=0, **{option: 1.0})
+
+    with pytest.raises(error):
+        provider.generate_content("model", [rubric.render_prompt(), uploaded(provider, tmp_path)])
+    assert provider.calls["errors"] == 1
+
+
+def test_upload_and_processing_failures(tmp_path):
+    with pytest.raises(exceptions.ServiceUnavailable):
+        uploaded(SimulatedProvider(time_scale=0, upload_error_rate=1.0), tmp_path)
+    assert uploaded(SimulatedProvider(time_scale=0, processing_failure_rate=1.0), tmp_path).state.name == "FAILED"
+
+
+def test_malformed_responses_cannot_be_parsed(tmp_path):
+    provider = SimulatedProvider(time_scale=0, malformed_rate=1.0)
+
+    text = provider.generate_content("model", [rubric.render_prompt(), uploaded(provider, tmp_path)]).text
+
+    assert parse_scores(text) is None or parse_scores(text).missing_sections()
+
+
+def test_deleted_files_are_not_found(tmp_path):
+    provider = SimulatedProvider(time_scale=0)
+    remote = uploaded(provider, tmp_path)
+    provider.delete_file(remote.name)
+
+    with pytest.raises(exceptions.NotFound):
+        provider.generate_content("model", [rubric.render_prompt(), remote])
+
+
+def test_concurrent_generations_beyond_the_quota_are_rejected():
+    provider = SimulatedProvider(generate_seconds=(20, 20), time_scale=0.01, max_concurrent_generations=2)
+    outcomes = []
+
+    def generate():
+        try:
+            provider.generate_content("model", [rubric.render_prompt([1]), "excerpts"])
+            outcomes.append("ok")
+        except exceptions.ResourceExhausted:
+            outcomes.append("rejected")
+
+    threads = [threading.Thread(target=generate) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes) == ["ok", "ok", "rejected", "rejected", "rejected"]
+
+
+def test_latencies_follow_the_configured_percentiles():
+    import random
+    rng = random.Random(0)
+
+    samples = sorted(_lognormal(rng, 2.0, 10.0) for _ in range(20000))
+
+    assert statistics.median(samples) == pytest.approx(2.0, rel=0.05)
+    assert samples[int(0.99 * len(samples))] == pytest.approx(10.0, rel=0.1)
+
+
+def test_waits_are_scaled_with_the_simulator(tmp_path):
+    provider = SimulatedProvider(upload_seconds=(0.01, 0.01), processing_seconds=(40, 40), time_scale=0.001)
+
+    start = time.monotonic()
+    remote = uploaded(provider, tmp_path)
+    elapsed = time.monotonic() - start
+
+    # 40 simulated seconds of processing are noticed within a few simulated polling intervals
+    assert remote.state.name == "ACTIVE"
+    assert elapsed < 0.04 + 3 * llm_provider.MAX_DELAY * provider.time_scale
+    assert provider.registry.poller.max_delay == pytest.approx(llm_provider.MAX_DELAY * 0.001)
+    assert GeminiProvider("test-key").registry.poller.max_delay == llm_provider.MAX_DELAY
+
+
+def test_section_retry_backoff_is_scaled(monkeypatch):
+    delays = []
+    monkeypatch.setattr(backend.time, "sleep", delays.append)
+
+    backend.score_sections(lambda number: (number, None, "bad"), [1], time_scale=0.01)
+
+    assert delays == [pytest.approx(0.01)]
+
+
+def test_providers_are_kept_per_key_and_least_recently_used_are_closed(monkeypatch):
+    monkeypatch.setattr(llm_provider, "_providers", OrderedDict())
+    monkeypatch.setattr(llm_provider, "MAX_PROVIDERS", 2)
+
+    first = get_provider("key-1", kind="gemini")
+    registry = first.registry
+    assert get_provider("key-1", kind="gemini") is first
+    second = get_provider("key-2", kind="gemini")
+    assert get_provider("key-1", kind="gemini") is first  # key-2 is now the least recently used
+    get_provider("key-3", kind="gemini")
+
+    assert list(llm_provider._providers) == [("gemini", llm_provider.key_fingerprint(k)) for k in ("key-1", "key-3")]
+    assert second._registry is None and not registry._stop.is_set()
+    assert get_provider("key-2", kind="gemini") is not second
+    assert registry._stop.is_set()  # key-1 was evicted in turn
+    with pytest.raises(ValueError):
+        get_provider("key", kind="openai")
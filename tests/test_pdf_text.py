@@ -0,0 +1,89 @@
+import io
+import itertools
+
+import pytest
+
+import pdf_text
+from pdf_text import chunk_pdf, extract_pages, iter_chunks
+
+
+def make_pdf(page_texts):
+    """A minimal PDF with one line of extractable text per page."""
+    count = len(page_texts)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>",
+               b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+                   b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(count)), count),
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    for i, text in enumerate(page_texts):
+        stream = f"BT /F1 10 Tf 40 750 Td ({text}) Tj ET".encode("latin-1")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+                       b"/Resources << /Font << /F1 3 0 R >> >> >>" % (5 + 2 * i))
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    pdf, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(pdf)
+
+
+def page_words(page, n=7):
+    return [f"p{page}w{i}" for i in range(n)]
+
+
+@pytest.mark.parametrize("chunk_words, overlap", [(5, 0), (5, 2), (8, 3), (100, 10)])
+def test_chunks_cover_every_word_in_order_with_their_pages(chunk_words, overlap):
+    pages = [(number, " ".join(page_words(number))) for number in range(1, 6)]
+    words = [(word, number) for number, text in pages for word in text.split()]
+
+    chunks = list(iter_chunks(iter(pages), chunk_words, overlap))
+
+    # Dropping each later chunk's overlap leaves the original word sequence
+    rebuilt = chunks[0]["text"].split() + [w for c in chunks[1:] for w in c["text"].split()[overlap:]]
+    assert rebuilt == [word for word, _ in words]
+    position = 0
+    for chunk in chunks:
+        chunk_text = chunk["text"].split()
+        assert len(chunk_text) <= chunk_words
+        assert chunk["page"] == words[position][1]
+        assert chunk["end_page"] == words[position + len(chunk_text) - 1][1]
+        position += len(chunk_text) - overlap
+
+
+def test_chunks_are_produced_lazily():
+    endless = ((number, " ".join(page_words(number))) for number in itertools.count(1))
+
+    first = next(iter_chunks(endless, chunk_words=10, overlap=2))
+
+    assert (first["page"], first["end_page"]) == (1, 2)
+
+
+def test_overlap_must_be_smaller_than_the_chunk():
+    with pytest.raises(ValueError):
+        list(iter_chunks([(1, "a b c")], chunk_words=3, overlap=3))
+
+
+def test_pages_are_extracted_in_order(tmp_path, monkeypatch):
+    texts = [" ".join(page_words(number)) for number in range(1, 8)]
+    path = tmp_path / "report.pdf"
+    path.write_bytes(make_pdf(texts))
+    monkeypatch.setattr(pdf_text, "PARALLEL_MIN_PAGES", 2)
+
+    in_process = list(extract_pages(str(path), workers=1))
+    parallel = list(extract_pages(str(path), workers=2, pages_per_task=2))
+    from_stream = list(extract_pages(io.BytesIO(path.read_bytes()), workers=2))
+
+    assert [(n, text.split()) for n, text in in_process] == [(n, page_words(n)) for n in range(1, 8)]
+    assert parallel == in_process == from_stream
+
+
+def test_chunk_pdf_streams_chunks_with_page_provenance():
+    source = io.BytesIO(make_pdf([" ".join(page_words(number)) for number in range(1, 4)]))
+
+    chunks = list(chunk_pdf(source, chunk_words=10, overlap=4))
+
+    assert [(c["page"], c["end_page"]) for c in chunks] == [(1, 2), (1, 3), (2, 3)]
+    assert chunks[0]["text"].split() == page_words(1) + page_words(2)[:3]
@@ -0,0 +1,111 @@
+import pytest
+
+import placeRegistry
+from placeRegistry import AmbiguousPlaceError, Place, PlaceRegistry, from_census_file, normalize_name
+
+
+def make_registry():
+    return PlaceRegistry([
+        Place("1600000US1718823", "Decatur", "city", "IL", ("Macon County",)),
+        Place("1600000US1718836", "Decatur", "village", "IL", ("Adams County",)),
+        Place("1600000US1899999", "Decatur", "city", "IN", ("Adams County",)),
+        Place("1600000US1755041", "O'Fallon", "city", "IL", ("St. Clair County",)),
+        Place("1600000US1714000", "Chicago", "city", "IL", ("Cook County", "DuPage County")),
+        Place("1600000US1724582", "Evanston", "city", "IL", ("Cook County",)),
+    ])
+
+
+def test_normalize_name_ignores_case_punctuation_and_lsad():
+    assert normalize_name("Decatur city") == normalize_name("DECATUR") == "decatur"
+    assert normalize_name("O'Fallon") == normalize_name("O Fallon") == "o fallon"
+    assert normalize_name("Village") == "village"  # A one-word name is never stripped
+
+
+def test_names_shared_within_a_state_are_ambiguous():
+    registry = make_registry()
+
+    assert list(registry.ambiguous) == ["decatur"]
+    with pytest.raises(AmbiguousPlaceError) as error:
+        registry.lookup("Decatur", state="IL")
+    assert [p.geoid for p in error.value.places] == ["1600000US1718823", "1600000US1718836"]
+    assert isinstance(error.value, KeyError)
+    assert registry.lookup("Decatur", state="IN").geoid == "1600000US1899999"
+    assert registry.lookup("o fallon").geoid == "1600000US1755041"
+    with pytest.raises(KeyError):
+        registry.lookup("Atlantis")
+
+
+def test_duplicate_geoids_are_rejected():
+    place = make_registry().get("1600000US1714000")
+
+    with pytest.raises(ValueError):
+        PlaceRegistry([place, place])
+
+
+def test_filter_by_state_county_and_geoids():
+    registry = make_registry()
+
+    assert [p.name for p in registry.filter(state="17", county="cook")] == ["Chicago", "Evanston"]
+    assert [p.name for p in registry.filter(county="DuPage County")] == ["Chicago"]
+    assert len(registry.filter(state="IN")) == 1
+    ordered = registry.filter(geoids=["1600000US1724582", "1600000US0000000", "1600000US1714000"])
+    assert [p.name for p in ordered] == ["Evanston", "Chicago"]
+    assert not registry.filter(state="IL", county="Adams").ambiguous
+
+
+def test_labels_tell_shared_names_apart():
+    labels = make_registry().labels()
+
+    assert labels["1600000US1718823"] == "Decatur (Macon County)"
+    assert labels["1600000US1718836"] == "Decatur (Adams County)"
+    assert labels["1600000US1899999"] == "Decatur"
+    assert labels["1600000US1714000"] == "Chicago"
+    same_county = PlaceRegistry([Place("1600000US1700001", "Troy", "city", "IL", ()),
+                                 Place("1600000US1700002", "Troy", "village", "IL", ())])
+    assert same_county.labels() == {"1600000US1700001": "Troy (1600000US1700001)",
+                                    "1600000US1700002": "Troy (1600000US1700002)"}
+
+
+def test_csv_round_trip(tmp_path):
+    registry = make_registry()
+    path = tmp_path / "places.csv"
+
+    registry.to_csv(path)
+
+    assert placeRegistry.load_places(str(path)).places == registry.places
+
+
+def test_place_by_county_file_is_merged_per_place(tmp_path):
+    path = tmp_path / "national_place_by_county2020.txt"
+    path.write_text(
+        "STATE|STATEFP|COUNTYFP|COUNTYNAME|PLACEFP|PLACENS|PLACENAME|TYPE|CLASSFP|FUNCSTAT\n"
+        "IL|17|031|Cook County|14000|00428803|Chicago city|INCORPORATED PLACE|C1|A\n"
+        "IL|17|043|DuPage County|14000|00428803|Chicago city|INCORPORATED PLACE|C1|A\n"
+        "IL|17|115|Macon County|18823|02394495|Decatur city|INCORPORATED PLACE|C1|A\n"
+        "IN|18|001|Adams County|17182|02394491|Decatur city|INCORPORATED PLACE|C1|A\n",
+        encoding="utf-8")
+
+    registry = from_census_file(str(path), state="IL")
+
+    assert registry.places == [
+        Place("1600000US1714000", "Chicago", "city", "IL", ("Cook County", "DuPage County")),
+        Place("1600000US1718823", "Decatur", "city", "IL", ("Macon County",)),
+    ]
+
+
+def test_gazetteer_file_has_no_counties(tmp_path):
+    path = tmp_path / "2020_Gaz_place_national.txt"
+    path.write_text("USPS\tGEOID\tANSICODE\tNAME\tLSAD\n"
+                    "IL\t1714000\t00428803\tChicago city\t25\n"
+                    "IL\t1700685\t02398019\tAlgonquin village\t47\n", encoding="utf-8")
+
+    registry = from_census_file(str(path))
+
+    assert registry.lookup("Algonquin") == Place("1600000US1700685", "Algonquin", "village", "IL", ())
+
+
+def test_study_places_resolve_to_unique_labels():
+    study = placeRegistry.study_places()
+
+    assert len(study) == len(placeRegistry.read_geoids())
+    assert len(study.cities()) == len(study)
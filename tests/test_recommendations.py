@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from clusterModel import ClusterModel
+from recommendations import PeerIndex
+
+
+def clustered_table(n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    cluster = np.arange(n) % 3
+    table = pd.DataFrame({
+        "City": [f"City {i}" for i in range(n)],
+        "Cluster": cluster,
+        "Income": cluster * 10 + rng.normal(0, 1, n),
+        "Density": cluster * 10 + rng.normal(0, 1, n),
+    })
+    for section in (1, 2):
+        table[f"Section {section} Score"] = rng.integers(0, 6, n).astype(float)
+    table.loc[4, "Section 2 Score"] = np.nan
+    return table
+
+
+def brute_force_recommend(index, city, section, top_n):
+    table = index.to_frame()
+    scaled = np.nan_to_num((table[index.features].to_numpy() - index.mean) / index.scale, nan=0.0)
+    me = table.index[table["City"] == city][0]
+    column = f"Section {section} Score"
+    peers = table[(table["Cluster"] == table.loc[me, "Cluster"]) & (table.index != me) & table[column].notna()]
+    if not np.isnan(table.loc[me, column]):
+        peers = peers[peers[column] > table.loc[me, column]]
+    peers = peers.sort_values(column, ascending=False, kind="stable")[:top_n]
+    return [(peers.loc[i, "City"], peers.loc[i, column], float(np.linalg.norm(scaled[i] - scaled[me])))
+            for i in peers.index]
+
+
+def test_recommend_matches_a_scan_of_the_cluster():
+    index = PeerIndex(clustered_table())
+
+    for city in ["City 0", "City 4", "City 7"]:
+        for section in (1, 2):
+            expected = brute_force_recommend(index, city, section, top_n=3)
+            got = [(r["city"], r["score"], r["distance"]) for r in index.recommend(city, section, top_n=3)]
+            assert [(c, s) for c, s, _ in got] == [(c, s) for c, s, _ in expected]
+            assert np.allclose([d for _, _, d in got], [d for _, _, d in expected])
+
+
+def test_similarity_order_returns_nearest_better_peers():
+    index = PeerIndex(clustered_table())
+
+    peers = index.recommend("City 3", 1, top_n=3, order="similarity")
+
+    own = index.to_frame().set_index("City").loc["City 3", "Section 1 Score"]
+    assert all(peer["score"] > own for peer in peers)
+    assert [p["distance"] for p in peers] == sorted(p["distance"] for p in peers)
+    with pytest.raises(ValueError):
+        index.recommend("City 3", 1, order="alphabetical")
+
+
+def test_update_city_matches_a_rebuilt_index():
+    index = PeerIndex(clustered_table())
+    untouched = index._clusters[2]
+
+    index.update_city("City 0", scores={1: 5.0, 2: None})
+    index.update_city("City 1", features={"Income": 0.5}, cluster=0)
+    index.update_city("New City", scores={1: 4.0}, features={"Income": 20.0, "Density": 20.0}, cluster=2)
+
+    rebuilt = PeerIndex(index.to_frame(), features=index.features)
+    rebuilt.mean, rebuilt.scale = index.mean, index.scale
+    for cluster in rebuilt._clusters:
+        rebuilt._build(cluster)
+    assert index.cluster_of("City 1") == 0
+    assert index._clusters[2] is not untouched  # Cluster 2 gained a city, so it was rebuilt
+    for city in ["City 0", "City 1", "City 3", "New City"]:
+        for section in (1, 2):
+            assert index.recommend(city, section, top_n=4) == rebuilt.recommend(city, section, top_n=4)
+        assert index.nearest_peers(city, n=3) == rebuilt.nearest_peers(city, n=3)
+
+
+def test_score_updates_rebuild_only_the_city_cluster():
+    index = PeerIndex(clustered_table())
+    before = dict(index._clusters)
+
+    index.update_city("City 0", scores={1: 0.0})
+
+    assert index._clusters[0] is not before[0]
+    assert index._clusters[1] is before[1] and index._clusters[2] is before[2]
+
+
+def test_feature_updates_are_reassigned_through_the_model():
+    table = clustered_table()
+    model = ClusterModel(["Income", "Density"], [10.0, 10.0], [8.0, 8.0],
+                         centroids=[[-1.25, -1.25], [0.0, 0.0], [1.25, 1.25]])
+    index = PeerIndex(table, model=model)
+
+    index.update_city("City 0", features={"Income": 20.0, "Density": 20.0})
+
+    assert index.cluster_of("City 0") == 2
+    assert "City 0" in index.to_frame().query("Cluster == 2")["City"].tolist()
+    assert "City 0" not in [city for city, _ in index.nearest_peers("City 3", n=20)]
+
+
+def test_unknown_cities():
+    index = PeerIndex(clustered_table())
+
+    with pytest.raises(KeyError):
+        index.recommend("Atlantis", 1)
+    with pytest.raises(ValueError):
+        index.update_city("Atlantis", scores={1: 3.0})
@@ -0,0 +1,75 @@
+import csv
+
+import rescore
+
+
+def read_row(path, city):
+    with open(path, newline="", encoding="utf-8") as f:
+        return next(row for row in csv.DictReader(f) if row["City"] == city)
+
+
+def test_unchanged_reports_are_not_rescored(tmp_path):
+    (tmp_path / "Aurora.pdf").write_bytes(b"%PDF-1.4 aurora")
+    pdfs = [str(tmp_path / "Aurora.pdf")]
+    options = dict(table_path=str(tmp_path / "scores.csv"), manifest_path=str(tmp_path / "manifest.json"),
+                   cluster_model_path=None)
+    first = rescore.rescore("test-key", pdfs, **options)
+    second = rescore.rescore("test-key", pdfs, **options)
+    assert (first["scored"], first["updated"]) == (1, ["Aurora"])
+    assert (second["scored"], second["reused"], second["updated"]) == (0, 1, [])
+
+
+def test_partial_run_keeps_the_other_sections(tmp_path):
+    pdf = tmp_path / "Aurora.pdf"
+    pdf.write_bytes(b"%PDF-1.4 aurora")
+    table = str(tmp_path / "scores.csv")
+    options = dict(table_path=table, manifest_path=str(tmp_path / "manifest.json"), cluster_model_path=None)
+    rescore.rescore("test-key", [str(pdf)], **options)
+    before = read_row(table, "Aurora")
+
+    pdf.write_bytes(b"%PDF-1.4 aurora, revised")
+    rescore.rescore("test-key", [str(pdf)], sections=[3], **options)
+    after = read_row(table, "Aurora")
+    for number in (1, 2, 4, 5, 6, 7, 8):
+        assert after[f"Section {number} Score"] == before[f"Section {number} Score"]
+    assert after["Section 3 Score"] != ""
+    assert int(after["Total Score"]) == sum(int(after[f"Section {n} Score"]) for n in range(1, 9))
+
+
+def test_merged_scores_leaves_total_alone_while_sections_are_unknown():
+    row = {"City": "Aurora", "Total Score": "9"}
+    values = rescore.merged_scores(row, {"Section 3 Score": 4, "Section 4 Score": None, "Total Score": 4})
+    assert values == {"Section 3 Score": "4"}
+
+
+def test_failed_reports_are_retried_on_the_next_run(tmp_path, monkeypatch):
+    import GeminiAPIReport
+    pdf = tmp_path / "Aurora.pdf"
+    pdf.write_bytes(b"%PDF-1.4 aurora")
+    options = dict(table_path=str(tmp_path / "scores.csv"), manifest_path=str(tmp_path / "manifest.json"),
+                   cluster_model_path=None)
+    score_pdf = GeminiAPIReport.score_pdf
+    monkeypatch.setattr(GeminiAPIReport, "score_pdf", lambda *args, **kwargs: "Section 1: Title: 2")
+
+    failed = rescore.rescore("test-key", [str(pdf)], **options)
+    monkeypatch.setattr(GeminiAPIReport, "score_pdf", score_pdf)
+    retried = rescore.rescore("test-key", [str(pdf)], **options)
+
+    assert (failed["failed"], failed["updated"]) == (1, [])
+    assert (retried["scored"], retried["updated"]) == (1, ["Aurora"])
+
+
+def test_changed_cities_are_reassigned_to_clusters(tmp_path):
+    from clusterModel import ClusterModel
+    model_path = str(tmp_path / "cluster_model.npz")
+    ClusterModel(["Total Score"], mean=[22.0], scale=[10.0], centroids=[[-5.0], [5.0]]).save(model_path)
+    (tmp_path / "Aurora.pdf").write_bytes(b"%PDF-1.4 aurora")
+    table = str(tmp_path / "scores.csv")
+
+    summary = rescore.rescore("test-key", [str(tmp_path / "Aurora.pdf")], table_path=table,
+                              manifest_path=str(tmp_path / "manifest.json"), cluster_model_path=model_path)
+
+    row = read_row(table, "Aurora")
+    expected = 0 if int(row["Total Score"]) < 22 else 1
+    assert row["Cluster"] == str(expected)
+    assert summary["cluster_changes"] == {"Aurora": (None, expected)}
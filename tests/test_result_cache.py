@@ -0,0 +1,47 @@
+import time
+
+from result_cache import ResultCache
+
+
+def test_roundtrip_and_hit_counters(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.db"))
+    key = ResultCache.make_key("digest", "prompt", "model")
+    assert cache.get(key) is None
+    cache.put(key, {"result": "text"})
+    assert cache.get(key) == {"result": "text"}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.db"), max_entries=2)
+    cache.put("a", {"result": "a"})
+    time.sleep(0.01)
+    cache.put("b", {"result": "b"})
+    time.sleep(0.01)
+    assert cache.get("a") is not None  # Now more recently used than "b"
+    time.sleep(0.01)
+    cache.put("c", {"result": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_byte_budget_and_age_limit(tmp_path):
+    small = ResultCache(str(tmp_path / "small.db"), max_bytes=100)
+    small.put("a", {"result": "x" * 60})
+    time.sleep(0.01)
+    small.put("b", {"result": "y" * 60})
+    assert small.get("a") is None and small.get("b") is not None
+
+    expiring = ResultCache(str(tmp_path / "old.db"), max_age_seconds=0)
+    expiring.put("a", {"result": "a"})
+    time.sleep(0.01)
+    expiring.put("b", {"result": "b"})
+    assert expiring.get("a") is None
+
+
+def test_key_depends_on_inputs_and_provider():
+    key = ResultCache.make_key("digest", "prompt", "model", {"temperature": 0})
+    assert key == ResultCache.make_key("digest", "prompt", "model", {"temperature": 0}, provider="gemini")
+    assert key != ResultCache.make_key("digest", "prompt", "model", {"temperature": 1})
+    assert key != ResultCache.make_key("digest", "prompt", "model", {"temperature": 0}, provider="simulated")
@@ -0,0 +1,87 @@
+import json
+
+import rubric
+from scores import SECTION_TITLES, format_report, merge_scores, parse_scores
+
+
+def json_answer(numbers, answered=None, answer="Yes"):
+    """A structured answer for the given sections; ``answered`` limits the questions answered per section."""
+    sections = []
+    for number in numbers:
+        questions = rubric.SECTIONS_BY_NUMBER[number].questions[:answered]
+        sections.append({
+            "section": number,
+            "questions": [{"question": q.text, "answer": answer, "justification": "Page 3."} for q in questions],
+            "subtotal": len(questions) if answer == "Yes" else 0,
+        })
+    return json.dumps({"sections": sections, "total": 0, "summary": "Summary."})
+
+
+def section_text(*numbers, score=2):
+    return "\n".join(f"Section {n}: {SECTION_TITLES[n]}: {score}" for n in numbers)
+
+
+def test_complete_json_answer():
+    scores = parse_scores(json_answer(SECTION_TITLES))
+    assert scores.source == "json"
+    assert scores.total == rubric.MAX_SCORE
+    assert scores.warnings == ()
+    assert scores.missing_sections() == []
+    assert "Summary." in format_report(scores)
+
+
+def test_json_answer_missing_sections_and_questions_is_flagged():
+    scores = parse_scores(json_answer([1]))
+    assert scores.warnings == (f"Missing scores for sections {list(range(2, 9))}",)
+    assert scores.missing_sections() == list(range(2, 9))
+    assert scores.missing_sections([1]) == []
+
+    partial = parse_scores(json_answer(SECTION_TITLES, answered=1))
+    assert any("questions answered" in w for w in partial.warnings)
+    assert partial.missing_sections() == [n for n in SECTION_TITLES if len(rubric.SECTIONS_BY_NUMBER[n].questions) > 1]
+
+
+def test_json_subtotal_is_recomputed_and_clamped():
+    data = json.loads(json_answer([2]))
+    data["sections"][0]["subtotal"] = 99
+    scores = parse_scores(json.dumps(data))
+    assert scores.section(2).score == len(rubric.SECTIONS_BY_NUMBER[2].questions)
+    assert any("does not match" in w for w in scores.warnings)
+
+
+def test_text_answer_uses_the_last_line_per_section():
+    text = "Section 1: Intro: 9\n" + "\n".join(f"Section {n}: {SECTION_TITLES[n]}: 1" for n in SECTION_TITLES)
+    scores = parse_scores(text)
+    assert scores.source == "text"
+    assert [s.score for s in scores.sections] == [1] * len(SECTION_TITLES)
+    assert scores.missing_sections() == []
+
+
+def test_unparseable_text_gives_none():
+    assert parse_scores("no scores here") is None
+    assert parse_scores('{"sections": [') is None
+
+
+def test_merge_of_all_sections_has_no_warnings():
+    merged = merge_scores([parse_scores(section_text(n, score=1)) for n in SECTION_TITLES])
+
+    assert [s.number for s in merged.sections] == list(SECTION_TITLES)
+    assert merged.total == len(SECTION_TITLES)
+    # Each part only answers its own section, so the parts' missing-section warnings are dropped
+    assert merged.warnings == ()
+    assert merged.missing_sections() == []
+
+
+def test_merge_reports_missing_sections_and_partial_total():
+    merged = merge_scores([parse_scores(section_text(1, 2)), parse_scores(section_text(4))])
+
+    assert [s.number for s in merged.sections] == [1, 2, 4]
+    assert merged.total == 6
+    assert merged.warnings[-1] == f"Missing scores for sections {[3] + list(range(5, len(SECTION_TITLES) + 1))}"
+    assert merged.as_row()["Section 3 Score"] is None
+
+
+def test_later_part_wins_for_a_repeated_section():
+    merged = merge_scores([parse_scores(section_text(1, score=1)), parse_scores(section_text(1, score=2))])
+
+    assert merged.section(1).score == 2
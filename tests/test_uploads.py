@@ -0,0 +1,44 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from uploads import SpooledUpload
+
+
+def test_small_upload_stays_in_memory():
+    data = b"%PDF-1.4 small"
+    with SpooledUpload(io.BytesIO(data), "small.pdf") as upload:
+        assert not upload.spilled
+        assert upload.digest == hashlib.sha256(data).hexdigest()
+        assert upload.file().read() == data
+    assert upload._buffer.closed
+
+
+def test_large_upload_spills_and_the_file_is_deleted_on_close(tmp_path):
+    data = os.urandom(5000)
+    with SpooledUpload(io.BytesIO(data), "large.pdf", max_memory=1024, spill_dir=str(tmp_path),
+                       chunk_size=512) as upload:
+        assert upload.spilled
+        path = upload.source()
+        with open(path, "rb") as f:
+            assert f.read() == data
+        assert upload.size == len(data)
+    assert not os.path.exists(path)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_read_leaves_no_spill_file(tmp_path):
+    class Broken(io.RawIOBase):
+        reads = 0
+
+        def read(self, size=-1):
+            self.reads += 1
+            if self.reads > 3:
+                raise OSError("connection reset")
+            return b"x" * 600
+
+    with pytest.raises(OSError):
+        SpooledUpload(Broken(), "broken.pdf", max_memory=1000, spill_dir=str(tmp_path), chunk_size=600)
+    assert list(tmp_path.iterdir()) == []
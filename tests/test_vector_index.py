@@ -0,0 +1,112 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import vector_index
+from vector_index import HashingEmbedder, VectorIndex, render_context, retrieve_sections
+
+
+def chunks(texts):
+    return [{"text": text, "page": i + 1, "end_page": i + 1} for i, text in enumerate(texts)]
+
+
+REPORT = chunks([
+    "The city will cut greenhouse gas emissions 50 percent by 2030 from the 2005 inventory.",
+    "Parks and recreation programs for summer youth camps.",
+    "Flood risk and extreme heat adaptation: resilience hubs and cooling centers.",
+    "Transit ridership, bike lanes and electric vehicle charging stations.",
+])
+
+
+@pytest.fixture
+def index(tmp_path):
+    return VectorIndex(str(tmp_path / "index"), batch_size=3)
+
+
+def test_hashing_embedder_is_normalized_and_deterministic():
+    embedder = HashingEmbedder(dim=256)
+
+    vectors = embedder.embed(["emissions inventory", "emissions inventory", ""])
+
+    assert np.allclose(np.linalg.norm(vectors[:2], axis=1), 1.0)
+    assert np.array_equal(vectors[0], vectors[1])
+    assert not vectors[2].any()
+
+
+def test_search_ranks_matching_chunks_first(index):
+    assert index.add("doc", iter(REPORT)) == 4
+    assert index.has("doc")
+
+    results = index.search("doc", ["greenhouse gas emissions inventory", "heat and flood adaptation"], k=2)
+
+    assert [match["page"] for match in results[0]][0] == 1
+    assert [match["page"] for match in results[1]][0] == 3
+    assert results[0][0]["score"] >= results[0][1]["score"]
+    assert results[0][0]["text"] == REPORT[0]["text"]
+
+
+def test_add_replaces_an_existing_entry(index):
+    index.add("doc", REPORT)
+    index.add("doc", REPORT[:1])
+
+    assert [match["page"] for match in index.search("doc", ["parks"], k=5)[0]] == [1]
+    assert index.add("empty", []) == 0
+    assert index.search("empty", ["parks"]) == [[]]
+
+
+def test_other_embedder_is_not_reused(index):
+    index.add("doc", REPORT)
+
+    assert not VectorIndex(index.directory, embedder=HashingEmbedder(dim=64)).has("doc")
+
+
+def test_retrieved_sections_are_in_page_order(index):
+    index.add("doc", REPORT)
+
+    retrieved = retrieve_sections(index, "doc", k=3, sections=[1, 2])
+
+    assert sorted(retrieved) == [1, 2]
+    for matches in retrieved.values():
+        assert [m["page"] for m in matches] == sorted(m["page"] for m in matches)
+    assert render_context(retrieved[1]).startswith("Relevant excerpts from the report:\n\n[page ")
+
+
+def test_concurrent_add_pdf_extracts_a_document_once(index, monkeypatch):
+    extracted = []
+
+    def chunk_pdf(source, chunk_words, overlap):
+        extracted.append(source)
+        time.sleep(0.05)
+        return iter(REPORT)
+
+    monkeypatch.setattr(vector_index, "chunk_pdf", chunk_pdf)
+    threads = [threading.Thread(target=index.add_pdf, args=("doc", "report.pdf")) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert extracted == ["report.pdf"]
+    assert index.add_pdf("doc", "report.pdf") == 4
+
+
+def test_documents_are_indexed_independently(index, monkeypatch):
+    # Indexing "slow" waits until "fast" has been indexed, which deadlocks if one lock covers the whole index
+    fast_done = threading.Event()
+
+    def chunk_pdf(source, chunk_words, overlap):
+        if source == "slow.pdf":
+            assert fast_done.wait(5)
+        return iter(REPORT)
+
+    monkeypatch.setattr(vector_index, "chunk_pdf", chunk_pdf)
+    slow = threading.Thread(target=index.add_pdf, args=("slow", "slow.pdf"))
+    slow.start()
+    time.sleep(0.05)
+    index.add_pdf("fast", "fast.pdf")
+    fast_done.set()
+    slow.join()
+
+    assert index.has("slow") and index.has("fast")
@@ -0,0 +1,72 @@
+import hashlib
+import io
+import tempfile
+
+
+class SpooledUpload:
+    """
+    An uploaded file copied out of the request stream in one pass while it is hashed.
+
+    Uploads up to ``max_memory`` bytes stay in memory; larger ones spill to a
+    named temporary file that is deleted when the upload is closed. Use it as a
+    context manager (or call close) so the spill file never outlives the
+    analysis.
+    """
+
+    def __init__(self, stream, filename, max_memory=8 * 1024 * 1024, spill_dir=None, chunk_size=1024 * 1024):
+        """
+        Args:
+            stream: Readable binary stream, e.g. the request's FileStorage.stream
+            filename: Original file name, kept for display
+            max_memory: Size in bytes above which the upload is moved to disk
+            spill_dir: Directory of the spill file (default: the system temp directory)
+            chunk_size: Bytes copied per read
+        """
+        self.filename = filename
+        self.size = 0
+        self._buffer = io.BytesIO()
+        self._spill = None
+        digest = hashlib.sha256()
+        try:
+            for chunk in iter(lambda: stream.read(chunk_size), b""):
+                digest.update(chunk)
+                self.size += len(chunk)
+                if self._spill is None and self.size > max_memory:
+                    self._spill = tempfile.NamedTemporaryFile(dir=spill_dir, suffix=".pdf")
+                    self._spill.write(self._buffer.getbuffer())
+                    self._buffer = self._spill.file
+                self._buffer.write(chunk)
+            self._buffer.flush()
+        except BaseException:
+            self.close()
+            raise
+        self.digest = digest.hexdigest()
+
+    @property
+    def spilled(self):
+        """True if the upload was moved to a temporary file."""
+        return self._spill is not None
+
+    def file(self):
+        """Returns the binary file object (an io.IOBase) rewound to the start."""
+        self._buffer.seek(0)
+        return self._buffer
+
+    def source(self):
+        """
+        Returns a path for spilled uploads (so other processes can open it) or
+        the rewound in-memory buffer otherwise.
+        """
+        return self._spill.name if self._spill is not None else self.file()
+
+    def close(self):
+        """Releases the buffer and deletes the spill file, if any."""
+        if self._spill is not None:
+            self._spill.close()
+        self._buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
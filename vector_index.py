@@ -0,0 +1,236 @@
+"""
+Local, disk-backed vector index of report chunks for retrieval-grounded scoring.
+
+A report's text is extracted and split into overlapping chunks with page
+provenance by pdf_text, and embedded once; each rubric section is then scored against only
+the chunks retrieved for that section's questions instead of the whole PDF.
+
+The embedder is pluggable: anything with a ``name`` and an
+``embed(texts) -> ndarray`` method works. The default HashingEmbedder needs no
+network access or model download.
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import zlib
+
+import numpy as np
+
+import rubric
+from pdf_text import chunk_pdf
+
+# Default location of the on-disk index, one subdirectory per document
+VECTOR_INDEX_DIR = os.environ.get(
+    'VECTOR_INDEX_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'vector_index')
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Common words that carry no signal for matching rubric questions to report text
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have if in is it its of on or that the their this to was were which "
+    "with what how does do any each".split()
+)
+
+
+class HashingEmbedder:
+    """
+    Offline embedder: hashed unigrams and bigrams with sublinear term frequency,
+    projected into a fixed number of signed dimensions and L2-normalized.
+    """
+
+    def __init__(self, dim=4096):
+        self.dim = dim
+
+    @property
+    def name(self):
+        return f"hashing-{self.dim}"
+
+    def _features(self, text):
+        tokens = [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features, counts = np.unique(self._features(text), return_counts=True)
+            if not len(features):
+                continue
+            hashes = np.array([zlib.crc32(f.encode("utf-8")) for f in features], dtype=np.uint32)
+            # The top hash bit picks the sign so that bucket collisions tend to cancel out
+            signs = np.where(hashes >> 31, -1.0, 1.0)
+            np.add.at(vectors[row], hashes % self.dim, signs * (1.0 + np.log(counts)))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class VectorIndex:
+    """
+    Per-document chunk embeddings stored on disk.
+
+    Each document directory holds vectors.npy, the chunks as JSON lines
+    (chunks.jsonl) with their byte offsets (offsets.npy), and meta.json.
+    Documents are keyed by an ID such as the SHA-256 of the PDF, so a report is
+    extracted and embedded only once. Searches memory-map the vectors and read
+    only the matching chunk lines.
+    """
+
+    def __init__(self, directory=VECTOR_INDEX_DIR, embedder=None, batch_size=64):
+        self.directory = directory
+        self.embedder = embedder or HashingEmbedder()
+        self.batch_size = batch_size
+        # One lock per document, so indexing one report never waits on another; _lock only guards the dict
+        self._lock = threading.Lock()
+        self._doc_locks = {}
+
+    def _doc_lock(self, doc_id):
+        with self._lock:
+            return self._doc_locks.setdefault(doc_id, threading.Lock())
+
+    def _path(self, doc_id, name):
+        return os.path.join(self.directory, doc_id, name)
+
+    def _meta(self, doc_id):
+        try:
+            with open(self._path(doc_id, "meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def has(self, doc_id):
+        """Returns True if the document is indexed with the current embedder."""
+        meta = self._meta(doc_id)
+        return meta is not None and meta.get("embedder") == self.embedder.name
+
+    def add(self, doc_id, chunks):
+        """
+        Embeds and stores a document's chunks, replacing any previous entry.
+
+        Chunks may be a generator; they are embedded in batches and written out
+        as they arrive. Returns the number of chunks stored.
+        """
+        with self._doc_lock(doc_id):
+            return self._write(doc_id, chunks)
+
+    def _write(self, doc_id, chunks):
+        # The entry is built in a temporary directory and moved into place, so
+        # readers never see a partly written document
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=f".{doc_id}.", dir=self.directory)
+        old_dir = None
+        try:
+            vectors, offsets, batch = [], [], []
+            with open(os.path.join(tmp_dir, "chunks.jsonl"), "wb") as f:
+                for chunk in chunks:
+                    offsets.append(f.tell())
+                    f.write(json.dumps(chunk).encode("utf-8") + b"\n")
+                    batch.append(chunk["text"])
+                    if len(batch) == self.batch_size:
+                        vectors.append(self.embedder.embed(batch))
+                        batch = []
+                if batch:
+                    vectors.append(self.embedder.embed(batch))
+            dim = getattr(self.embedder, "dim", 0)
+            np.save(os.path.join(tmp_dir, "vectors.npy"),
+                    np.concatenate(vectors) if vectors else np.zeros((0, dim), dtype=np.float32))
+            np.save(os.path.join(tmp_dir, "offsets.npy"), np.array(offsets, dtype=np.int64))
+            with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"embedder": self.embedder.name, "chunks": len(offsets)}, f)
+
+            doc_dir = os.path.join(self.directory, doc_id)
+            if os.path.exists(doc_dir):
+                # A directory can only be renamed onto a missing or empty one; move the old entry aside first.
+                # Readers that already opened its files keep reading them.
+                old_dir = tempfile.mkdtemp(prefix=f".{doc_id}.old.", dir=self.directory)
+                os.replace(doc_dir, os.path.join(old_dir, doc_id))
+            os.replace(tmp_dir, doc_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        finally:
+            if old_dir is not None:
+                shutil.rmtree(old_dir, ignore_errors=True)
+        return len(offsets)
+
+    def add_pdf(self, doc_id, source, chunk_words=220, overlap=40):
+        """
+        Extracts, chunks and indexes a PDF (path or binary file object) unless it
+        is already indexed. Returns the chunk count.
+        """
+        meta = self._meta(doc_id)
+        if meta is not None and meta.get("embedder") == self.embedder.name:
+            return meta["chunks"]
+        with self._doc_lock(doc_id):
+            # Checked again: a concurrent request may have indexed the document meanwhile
+            meta = self._meta(doc_id)
+            if meta is not None and meta.get("embedder") == self.embedder.name:
+                return meta["chunks"]
+            return self._write(doc_id, chunk_pdf(source, chunk_words, overlap))
+
+    def search(self, doc_id, queries, k=6):
+        """
+        Returns the k best-matching chunks of a document for every query.
+
+        Returns:
+            List (one per query) of chunk dicts with an added "score" (cosine similarity)
+        """
+        vectors = np.load(self._path(doc_id, "vectors.npy"), mmap_mode="r")
+        if not len(vectors):
+            return [[] for _ in queries]
+        offsets = np.load(self._path(doc_id, "offsets.npy"))
+        similarities = self.embedder.embed(list(queries)) @ np.asarray(vectors).T
+        k = min(k, len(vectors))
+        results = []
+        with open(self._path(doc_id, "chunks.jsonl"), "rb") as f:
+            for row in similarities:
+                top = np.argpartition(-row, k - 1)[:k]
+                top = top[np.argsort(-row[top], kind="stable")]
+                matches = []
+                for i in top:
+                    f.seek(offsets[i])
+                    matches.append(dict(json.loads(f.readline()), score=float(row[i])))
+                results.append(matches)
+        return results
+
+
+def section_queries(sections=None):
+    """
+    Builds one retrieval query per rubric section from its title and question texts.
+
+    Returns:
+        Dict of section number -> query text
+    """
+    selected = rubric.SECTIONS if sections is None else [rubric.SECTIONS_BY_NUMBER[n] for n in sections]
+    return {
+        section.number: " ".join([section.title] + [q.text for q in section.questions])
+        for section in selected
+    }
+
+
+def retrieve_sections(index, doc_id, k=6, sections=None):
+    """
+    Retrieves the top-k chunks of a document for every rubric section.
+
+    Returns:
+        Dict of section number -> list of chunk dicts, in page order
+    """
+    queries = section_queries(sections)
+    results = index.search(doc_id, list(queries.values()), k=k)
+    return {
+        number: sorted(chunks, key=lambda chunk: chunk["page"])
+        for number, chunks in zip(queries, results)
+    }
+
+
+def render_context(chunks):
+    """Formats retrieved chunks as report excerpts labelled with their pages."""
+    parts = ["Relevant excerpts from the report:"]
+    for chunk in chunks:
+        pages = f"page {chunk['page']}" if chunk["page"] == chunk["end_page"] else \
+            f"pages {chunk['page']}-{chunk['end_page']}"
+        parts.append(f"[{pages}] {chunk['text']}")
+    return "\n\n".join(parts)